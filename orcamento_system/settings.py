@@ -43,6 +43,8 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    'orcamentos.middleware.ConsultasLentasMiddleware',
+    'orcamentos.middleware.CompressaoMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -78,9 +80,31 @@ DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
-    }
+    },
+    # Cópia do banco principal para relatórios, exportações e buscas (ver orcamentos/roteadores.py).
+    # Atualizada por `manage.py atualizar_replica`; enquanto não existir, tudo lê do 'default'
+    'leitura': {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': BASE_DIR / 'leitura.sqlite3',
+        'TEST': {'MIRROR': 'default'},
+    },
+    # Orçamentos antigos movidos por `manage.py arquivar_orcamentos` (somente leitura no sistema).
+    # Criar com `manage.py migrate --database arquivo`
+    'arquivo': {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': BASE_DIR / 'arquivo.sqlite3',
+    },
 }
 
+DATABASE_ROUTERS = [
+    'orcamentos.roteadores.RoteadorLeitura',
+    'orcamentos.roteadores.RoteadorArquivo',
+]
+
+# Arquivamento: orçamentos nestes status, emitidos há mais de N dias, saem do banco principal
+ARQUIVO_RETENCAO_DIAS = 730
+ARQUIVO_STATUS = ['rascunho', 'enviado', 'rejeitado', 'cancelado', 'expirado']
+
 
 # Password validation
 # https://docs.djangoproject.com/en/6.0/ref/settings/#auth-password-validators
@@ -119,6 +143,17 @@ USE_TZ = True
 STATIC_URL = 'static/'
 STATIC_ROOT = BASE_DIR / 'staticfiles'
 
+# CSS do Tailwind e ícones ficam no repositório (manage.py construir_estaticos);
+# no collectstatic recebem hash no nome e cópias .gz/.br
+STORAGES = {
+    'default': {
+        'BACKEND': 'django.core.files.storage.FileSystemStorage',
+    },
+    'staticfiles': {
+        'BACKEND': 'orcamentos.estaticos.ArmazenamentoEstatico',
+    },
+}
+
 MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / 'media'
 
@@ -126,4 +161,49 @@ MEDIA_ROOT = BASE_DIR / 'media'
 USE_THOUSAND_SEPARATOR = True
 DECIMAL_SEPARATOR = ','
 THOUSAND_SEPARATOR = '.'
-NUMBER_GROUPING = 3
\ No newline at end of file
+NUMBER_GROUPING = 3
+
+# Threads reservadas para gerar PDFs (ReportLab) fora do event loop
+PDF_MAX_WORKERS = 2
+
+# ReportLab e PIL só são importados no primeiro PDF gerado. True carrega já na
+# inicialização: útil com gunicorn --preload, em que os workers herdam do processo mestre
+PDF_PRECARREGAR = False
+
+# Controle de admissão dos PDFs: acima da fila, responde 503 com Retry-After
+PDF_ADMISSAO = {
+    'LIMITE_PROCESSO': PDF_MAX_WORKERS,  # PDFs simultâneos por processo
+    'LIMITE_GLOBAL': 4,                  # PDFs simultâneos somando todos os processos (travas de arquivo)
+    'FILA_MAX': 8,                       # requisições aguardando vaga por processo
+    'ESPERA_MAX': 5,                     # segundos aguardando vaga antes do 503
+    'RETRY_AFTER': 10,                   # segundos informados no Retry-After
+    'DIRETORIO_TRAVAS': None,            # None usa o diretório temporário do sistema
+}
+
+# PDFs gerados ficam em cache no disco, já comprimidos com gzip
+PDF_CACHE_DIR = BASE_DIR / 'cache' / 'pdf'
+
+# Orçamentos com mais itens que isto têm o PDF montado em blocos, com os itens lidos
+# do banco aos poucos: a memória não cresce com o tamanho do orçamento
+PDF_LIMITE_ITENS = 300
+
+# Consultas acima de LIMITE_MS vão para o ARQUIVO (uma linha JSON cada), parte delas com o EXPLAIN.
+# Ranking por tempo total: python manage.py relatorio_consultas_lentas
+CONSULTAS_LENTAS = {
+    'ATIVO': True,
+    'LIMITE_MS': 200,
+    'ARQUIVO': BASE_DIR / 'logs' / 'consultas_lentas.jsonl',
+    'AMOSTRA_EXPLAIN': 0.25,   # fração das consultas lentas que levam o EXPLAIN
+    'EXPLAIN_POR_MINUTO': 10,  # teto de EXPLAINs por processo
+}
+
+# Compressão das respostas (gzip; Brotli se o pacote brotli estiver instalado)
+COMPRESSAO = {
+    'TAMANHO_MINIMO': 1024,  # bytes; respostas menores não compensam
+    'TIPOS': [
+        'text/html', 'text/css', 'text/plain', 'text/javascript',
+        'application/javascript', 'application/json', 'image/svg+xml',
+    ],
+    'NIVEL_BROTLI': 5,
+    'MAX_BYTES_ALEATORIOS': 100,  # enchimento aleatório do gzip contra BREACH
+}
\ No newline at end of file
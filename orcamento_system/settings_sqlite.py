@@ -0,0 +1,36 @@
+# orcamento_system/settings_sqlite.py
+"""Perfil de implantação com SQLite: sessões e mensagens sem escrita no banco.
+
+O SQLite aceita um único escritor por vez; assim o arquivo fica só para os
+orçamentos e pedidos. Uso: DJANGO_SETTINGS_MODULE=orcamento_system.settings_sqlite
+Depois da troca, as sessões antigas podem ser apagadas com
+`python manage.py limpar_sessoes --todas`.
+
+É um perfil de produção: a SECRET_KEY vem de DJANGO_SECRET_KEY (obrigatória) e os
+hosts aceitos de DJANGO_ALLOWED_HOSTS, separados por vírgula.
+"""
+import os
+
+from django.core.exceptions import ImproperlyConfigured
+
+from .settings import *  # noqa: F401,F403
+
+# A sessão inteira é assinada com esta chave: a chave de desenvolvimento do settings.py,
+# que está no repositório, permitiria a qualquer um forjar o login no admin
+SECRET_KEY = os.environ.get('DJANGO_SECRET_KEY', '')
+if not SECRET_KEY:
+    raise ImproperlyConfigured('Defina a variável de ambiente DJANGO_SECRET_KEY para usar settings_sqlite.')
+
+DEBUG = False
+ALLOWED_HOSTS = [
+    host.strip() for host in os.environ.get('DJANGO_ALLOWED_HOSTS', 'localhost,127.0.0.1').split(',')
+    if host.strip()
+]
+
+# Sessão inteira num cookie assinado com a SECRET_KEY: login e leitura não tocam no banco.
+# O conteúdo é legível pelo navegador (não guardar segredos) e trocar a SECRET_KEY
+# encerra todas as sessões
+SESSION_ENGINE = 'django.contrib.sessions.backends.signed_cookies'
+
+# Só cookie: o FallbackStorage padrão grava na sessão quando as mensagens passam de 2 KB
+MESSAGE_STORAGE = 'django.contrib.messages.storage.cookie.CookieStorage'
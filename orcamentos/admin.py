@@ -1,7 +1,61 @@
 # orcamentos/admin.py
-from django.contrib import admin
+from django.contrib import admin, messages
+from django.core.paginator import Paginator
+from django.db import DatabaseError, connections
+from django.db.models import QuerySet
+from django.forms.models import BaseInlineFormSet
+from django.utils.functional import cached_property
 from .models import Empresa, Cliente, Orcamento, ItemOrcamento, UnidadeMedida
 
+
+def _estimar_linhas(model, using):
+    """Quantidade aproximada de linhas segundo as estatísticas do banco (None se indisponível)"""
+    connection = connections[using]
+    tabela = model._meta.db_table
+    try:
+        with connection.cursor() as cursor:
+            if connection.vendor == 'postgresql':
+                cursor.execute('SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass', [tabela])
+            elif connection.vendor == 'sqlite':
+                # Preenchida pelo comando ANALYZE
+                cursor.execute('SELECT stat FROM sqlite_stat1 WHERE tbl = %s LIMIT 1', [tabela])
+            else:
+                return None
+            linha = cursor.fetchone()
+    except DatabaseError:
+        return None
+    if not linha or linha[0] is None:
+        return None
+    return int(str(linha[0]).split()[0])
+
+
+class PaginatorContagemEstimada(Paginator):
+    """Evita o COUNT(*) da tabela inteira na listagem sem filtros de tabelas grandes"""
+    limite_exato = 10000
+
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        if isinstance(queryset, QuerySet) and not queryset.query.where:
+            estimativa = _estimar_linhas(queryset.model, queryset.db)
+            if estimativa and estimativa > self.limite_exato:
+                return estimativa
+        return super().count
+
+class ValidadeFilter(admin.SimpleListFilter):
+    title = 'validade'
+    parameter_name = 'validade'
+
+    def lookups(self, request, model_admin):
+        return [('vencendo', 'Vence em até 7 dias'), ('vencidos', 'Vencidos (ainda não expirados)')]
+
+    def queryset(self, request, queryset):
+        if self.value() == 'vencendo':
+            return queryset & Orcamento.vencendo()
+        if self.value() == 'vencidos':
+            return queryset & Orcamento.vencidos()
+        return queryset
+
 @admin.register(Empresa)
 class EmpresaAdmin(admin.ModelAdmin):
     list_display = ['nome', 'cnpj', 'telefone', 'email', 'cor', 'ativa', 'criado_em']
@@ -30,20 +84,79 @@ class ClienteAdmin(admin.ModelAdmin):
     search_fields = ['nome', 'cpf_cnpj', 'telefone']
     list_filter = ['criado_em']
     date_hierarchy = 'criado_em'
+    paginator = PaginatorContagemEstimada
+    show_full_result_count = False
+
+class ItensPaginadosFormSet(BaseInlineFormSet):
+    """Edita os itens uma página por vez em vez de montar um formulário para cada item"""
+    pagina = 1
+    por_pagina = 50
+
+    def get_queryset(self):
+        if not hasattr(self, '_queryset_pagina'):
+            queryset = super().get_queryset()
+            self.total_itens = queryset.count()
+            self.total_paginas = max((self.total_itens - 1) // self.por_pagina + 1, 1)
+            self.pagina = min(self.pagina, self.total_paginas)
+            inicio = (self.pagina - 1) * self.por_pagina
+            self._queryset_pagina = queryset[inicio:inicio + self.por_pagina]
+        return self._queryset_pagina
+
+    def paginas(self):
+        return range(1, self.total_paginas + 1)
+
+    def _construct_form(self, i, **kwargs):
+        form = super()._construct_form(i, **kwargs)
+        # As unidades são poucas: uma consulta para a página inteira, não uma por linha
+        if not hasattr(self, '_choices_unidade'):
+            self._choices_unidade = list(form.fields['unidade'].choices)
+        form.fields['unidade'].choices = self._choices_unidade
+        return form
 
 class ItemOrcamentoInline(admin.TabularInline):
     model = ItemOrcamento
+    formset = ItensPaginadosFormSet
+    template = 'admin/orcamentos/orcamento/itens_paginados.html'
     extra = 1
     fields = ['numero_item', 'unidade', 'quantidade', 'descricao', 'marca', 'valor_unitario', 'valor_total']
     readonly_fields = ['valor_total']
+    itens_por_pagina = 50
+
+    def get_formset(self, request, obj=None, **kwargs):
+        FormSet = super().get_formset(request, obj, **kwargs)
+        try:
+            pagina = max(int(request.GET.get('itens_pagina', 1)), 1)
+        except ValueError:
+            pagina = 1
+        # O POST vai para a mesma URL, então a página editada é a mesma que foi exibida
+        return type(FormSet.__name__, (FormSet,), {'pagina': pagina, 'por_pagina': self.itens_por_pagina})
+
+def _acao_status(status):
+    """Ação do admin que aplica Orcamento.mudar_status_em_lote aos selecionados"""
+    @admin.action(description=f'Marcar selecionados como {dict(Orcamento.STATUS_CHOICES)[status]}')
+    def acao(modeladmin, request, queryset):
+        resultados = Orcamento.mudar_status_em_lote(queryset.values_list('id', flat=True), status)
+        sucesso, aviso = Orcamento.resumir_status_lote(resultados, status)
+        if sucesso:
+            modeladmin.message_user(request, sucesso, messages.SUCCESS)
+        if aviso:
+            modeladmin.message_user(request, aviso, messages.WARNING)
+    acao.__name__ = f'marcar_{status}'
+    return acao
+
 
 @admin.register(Orcamento)
 class OrcamentoAdmin(admin.ModelAdmin):
     list_display = ['numero', 'empresa', 'cliente', 'data_emissao', 'status', 'bloqueado', 'total', 'criado_em']
-    list_filter = ['status', 'empresa', 'data_emissao', 'bloqueado']
+    list_filter = ['status', ValidadeFilter, 'empresa', 'data_emissao', 'bloqueado']
+    list_select_related = ['empresa', 'cliente']
     search_fields = ['numero', 'cliente__nome', 'cliente__cpf_cnpj']
+    autocomplete_fields = ['cliente']
+    paginator = PaginatorContagemEstimada
+    show_full_result_count = False
     inlines = [ItemOrcamentoInline]
-    readonly_fields = ['numero', 'total', 'criado_em', 'atualizado_em']
+    actions = [_acao_status(status) for status in Orcamento.TRANSICOES_LOTE]
+    readonly_fields = ['numero', 'data_emissao', 'data_validade', 'total', 'criado_em', 'atualizado_em']
     date_hierarchy = 'data_emissao'
     
     fieldsets = (
@@ -69,7 +182,6 @@ class OrcamentoAdmin(admin.ModelAdmin):
     def save_model(self, request, obj, form, change):
         """Impedir edição de orçamentos bloqueados"""
         if change and obj.bloqueado:
-            from django.contrib import messages
             messages.warning(request, 'Este orçamento está bloqueado e não pode ser editado!')
             return
         super().save_model(request, obj, form, change)
@@ -0,0 +1,235 @@
+# orcamentos/admissao.py
+"""Controle de admissão para a geração de PDFs.
+
+Limita quantos PDFs são montados ao mesmo tempo no processo e entre processos
+(uma trava de arquivo por vaga), mantém uma fila curta de espera, atendida por
+ordem de chegada, e recusa o excedente com Sobrecarga, que a view converte em
+503 + Retry-After.
+"""
+import asyncio
+import os
+import tempfile
+import threading
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+
+class Sobrecarga(Exception):
+    """Fila de espera cheia ou tempo de espera esgotado"""
+
+    def __init__(self, retry_after):
+        super().__init__('Geração de PDF sobrecarregada')
+        self.retry_after = retry_after
+
+
+class _TravaArquivo:
+    """Trava exclusiva e não bloqueante sobre um arquivo (vaga entre processos)"""
+
+    def __init__(self, caminho):
+        self.caminho = caminho
+        self._arquivo = None
+
+    def tentar(self):
+        arquivo = open(self.caminho, 'a+b')
+        try:
+            if fcntl:
+                fcntl.flock(arquivo.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+            else:
+                arquivo.seek(0)
+                msvcrt.locking(arquivo.fileno(), msvcrt.LK_NBLCK, 1)
+        except OSError:
+            arquivo.close()
+            return False
+        self._arquivo = arquivo
+        return True
+
+    def liberar(self):
+        if fcntl:
+            fcntl.flock(self._arquivo.fileno(), fcntl.LOCK_UN)
+        else:
+            self._arquivo.seek(0)
+            msvcrt.locking(self._arquivo.fileno(), msvcrt.LK_UNLCK, 1)
+        self._arquivo.close()
+        self._arquivo = None
+
+
+class _Espera:
+    """Requisição na fila, acordada por quem libera a vaga (de qualquer thread ou event loop)"""
+
+    def __init__(self):
+        self.loop = asyncio.get_running_loop()
+        self.futuro = self.loop.create_future()
+        self.recebeu = False  # A vaga já foi passada para esta requisição
+
+    def acordar(self):
+        self.loop.call_soon_threadsafe(self._entregar)
+
+    def _entregar(self):
+        if not self.futuro.done():
+            self.futuro.set_result(True)
+
+
+class ControleAdmissao:
+    """Vagas do processo numa fila FIFO; as vagas entre processos são as travas de arquivo.
+
+    Quem libera uma vaga a entrega direto à primeira requisição da fila, sem disputa.
+    A fila funciona entre event loops diferentes (no WSGI cada requisição async tem o
+    seu): a requisição é acordada com call_soon_threadsafe no loop em que está esperando.
+    Abrir e travar os arquivos são chamadas de sistema e rodam fora do event loop.
+    """
+
+    def __init__(self, limite_processo, limite_global=None, fila_max=8, espera_max=5.0,
+                 retry_after=10, diretorio_travas=None, intervalo=0.05):
+        self.limite_processo = limite_processo
+        self.limite_global = limite_global
+        self.fila_max = fila_max
+        self.espera_max = espera_max
+        self.retry_after = retry_after
+        self.intervalo = intervalo  # Entre tentativas de pegar uma trava de outro processo
+
+        self._lock = threading.Lock()
+        self._ativos = 0
+        self._fila = deque()
+        self._travas = []
+        if limite_global:
+            diretorio = diretorio_travas or os.path.join(tempfile.gettempdir(), 'orcamentos_pdf')
+            os.makedirs(diretorio, exist_ok=True)
+            self._travas = [
+                _TravaArquivo(os.path.join(diretorio, f'vaga-{i}.lock')) for i in range(limite_global)
+            ]
+        self._travas_livres = list(self._travas)
+
+        # Métricas do processo
+        self._admitidos = 0
+        self._rejeitados = 0
+        self._espera_total = 0.0
+        self._espera_max_obs = 0.0
+
+    def _rejeitar(self):
+        with self._lock:
+            self._rejeitados += 1
+        raise Sobrecarga(self.retry_after)
+
+    async def _ocupar_processo(self, prazo):
+        with self._lock:
+            if self._ativos < self.limite_processo and not self._fila:
+                self._ativos += 1
+                return
+            lotada = len(self._fila) >= self.fila_max
+            if not lotada:
+                espera = _Espera()
+                self._fila.append(espera)
+        if lotada:
+            self._rejeitar()
+
+        try:
+            await asyncio.wait_for(asyncio.shield(espera.futuro), timeout=max(0, prazo - time.monotonic()))
+        except asyncio.TimeoutError:
+            if self._sair_da_fila(espera):
+                self._rejeitar()
+            # A vaga chegou junto com o fim do prazo: segue com ela
+        except asyncio.CancelledError:
+            # Cliente desconectou: não pode levar embora uma vaga que já recebeu
+            if not self._sair_da_fila(espera):
+                self._liberar_processo()
+            raise
+
+    def _sair_da_fila(self, espera):
+        """True se saiu da fila sem ter recebido a vaga"""
+        with self._lock:
+            if espera.recebeu:
+                return False
+            self._fila.remove(espera)
+            return True
+
+    def _liberar_processo(self):
+        with self._lock:
+            if self._fila:
+                # A vaga passa direto para a primeira da fila (_ativos não muda)
+                espera = self._fila.popleft()
+                espera.recebeu = True
+                espera.acordar()
+            else:
+                self._ativos -= 1
+
+    def _tentar_trava(self):
+        """Uma trava de arquivo livre, ou None (roda numa thread: open e flock bloqueiam)"""
+        with self._lock:
+            candidatas = list(self._travas_livres)
+        for trava in candidatas:
+            with self._lock:
+                if trava not in self._travas_livres:
+                    continue
+                self._travas_livres.remove(trava)
+            if trava.tentar():
+                return trava
+            with self._lock:
+                self._travas_livres.append(trava)
+        return None
+
+    def _devolver_trava(self, trava):
+        trava.liberar()
+        with self._lock:
+            self._travas_livres.append(trava)
+
+    async def _ocupar_global(self, prazo):
+        # Outro processo não tem como avisar que soltou a trava: tenta de novo a cada intervalo
+        while True:
+            trava = await asyncio.to_thread(self._tentar_trava)
+            if trava is not None:
+                return trava
+            if time.monotonic() >= prazo:
+                self._rejeitar()
+            await asyncio.sleep(self.intervalo)
+
+    @asynccontextmanager
+    async def vaga(self):
+        """Aguarda uma vaga (no máximo espera_max segundos, por ordem de chegada) ou levanta Sobrecarga"""
+        inicio = time.monotonic()
+        prazo = inicio + self.espera_max
+        await self._ocupar_processo(prazo)
+        trava = None
+        try:
+            if self._travas:
+                trava = await self._ocupar_global(prazo)
+        except BaseException:
+            self._liberar_processo()
+            raise
+
+        espera = time.monotonic() - inicio
+        with self._lock:
+            self._admitidos += 1
+            self._espera_total += espera
+            self._espera_max_obs = max(self._espera_max_obs, espera)
+
+        try:
+            yield
+        finally:
+            try:
+                if trava is not None:
+                    # shield: mesmo com a requisição cancelada a trava é solta
+                    await asyncio.shield(asyncio.to_thread(self._devolver_trava, trava))
+            finally:
+                self._liberar_processo()
+
+    def metricas(self):
+        with self._lock:
+            return {
+                'pid': os.getpid(),
+                'ativos': self._ativos,
+                'na_fila': len(self._fila),
+                'limite_processo': self.limite_processo,
+                'limite_global': self.limite_global,
+                'fila_max': self.fila_max,
+                'admitidos': self._admitidos,
+                'rejeitados': self._rejeitados,
+                'espera_media_s': round(self._espera_total / self._admitidos, 4) if self._admitidos else 0.0,
+                'espera_max_s': round(self._espera_max_obs, 4),
+            }
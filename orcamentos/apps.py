@@ -1,5 +1,27 @@
 from django.apps import AppConfig
+from django.conf import settings
 
 
 class OrcamentosConfig(AppConfig):
     name = 'orcamentos'
+
+    def ready(self):
+        from django.db.backends.signals import connection_created
+        from django.db.models.signals import post_delete, post_save
+
+        from . import cache_pdf
+        from .consultas_lentas import instalar
+
+        connection_created.connect(instalar, dispatch_uid='orcamentos.consultas_lentas')
+
+        # A sigla da unidade sai impressa nos PDFs; mudanças são raras, então o cache todo é descartado
+        unidade = self.get_model('UnidadeMedida')
+        post_save.connect(cache_pdf.limpar, sender=unidade, dispatch_uid='orcamentos.cache_pdf.unidade')
+        post_delete.connect(cache_pdf.limpar, sender=unidade, dispatch_uid='orcamentos.cache_pdf.unidade_removida')
+
+        # Servidores que fazem fork depois de carregar a aplicação (gunicorn --preload)
+        # compartilham o ReportLab já importado entre os workers
+        if getattr(settings, 'PDF_PRECARREGAR', False):
+            from .gerador_pdf import precarregar
+
+            precarregar()
@@ -0,0 +1,91 @@
+# orcamentos/cache_pdf.py
+"""Cache em disco dos PDFs gerados, guardados já comprimidos com gzip.
+
+O PDF é comprimido uma única vez, ao ser gerado; o download envia o .gz como
+está (Content-Encoding: gzip) ou o descomprime para clientes sem suporte.
+"""
+import glob
+import gzip
+import hashlib
+import os
+import tempfile
+
+from django.conf import settings
+from django.http import FileResponse
+from django.utils.cache import patch_vary_headers
+
+from .middleware import codificacao_preferida
+
+
+def _diretorio(criar=True):
+    diretorio = getattr(settings, 'PDF_CACHE_DIR', os.path.join(settings.BASE_DIR, 'cache', 'pdf'))
+    if criar:
+        os.makedirs(diretorio, exist_ok=True)
+    return diretorio
+
+
+def chave(orcamento):
+    """Muda sempre que o orçamento (itens atualizam atualizado_em), a empresa ou o cliente mudam.
+
+    Empresa e cliente entram pelos campos impressos: editá-los não toca o orçamento.
+    As siglas das unidades não entram na chave: alterar uma unidade limpa o cache inteiro (limpar)
+    """
+    empresa, cliente = orcamento.empresa, orcamento.cliente
+    dados = '|'.join(str(v) for v in (
+        orcamento.atualizado_em.isoformat(), orcamento.status,
+        empresa.nome, empresa.cnpj, empresa.endereco, empresa.telefone,
+        empresa.email, empresa.cor, empresa.logo.name if empresa.logo else '',
+        cliente.nome, cliente.cpf_cnpj, cliente.endereco, cliente.telefone,
+    ))
+    return f'{orcamento.id}-{hashlib.sha256(dados.encode()).hexdigest()[:16]}'
+
+
+def obter(orcamento):
+    """Caminho do PDF comprimido em cache, ou None"""
+    caminho = os.path.join(_diretorio(), f'{chave(orcamento)}.pdf.gz')
+    return caminho if os.path.isfile(caminho) else None
+
+
+def guardar(orcamento, conteudo):
+    """Comprime e grava o PDF, descartando versões anteriores do mesmo orçamento"""
+    diretorio = _diretorio()
+    caminho = os.path.join(diretorio, f'{chave(orcamento)}.pdf.gz')
+
+    for antigo in glob.glob(os.path.join(diretorio, f'{orcamento.id}-*.pdf.gz')):
+        if antigo != caminho:
+            try:
+                os.remove(antigo)
+            except OSError:
+                pass
+
+    # Grava em arquivo temporário e renomeia: leitores nunca veem um .gz pela metade
+    descritor, temporario = tempfile.mkstemp(dir=diretorio, suffix='.tmp')
+    with os.fdopen(descritor, 'wb') as arquivo:
+        arquivo.write(gzip.compress(conteudo, compresslevel=9, mtime=0))
+    os.replace(temporario, caminho)
+    return caminho
+
+
+def limpar(**kwargs):
+    """Apaga todos os PDFs em cache (receptor de post_save/post_delete de UnidadeMedida)"""
+    for caminho in glob.glob(os.path.join(_diretorio(criar=False), '*.pdf.gz')):
+        try:
+            os.remove(caminho)
+        except OSError:
+            pass
+
+
+def resposta(request, caminho, nome_arquivo):
+    if codificacao_preferida(request.headers.get('Accept-Encoding', ''), ['gzip']):
+        resposta = FileResponse(
+            open(caminho, 'rb'), as_attachment=True, filename=nome_arquivo,
+            content_type='application/pdf',
+        )
+        resposta['Content-Encoding'] = 'gzip'
+    else:
+        resposta = FileResponse(
+            gzip.open(caminho, 'rb'), as_attachment=True, filename=nome_arquivo,
+            content_type='application/pdf',
+        )
+    patch_vary_headers(resposta, ('Accept-Encoding',))
+    return resposta
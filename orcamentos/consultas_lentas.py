@@ -0,0 +1,195 @@
+# orcamentos/consultas_lentas.py
+"""Registro das consultas lentas ao banco, com o plano de execução.
+
+Um execute wrapper (connection.execute_wrappers) é instalado em toda conexão aberta
+(sinal connection_created, ligado em apps.py). Consultas acima de LIMITE_MS viram
+uma linha JSON no ARQUIVO, com o SQL, o formato dos parâmetros (nunca os valores),
+a view e o ponto do código que as chamou. Uma amostra delas, limitada por minuto,
+leva também o EXPLAIN do banco. O comando relatorio_consultas_lentas agrega o arquivo.
+"""
+import hashlib
+import json
+import os
+import random
+import re
+import threading
+import time
+import traceback
+from contextlib import nullcontext
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import DatabaseError, NotSupportedError, transaction
+from django.utils import timezone
+
+# View em execução, definida pelo ConsultasLentasMiddleware
+view_atual = ContextVar('view_atual', default=None)
+
+# Evita registrar o próprio EXPLAIN (que também passa pelo wrapper)
+_explicando = ContextVar('explicando', default=False)
+
+_COMANDOS_EXPLICAVEIS = ('SELECT', 'INSERT', 'UPDATE', 'DELETE', 'WITH')
+
+_literais = re.compile(r"'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b")
+_listas = re.compile(r'\((?:\s*(?:%s|\?)\s*,)+\s*(?:%s|\?)\s*\)')
+_espacos = re.compile(r'\s+')
+
+_MODULO = os.path.abspath(__file__).rsplit('.', 1)[0]
+
+
+def configuracao():
+    config = {
+        'ATIVO': True,
+        'LIMITE_MS': 200,
+        'ARQUIVO': os.path.join(settings.BASE_DIR, 'logs', 'consultas_lentas.jsonl'),
+        'AMOSTRA_EXPLAIN': 0.25,
+        'EXPLAIN_POR_MINUTO': 10,
+        'TAMANHO_MAX_SQL': 4000,
+    }
+    config.update(getattr(settings, 'CONSULTAS_LENTAS', {}))
+    return config
+
+
+def impressao(sql):
+    """Mesma consulta com valores diferentes (e listas IN de qualquer tamanho) dá a mesma impressão"""
+    normalizado = _literais.sub('?', sql)
+    normalizado = _listas.sub('(...)', normalizado)
+    normalizado = _espacos.sub(' ', normalizado).strip()
+    return hashlib.sha1(normalizado.encode()).hexdigest()[:12], normalizado
+
+
+def formato_parametros(params, many):
+    """Quantidade e tipos dos parâmetros, sem os valores (podem ter dados de clientes)"""
+    if many:
+        linhas = list(params or [])
+        return {'linhas': len(linhas), 'tipos': [type(v).__name__ for v in linhas[0]] if linhas else []}
+    if isinstance(params, dict):
+        return {'nomes': sorted(params)}
+    return {'tipos': [type(v).__name__ for v in params or ()]}
+
+
+def origem():
+    """Os frames mais próximos do código do projeto (fora do Django e deste módulo)"""
+    base = str(settings.BASE_DIR)
+    frames = [
+        f'{os.path.relpath(frame.filename, base)}:{frame.lineno} {frame.name}'
+        for frame in traceback.extract_stack()[:-2]
+        if frame.filename.startswith(base)
+        and not frame.filename.startswith(_MODULO)
+        and f'{os.sep}site-packages{os.sep}' not in frame.filename
+    ]
+    return frames[-3:][::-1]
+
+
+class _LimiteExplain:
+    """Janela de um minuto com no máximo `por_minuto` EXPLAINs no processo"""
+
+    def __init__(self):
+        self._trava = threading.Lock()
+        self._inicio = 0.0
+        self._usados = 0
+
+    def permitir(self, por_minuto):
+        agora = time.monotonic()
+        with self._trava:
+            if agora - self._inicio >= 60:
+                self._inicio, self._usados = agora, 0
+            if self._usados >= por_minuto:
+                return False
+            self._usados += 1
+            return True
+
+
+class RegistroConsultasLentas:
+    """Execute wrapper: mede cada consulta e registra as que passam do limite"""
+
+    def __init__(self, config=None):
+        self.config = config or configuracao()
+        self._limite_explain = _LimiteExplain()
+        self._trava_arquivo = threading.Lock()
+
+    def __call__(self, execute, sql, params, many, context):
+        if _explicando.get():
+            return execute(sql, params, many, context)
+        inicio = time.perf_counter()
+        sucesso = False
+        try:
+            resultado = execute(sql, params, many, context)
+            sucesso = True
+            return resultado
+        finally:
+            duracao = (time.perf_counter() - inicio) * 1000
+            if duracao >= self.config['LIMITE_MS']:
+                try:
+                    self._registrar(sql, params, many, context['connection'], duracao, sucesso)
+                except Exception:
+                    # O registro nunca pode derrubar a consulta original
+                    pass
+
+    def _registrar(self, sql, params, many, conexao, duracao, sucesso):
+        chave, _ = impressao(sql)
+        registro = {
+            'em': timezone.now().isoformat(timespec='seconds'),
+            'ms': round(duracao, 1),
+            'banco': conexao.alias,
+            'impressao': chave,
+            'sql': sql[:self.config['TAMANHO_MAX_SQL']],
+            'parametros': formato_parametros(params, many),
+            'view': view_atual.get(),
+            'origem': origem(),
+        }
+        if not sucesso:
+            registro['erro'] = True
+        elif self._deve_explicar(sql, many):
+            registro['plano'] = self._explicar(conexao, sql, params)
+        self._gravar(registro)
+
+    def _deve_explicar(self, sql, many):
+        if many or not sql.lstrip().upper().startswith(_COMANDOS_EXPLICAVEIS):
+            return False
+        if random.random() >= self.config['AMOSTRA_EXPLAIN']:
+            return False
+        return self._limite_explain.permitir(self.config['EXPLAIN_POR_MINUTO'])
+
+    def _explicar(self, conexao, sql, params):
+        # Sem ANALYZE: o banco só planeja, não executa de novo (seguro para UPDATE/DELETE)
+        # No PostgreSQL um erro invalida a transação em andamento: o savepoint isola o EXPLAIN.
+        # O SQLite não precisa dele (e recusa o savepoint com um SELECT ainda sendo lido)
+        bloco = nullcontext()
+        if conexao.in_atomic_block and conexao.vendor != 'sqlite':
+            bloco = transaction.atomic(using=conexao.alias)
+        token = _explicando.set(True)
+        try:
+            with bloco, conexao.cursor() as cursor:
+                cursor.execute(f'{conexao.ops.explain_query_prefix()} {sql}', params)
+                return [' '.join(str(coluna) for coluna in linha) for linha in cursor.fetchall()]
+        except (DatabaseError, NotSupportedError) as e:
+            return [f'EXPLAIN indisponível: {e}']
+        finally:
+            _explicando.reset(token)
+
+    def _gravar(self, registro):
+        caminho = self.config['ARQUIVO']
+        linha = json.dumps(registro, ensure_ascii=False, default=str) + '\n'
+        with self._trava_arquivo:
+            os.makedirs(os.path.dirname(caminho), exist_ok=True)
+            with open(caminho, 'a', encoding='utf-8') as arquivo:
+                arquivo.write(linha)
+
+
+_registro = None
+_trava_registro = threading.Lock()
+
+
+def instalar(sender, connection, **kwargs):
+    """Receptor de connection_created: um único wrapper compartilhado por todas as conexões"""
+    global _registro
+    if _registro is None:
+        with _trava_registro:
+            if _registro is None:
+                config = configuracao()
+                if not config['ATIVO']:
+                    return
+                _registro = RegistroConsultasLentas(config)
+    if _registro not in connection.execute_wrappers:
+        connection.execute_wrappers.append(_registro)
@@ -0,0 +1,91 @@
+# orcamentos/estaticos.py
+"""Arquivos estáticos com nome versionado (hash), pré-comprimidos no collectstatic
+e servidos com cache de longa duração."""
+import gzip
+import mimetypes
+import os
+import re
+
+from django.conf import settings
+from django.contrib.staticfiles.storage import ManifestStaticFilesStorage
+from django.http import FileResponse, Http404
+from django.utils._os import safe_join
+from django.utils.cache import patch_vary_headers
+
+from .middleware import codificacao_preferida
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# nome.0123456789ab.css -> gerado pelo ManifestStaticFilesStorage, conteúdo nunca muda
+NOME_COM_HASH = re.compile(r'\.[0-9a-f]{12}\.[^./]+$')
+UM_ANO = 60 * 60 * 24 * 365
+
+
+class ArmazenamentoEstatico(ManifestStaticFilesStorage):
+    """Manifest com hash + cópias .gz (e .br, se o pacote brotli estiver instalado)"""
+    extensoes_comprimiveis = ('.css', '.js', '.svg', '.json', '.txt', '.map', '.html', '.xml')
+    tamanho_minimo = 256
+
+    def post_process(self, paths, dry_run=False, **options):
+        gerados = []
+        for nome, nome_hash, processado in super().post_process(paths, dry_run, **options):
+            if nome_hash and not isinstance(processado, Exception):
+                gerados.append(nome_hash)
+            yield nome, nome_hash, processado
+
+        if dry_run:
+            return
+        for nome_hash in gerados:
+            if nome_hash.endswith(self.extensoes_comprimiveis):
+                self._comprimir(nome_hash)
+
+    def _comprimir(self, nome):
+        caminho = self.path(nome)
+        with open(caminho, 'rb') as arquivo:
+            conteudo = arquivo.read()
+        if len(conteudo) < self.tamanho_minimo:
+            return
+
+        variantes = [('.gz', gzip.compress(conteudo, compresslevel=9, mtime=0))]
+        if brotli:
+            variantes.append(('.br', brotli.compress(conteudo, quality=11)))
+
+        for extensao, comprimido in variantes:
+            # Só vale a pena guardar a variante se ela for realmente menor
+            if len(comprimido) < len(conteudo):
+                with open(caminho + extensao, 'wb') as destino:
+                    destino.write(comprimido)
+
+
+def servir_estatico(request, path):
+    """Serve STATIC_ROOT sem DEBUG, escolhendo a variante pré-comprimida aceita pelo navegador"""
+    try:
+        caminho = safe_join(settings.STATIC_ROOT, path)
+    except Exception:
+        raise Http404
+    if not os.path.isfile(caminho):
+        raise Http404
+
+    # Entre as variantes gravadas, a preferida pelo Accept-Encoding (com os pesos q=)
+    variantes = {
+        nome_codificacao: caminho + extensao
+        for extensao, nome_codificacao in (('.br', 'br'), ('.gz', 'gzip'))
+        if os.path.isfile(caminho + extensao)
+    }
+    codificacao = codificacao_preferida(request.headers.get('Accept-Encoding', ''), list(variantes))
+    arquivo = variantes.get(codificacao, caminho)
+
+    content_type = mimetypes.guess_type(caminho)[0] or 'application/octet-stream'
+    resposta = FileResponse(open(arquivo, 'rb'), content_type=content_type)
+    if codificacao:
+        resposta['Content-Encoding'] = codificacao
+    patch_vary_headers(resposta, ('Accept-Encoding',))
+
+    if NOME_COM_HASH.search(path):
+        resposta['Cache-Control'] = f'public, max-age={UM_ANO}, immutable'
+    else:
+        resposta['Cache-Control'] = 'no-cache'
+    return resposta
@@ -0,0 +1,286 @@
+# orcamentos/gerador_pdf.py
+"""Montagem dos PDFs de orçamento com o ReportLab.
+
+Importado só quando o primeiro PDF é gerado (views._renderizar_pdf), para que
+workers e comandos que nunca geram PDF não carreguem ReportLab e PIL. Servidores
+que fazem fork (gunicorn --preload) podem carregar antes com PDF_PRECARREGAR.
+"""
+import io
+import itertools
+import logging
+import os
+
+from django.db import close_old_connections
+from django.db.models import QuerySet
+from reportlab.lib import colors
+from reportlab.lib.enums import TA_CENTER, TA_LEFT
+from reportlab.lib.pagesizes import A4
+from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
+from reportlab.lib.units import mm
+from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer, Image
+
+logger = logging.getLogger(__name__)
+
+# Linhas por bloco da tabela de itens
+ITENS_POR_BLOCO = 40
+
+
+def precarregar():
+    """Carrega o que o primeiro PDF carregaria (PIL e as fontes/estilos padrão)"""
+    try:
+        from PIL import Image as PILImage  # noqa: F401
+    except ImportError:
+        pass
+    getSampleStyleSheet()
+
+
+class _ElementosSobDemanda(list):
+    """Lista de flowables que só puxa os próximos do gerador quando o ReportLab chega neles.
+
+    O doc.build() consome a lista pela frente (del flowables[0]), então só os blocos
+    da página em montagem ficam na memória.
+    """
+
+    def __init__(self, gerador, folga=3):
+        super().__init__()
+        self._gerador = gerador
+        self._folga = folga
+
+    def _abastecer(self, quantidade=None):
+        while self._gerador is not None and (quantidade is None or super().__len__() < quantidade):
+            try:
+                self.append(next(self._gerador))
+            except StopIteration:
+                self._gerador = None
+
+    def __len__(self):
+        self._abastecer(self._folga)
+        return super().__len__()
+
+    def __getitem__(self, indice):
+        if isinstance(indice, slice):
+            fim = indice.stop if (indice.start or 0) >= 0 else None
+        else:
+            fim = indice + 1
+        if fim is None or fim <= 0:
+            # Índices contados a partir do fim precisam do gerador inteiro
+            self._abastecer()
+        else:
+            self._abastecer(fim + self._folga)
+        return super().__getitem__(indice)
+
+    def __iter__(self):
+        self._abastecer()
+        return super().__iter__()
+
+
+def renderizar(orcamento, itens):
+    """Monta o PDF e devolve o buffer posicionado no início.
+
+    `itens` é uma lista, o gerador de um RetratoOrcamento ou, em orçamentos grandes,
+    um QuerySet lido aqui com .iterator().
+    """
+    if isinstance(itens, QuerySet):
+        try:
+            return renderizar(orcamento, itens.iterator(chunk_size=ITENS_POR_BLOCO * 5))
+        finally:
+            # Conexão aberta por esta thread do pool, fora do ciclo de request do Django
+            close_old_connections()
+    
+    # Criar buffer
+    buffer = io.BytesIO()
+    
+    # Criar documento PDF
+    doc = SimpleDocTemplate(buffer, pagesize=A4, topMargin=20*mm, bottomMargin=30*mm)
+    elements = []
+    styles = getSampleStyleSheet()
+    
+    # Estilo customizado
+    titulo_style = ParagraphStyle(
+        'CustomTitle',
+        parent=styles['Heading1'],
+        fontSize=16,
+        textColor=colors.HexColor(orcamento.empresa.cor),
+        alignment=TA_CENTER,
+        spaceAfter=2,
+    )
+    
+    subtitulo_style = ParagraphStyle(
+        'Subtitle',
+        parent=styles['Normal'],
+        fontSize=10,
+        alignment=TA_CENTER,
+        spaceAfter=2,
+    )
+    
+    # Logo da empresa (se existir)
+    if orcamento.empresa.logo:
+        try:
+            from PIL import Image as PILImage
+            
+            logo_path = orcamento.empresa.logo.path
+            
+            if os.path.exists(logo_path):
+                pil_img = PILImage.open(logo_path)
+                img_width, img_height = pil_img.size
+                
+                max_width = 40 * mm
+                max_height = 20 * mm
+                
+                ratio = min(max_width / img_width, max_height / img_height)
+                new_width = img_width * ratio
+                new_height = img_height * ratio
+                
+                logo = Image(logo_path, width=new_width, height=new_height)
+                logo.hAlign = 'CENTER'
+                elements.append(logo)
+        except Exception as e:
+            # Sem o logo o PDF sai do mesmo jeito
+            logger.warning('Erro ao carregar logo da empresa %s: %s', orcamento.empresa.pk, e)
+    
+    # Cabeçalho com dados da empresa
+    elements.append(Paragraph(f"<b>{orcamento.empresa.nome}</b>", titulo_style))
+    elements.append(Paragraph(f"CNPJ: {orcamento.empresa.cnpj}", subtitulo_style))
+    elements.append(Paragraph(f"{orcamento.empresa.endereco}", subtitulo_style))
+    elements.append(Paragraph(f"Tel: {orcamento.empresa.telefone} | Email: {orcamento.empresa.email}", subtitulo_style))
+    
+    # Título do documento
+    tipo_doc = "PEDIDO" if orcamento.status == 'pedido' else "ORÇAMENTO"
+    elements.append(Paragraph(f"<b>{tipo_doc} Nº {orcamento.numero}</b>", titulo_style))
+    
+    # Informações do cliente
+    cliente_info = [
+        ['Cliente:', orcamento.cliente.nome],
+        ['CPF/CNPJ:', orcamento.cliente.cpf_cnpj],
+        ['Endereço:', orcamento.cliente.endereco],
+    ]
+    
+    if orcamento.cliente.telefone:
+        cliente_info.append(['Telefone:', orcamento.cliente.telefone])
+    
+    cliente_table = Table(cliente_info, colWidths=[40*mm, 130*mm])
+    cliente_table.setStyle(TableStyle([
+        ('FONTNAME', (0, 0), (0, -1), 'Helvetica-Bold'),
+        ('FONTSIZE', (0, 0), (-1, -1), 9),
+        ('VALIGN', (0, 0), (-1, -1), 'TOP'),
+    ]))
+    elements.append(cliente_table)
+    elements.append(Spacer(1, 5*mm))
+    
+    # Informações da proposta
+    proposta_info = [
+        ['Data de Emissão:', orcamento.data_emissao.strftime('%d/%m/%Y')],
+        ['Validade da Proposta:', f'{orcamento.validade_dias} dias'],
+        ['Prazo de Entrega:', orcamento.prazo_entrega],
+    ]
+    
+    proposta_table = Table(proposta_info, colWidths=[50*mm, 120*mm])
+    proposta_table.setStyle(TableStyle([
+        ('FONTNAME', (0, 0), (0, -1), 'Helvetica-Bold'),
+        ('FONTSIZE', (0, 0), (-1, -1), 9),
+    ]))
+    elements.append(proposta_table)
+    
+    # Tabela de itens
+    descricao_style = ParagraphStyle(
+        'Descricao',
+        parent=styles['Normal'],
+        fontSize=8,
+        leading=10,
+        alignment=TA_LEFT,
+    )
+    
+    # Montada em blocos de poucas linhas, empilhados sem espaço: o resultado é o mesmo de
+    # uma tabela única, mas o ReportLab não precisa ter todas as linhas nem dividi-la página a página
+    tabela_itens = _blocos_tabela_itens(orcamento, itens, descricao_style)
+    
+    finais = []
+    
+    # Texto de concordância
+    texto_concordancia = """
+    Proponho o fornecimento dos produtos nos valores mencionados, sob as condições gerais 
+    e específicas, indicadas neste formulário com as quais concordo.
+    """
+    finais.append(Paragraph(texto_concordancia, styles['Normal']))
+    
+    # Empresa e CNPJ
+    finais.append(Paragraph(f"<b>{orcamento.empresa.nome}</b> - CNPJ: {orcamento.empresa.cnpj}", 
+                             ParagraphStyle('Center', parent=styles['Normal'], alignment=TA_CENTER)))
+    #finais.append(Spacer(1, 15*mm))
+    
+    # Linha de assinatura
+    finais.append(Spacer(1, 25*mm))  # aumenta o espaço vertical
+    linha_assinatura = Table([['_' * 60]], colWidths=[150*mm])
+    linha_assinatura.setStyle(TableStyle([
+        ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
+        ('FONTSIZE', (0, 0), (-1, -1), 10),
+    ]))
+    finais.append(linha_assinatura)
+    finais.append(Paragraph("Assinatura e Carimbo", 
+                             ParagraphStyle('Center', parent=styles['Normal'], alignment=TA_CENTER, fontSize=9)))
+    
+    # Construir PDF
+    doc.build(_ElementosSobDemanda(itertools.chain(elements, tabela_itens, finais)))
+    
+    # Retornar PDF
+    buffer.seek(0)
+    return buffer
+
+
+def _formatar_moeda(valor):
+    return f'R$ {valor:,.2f}'.replace(',', 'X').replace('.', ',').replace('X', '.')
+
+
+def _blocos_tabela_itens(orcamento, itens, descricao_style):
+    """Gera a tabela de itens em Tables de ITENS_POR_BLOCO linhas (cabeçalho no primeiro, total no último)"""
+    cor = colors.HexColor(orcamento.empresa.cor)
+    larguras = [10*mm, 15*mm, 15*mm, 65*mm, 30*mm, 25*mm, 28*mm]
+    
+    def bloco(linhas, cabecalho=False, total=False):
+        primeira = 1 if cabecalho else 0
+        estilo = [
+            ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
+            ('ALIGN', (3, primeira), (3, -1), 'LEFT'),
+            ('FONTSIZE', (0, primeira), (-1, -1), 8),
+        ]
+        # A grade não cobre a linha de total (que pode vir sozinha no último bloco)
+        ultima_grade = len(linhas) - (2 if total else 1)
+        if ultima_grade >= 0:
+            estilo.append(('GRID', (0, 0), (-1, ultima_grade), 1, colors.grey))
+        if cabecalho:
+            estilo += [
+                ('BACKGROUND', (0, 0), (-1, 0), cor),
+                ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+                ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+                ('FONTSIZE', (0, 0), (-1, 0), 9),
+                ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
+            ]
+        if total:
+            estilo += [
+                ('LINEABOVE', (0, -1), (-1, -1), 2, cor),
+                ('BACKGROUND', (0, -1), (-1, -1), colors.lightgrey),
+                ('FONTNAME', (5, -1), (-1, -1), 'Helvetica-Bold'),
+            ]
+        tabela = Table(linhas, colWidths=larguras)
+        tabela.setStyle(TableStyle(estilo))
+        return tabela
+    
+    linhas = [['#', 'Und', 'Qtd', 'Descrição', 'Marca', 'Valor Unit.', 'Total']]
+    cabecalho = True
+    for item in itens:
+        linhas.append([
+            str(item.numero_item),
+            item.unidade.sigla,
+            str(item.quantidade),
+            Paragraph(item.descricao, descricao_style),  # ✅ quebra automática
+            item.marca or '-',
+            _formatar_moeda(item.valor_unitario),
+            _formatar_moeda(item.valor_total),
+        ])
+        if len(linhas) == ITENS_POR_BLOCO:
+            yield bloco(linhas, cabecalho=cabecalho)
+            linhas, cabecalho = [], False
+    
+    # Linha de total
+    linhas.append(['', '', '', '', '', 'TOTAL:', _formatar_moeda(orcamento.total)])
+    yield bloco(linhas, cabecalho=cabecalho, total=True)
@@ -0,0 +1,365 @@
+# orcamentos/importacao.py
+"""Importação do banco SQLite de outra instalação do sistema (manage.py importar_sqlite).
+
+O arquivo é aberto somente para leitura e lido em lotes por faixa de id, sem carregar
+tabelas inteiras. As colunas de cada tabela são lidas com PRAGMA table_info, o que cobre
+as versões de esquema das migrações existentes: item com a unidade em texto (orcamentos
+0001), empresa sem CNPJ/contato, orçamento sem validade_dias, prazo_entrega ou bloqueado,
+pedido de um produto só, sem tabela de itens (pedidos 0001).
+
+Os ids mudam: empresas e unidades de medida são reaproveitadas quando já existem (CNPJ
+ou nome; sigla), o resto ganha linhas novas, e os orçamentos são renumerados na sequência
+da empresa de destino. Cada lote é gravado numa transação junto com o MapeamentoImportacao
+das suas linhas: interrompida, a importação recomeça depois do último lote gravado.
+"""
+import sqlite3
+from contextlib import contextmanager
+from datetime import UTC, date, datetime, timedelta
+from pathlib import Path
+
+from django.apps import apps
+from django.conf import settings
+from django.db import models, transaction
+from django.db.models import F, Max
+from django.db.models.functions import Round
+from django.utils import timezone
+
+from .models import (
+    Cliente, Empresa, ItemOrcamento, MapeamentoImportacao, Orcamento, UnidadeMedida, subtotal_itens,
+)
+
+# Choices do CharField unidade de ItemOrcamento até a migração 0002 criar UnidadeMedida
+UNIDADES_0001 = {
+    'mts': 'Metros', 'unid': 'Unidade', 'pça': 'Peça', 'kg': 'Quilograma',
+    'm²': 'Metro Quadrado', 'm³': 'Metro Cúbico', 'lt': 'Litro', 'cx': 'Caixa',
+}
+
+# Tabelas com linhas próprias na origem, na ordem de importação (as chaves estrangeiras
+# apontam sempre para uma tabela anterior). Os itens vão junto com o seu documento
+TABELAS = [
+    'orcamentos_empresa', 'orcamentos_unidademedida', 'orcamentos_cliente',
+    'orcamentos_orcamento', 'pedidos_pedido',
+]
+
+
+@contextmanager
+def datas_originais(*modelos):
+    """Desliga auto_now/auto_now_add: as datas vêm do banco importado, não da hora da importação"""
+    campos = [
+        (campo, campo.auto_now, campo.auto_now_add)
+        for modelo in modelos
+        for campo in modelo._meta.concrete_fields
+        if getattr(campo, 'auto_now', False) or getattr(campo, 'auto_now_add', False)
+    ]
+    for campo, _, _ in campos:
+        campo.auto_now = campo.auto_now_add = False
+    try:
+        yield
+    finally:
+        for campo, auto_now, auto_now_add in campos:
+            campo.auto_now, campo.auto_now_add = auto_now, auto_now_add
+
+
+def _converter(modelo, **valores):
+    """Valores da origem (texto, int e float do SQLite) convertidos pelos próprios campos do modelo"""
+    convertidos = {}
+    for nome, valor in valores.items():
+        campo = modelo._meta.get_field(nome)
+        if valor is None and (getattr(campo, 'auto_now', False) or getattr(campo, 'auto_now_add', False)):
+            valor = timezone.now() if isinstance(campo, models.DateTimeField) else date.today()
+        valor = campo.to_python(valor)
+        # Com USE_TZ o Django grava as datas/horas do SQLite em UTC, sem fuso
+        if isinstance(valor, datetime) and settings.USE_TZ and timezone.is_naive(valor):
+            valor = timezone.make_aware(valor, UTC)
+        convertidos[campo.attname] = valor
+    return convertidos
+
+
+class ImportadorSQLite:
+    """Copia empresas, clientes, unidades, orçamentos e pedidos de `caminho` para o banco principal"""
+
+    def __init__(self, caminho, origem, lote=500):
+        caminho = Path(caminho)
+        if not caminho.is_file():
+            raise ValueError(f'Arquivo {caminho} não encontrado.')
+        self.fonte = sqlite3.connect(f'{caminho.resolve().as_uri()}?mode=ro', uri=True)
+        self.fonte.row_factory = sqlite3.Row
+        self.origem = origem
+        self.lote = lote
+        self._colunas = {}
+        if not any(self.colunas(tabela) for tabela in TABELAS):
+            self.fonte.close()
+            raise ValueError(f'{caminho} não tem tabelas deste sistema.')
+        self._siglas = None
+
+    def fechar(self):
+        self.fonte.close()
+
+    def colunas(self, tabela):
+        """Colunas da tabela na origem (vazio se a tabela não existe nessa versão)"""
+        if tabela not in self._colunas:
+            self._colunas[tabela] = {linha['name'] for linha in self.fonte.execute(f'PRAGMA table_info("{tabela}")')}
+        return self._colunas[tabela]
+
+    def resumo(self):
+        """[(tabela, linhas na origem, já importadas)] das tabelas presentes na origem"""
+        return [
+            (
+                tabela,
+                self.fonte.execute(f'SELECT COUNT(*) FROM "{tabela}"').fetchone()[0],
+                MapeamentoImportacao.objects.filter(origem=self.origem, tabela=tabela).count(),
+            )
+            for tabela in TABELAS if self.colunas(tabela)
+        ]
+
+    def importar(self):
+        """Importa o que falta; gera (tabela, linhas) a cada lote gravado"""
+        yield from self._importar('orcamentos_empresa', self._empresas)
+        yield from self._importar('orcamentos_unidademedida', self._unidades)
+        yield from self._importar('orcamentos_cliente', self._clientes)
+        yield from self._importar('orcamentos_orcamento', self._orcamentos)
+        if apps.is_installed('pedidos'):
+            yield from self._importar('pedidos_pedido', self._pedidos)
+
+    def _importar(self, tabela, gravar):
+        if not self.colunas(tabela):
+            return
+        ultimo = MapeamentoImportacao.objects.filter(
+            origem=self.origem, tabela=tabela
+        ).aggregate(ultimo=Max('id_origem'))['ultimo'] or 0
+
+        while True:
+            linhas = [dict(linha) for linha in self.fonte.execute(
+                f'SELECT * FROM "{tabela}" WHERE id > ? ORDER BY id LIMIT ?', (ultimo, self.lote)
+            )]
+            if not linhas:
+                return
+            with transaction.atomic(), datas_originais(*self._modelos()):
+                destinos = gravar(linhas)
+                MapeamentoImportacao.objects.bulk_create(
+                    MapeamentoImportacao(origem=self.origem, tabela=tabela, id_origem=linha['id'], id_destino=destino)
+                    for linha, destino in zip(linhas, destinos)
+                )
+            ultimo = linhas[-1]['id']
+            yield tabela, len(linhas)
+
+    def _modelos(self):
+        modelos = [Empresa, Cliente, Orcamento]
+        if apps.is_installed('pedidos'):
+            modelos.append(apps.get_model('pedidos', 'Pedido'))
+        return modelos
+
+    def _destinos(self, tabela, ids):
+        """{id na origem: id no destino} das linhas já importadas de `tabela`"""
+        destinos = dict(
+            MapeamentoImportacao.objects.filter(origem=self.origem, tabela=tabela, id_origem__in=ids)
+            .values_list('id_origem', 'id_destino')
+        )
+        faltando = set(ids) - set(destinos) - {None}
+        if faltando:
+            raise ValueError(f'{tabela}: ids {sorted(faltando)[:10]} da origem não foram importados.')
+        return destinos
+
+    def _filhos(self, tabela, coluna_pai, ids):
+        """Linhas de `tabela` dos documentos `ids`, em lotes, na ordem do documento e do item"""
+        if not self.colunas(tabela):
+            return
+        cursor = self.fonte.execute(
+            f'SELECT * FROM "{tabela}" WHERE {coluna_pai} IN ({", ".join("?" * len(ids))}) '
+            f'ORDER BY {coluna_pai}, numero_item',
+            list(ids),
+        )
+        for linhas in iter(lambda: cursor.fetchmany(self.lote), []):
+            yield [dict(linha) for linha in linhas]
+
+    def _empresas(self, linhas):
+        destinos = []
+        for linha in linhas:
+            # CNPJ e contato só existem a partir da 0002 (e ficaram opcionais até a 0004)
+            cnpj = (linha.get('cnpj') or '').strip()
+            existentes = Empresa.objects.filter(cnpj=cnpj) if cnpj else Empresa.objects.filter(nome__iexact=linha['nome'])
+            empresa = existentes.order_by('id').first()
+            if empresa is None:
+                # O logo é um arquivo da outra instalação: não vem junto
+                empresa = Empresa.objects.create(**_converter(
+                    Empresa,
+                    nome=linha['nome'],
+                    cnpj=cnpj,
+                    endereco=linha.get('endereco') or '',
+                    telefone=linha.get('telefone') or '',
+                    email=linha.get('email') or '',
+                    cor=linha.get('cor') or '#2563eb',
+                    ativa=linha['ativa'],
+                    criado_em=linha['criado_em'],
+                ))
+            destinos.append(empresa.pk)
+        return destinos
+
+    def _unidade(self, sigla, descricao=None, ativa=True):
+        """Id da unidade com a sigla (sem diferenciar maiúsculas), criada se ainda não existir"""
+        if self._siglas is None:
+            self._siglas = {s.upper(): pk for s, pk in UnidadeMedida.objects.values_list('sigla', 'id')}
+        chave = sigla.strip().upper()
+        if chave not in self._siglas:
+            unidade = UnidadeMedida.objects.create(
+                sigla=chave,
+                descricao=(descricao or UNIDADES_0001.get(sigla.strip(), chave)).upper(),
+                ativa=ativa,
+            )
+            self._siglas[chave] = unidade.pk
+        return self._siglas[chave]
+
+    def _unidades(self, linhas):
+        return [self._unidade(linha['sigla'], linha['descricao'], bool(linha['ativa'])) for linha in linhas]
+
+    def _clientes(self, linhas):
+        clientes = [
+            # Mesma normalização de Cliente.save(), que o bulk_create não chama
+            Cliente(**_converter(
+                Cliente,
+                nome=(linha['nome'] or '').upper(),
+                cpf_cnpj=linha['cpf_cnpj'],
+                endereco=(linha['endereco'] or '').upper(),
+                telefone=linha['telefone'],
+                email=linha['email'],
+                criado_em=linha['criado_em'],
+                atualizado_em=linha['atualizado_em'],
+            ))
+            for linha in linhas
+        ]
+        Cliente.objects.bulk_create(clientes)
+        return [cliente.pk for cliente in clientes]
+
+    def _proximo_numero(self, empresa_id):
+        """Próximo número da sequência da empresa, pelo mesmo critério de Orcamento.save()"""
+        ultimo = Orcamento.objects.filter(empresa_id=empresa_id).order_by('-id').values_list('numero', flat=True).first()
+        return int(ultimo.split('-')[-1]) + 1 if ultimo else 1
+
+    def _orcamentos(self, linhas):
+        empresas = self._destinos('orcamentos_empresa', {linha['empresa_id'] for linha in linhas})
+        clientes = self._destinos('orcamentos_cliente', {linha['cliente_id'] for linha in linhas})
+        proximos = {}
+        orcamentos = []
+        for linha in linhas:
+            empresa_id = empresas[linha['empresa_id']]
+            if empresa_id not in proximos:
+                proximos[empresa_id] = self._proximo_numero(empresa_id)
+            numero, proximos[empresa_id] = proximos[empresa_id], proximos[empresa_id] + 1
+
+            orcamento = Orcamento(
+                empresa_id=empresa_id,
+                cliente_id=clientes[linha['cliente_id']],
+                numero=f'ORC-{empresa_id}-{numero:05d}',
+                **_converter(
+                    Orcamento,
+                    data_emissao=linha['data_emissao'],
+                    validade_dias=linha.get('validade_dias') or 15,
+                    prazo_entrega=(linha.get('prazo_entrega') or 'A Combinar').upper(),
+                    status=linha['status'],
+                    observacoes=(linha['observacoes'] or '').upper(),
+                    desconto=linha['desconto'],
+                    bloqueado=linha.get('bloqueado') or False,
+                    criado_em=linha['criado_em'],
+                    atualizado_em=linha['atualizado_em'],
+                ),
+            )
+            # Validade derivada da emissão, como em Orcamento.save()
+            orcamento.data_validade = orcamento.data_emissao + timedelta(days=orcamento.validade_dias)
+            orcamentos.append(orcamento)
+        Orcamento.objects.bulk_create(orcamentos)
+
+        novos = {linha['id']: orcamento.pk for linha, orcamento in zip(linhas, orcamentos)}
+        self._itens_orcamento(novos)
+        # Total recalculado dos itens gravados (o da origem pode estar desatualizado), como calcular_total()
+        Orcamento.objects.filter(id__in=novos.values()).update(total=Round(subtotal_itens() - F('desconto'), 2))
+        return list(novos.values())
+
+    def _itens_orcamento(self, novos):
+        tabela = 'orcamentos_itemorcamento'
+        unidades = None
+        for linhas in self._filhos(tabela, 'orcamento_id', novos):
+            if unidades is None:
+                unidades = dict(
+                    MapeamentoImportacao.objects.filter(origem=self.origem, tabela='orcamentos_unidademedida')
+                    .values_list('id_origem', 'id_destino')
+                )
+            itens = []
+            for linha in linhas:
+                item = ItemOrcamento(
+                    orcamento_id=novos[linha['orcamento_id']],
+                    unidade_id=self._unidade_item(linha, unidades),
+                    **_converter(
+                        ItemOrcamento,
+                        numero_item=linha['numero_item'],
+                        quantidade=linha['quantidade'],
+                        descricao=linha['descricao'] or '',
+                        marca=linha['marca'] or '',
+                        valor_unitario=linha['valor_unitario'],
+                    ),
+                )
+                item.normalizar()
+                itens.append(item)
+            ItemOrcamento.objects.bulk_create(itens)
+
+    def _unidade_item(self, linha, unidades):
+        if 'unidade_id' not in linha:
+            return self._unidade(linha['unidade'])
+        valor = linha['unidade_id']
+        # A 0002 trocou o CharField pela chave estrangeira sem converter os dados:
+        # bancos migrados com itens antigos guardam a sigla em texto em unidade_id
+        if isinstance(valor, str):
+            return self._unidade(valor)
+        if valor not in unidades:
+            raise ValueError(f'orcamentos_unidademedida: id {valor} da origem não foi importado.')
+        return unidades[valor]
+
+    def _pedidos(self, linhas):
+        Pedido = apps.get_model('pedidos', 'Pedido')
+        ItemPedido = apps.get_model('pedidos', 'ItemPedido')
+        pedidos = [
+            Pedido(**_converter(
+                Pedido,
+                # pedidos 0001: orgao_comprador e numero_pedido (renomeados/trocados na 0002)
+                orgao=linha.get('orgao', linha.get('orgao_comprador')) or 'LEGADO',
+                numero_pregao=linha.get('numero_pregao', linha.get('numero_pedido')) or '',
+                numero_empenho=linha.get('numero_empenho'),
+                data_pedido=linha['data_pedido'],
+                status=linha['status'],
+                criado_em=linha['criado_em'],
+            ))
+            for linha in linhas
+        ]
+        Pedido.objects.bulk_create(pedidos)
+        novos = {linha['id']: pedido.pk for linha, pedido in zip(linhas, pedidos)}
+
+        if 'produto' in self.colunas('pedidos_pedido'):
+            # pedidos 0001: um produto por pedido, sem preço; vira o item 1
+            lotes = [[
+                {
+                    'pedido_id': linha['id'], 'numero_item': 1, 'descricao': linha['produto'],
+                    'unidade': 'UN', 'quantidade': linha['quantidade'], 'marca': linha['marca'],
+                    'valor_unitario': 0, 'observacoes': '',
+                }
+                for linha in linhas
+            ]]
+        else:
+            lotes = self._filhos('pedidos_itempedido', 'pedido_id', novos)
+        for itens in lotes:
+            itens = [
+                ItemPedido(pedido_id=novos[item['pedido_id']], **_converter(
+                    ItemPedido,
+                    numero_item=item['numero_item'],
+                    descricao=item['descricao'] or '',
+                    unidade=item['unidade'],
+                    quantidade=item['quantidade'],
+                    marca=item['marca'] or '',
+                    valor_unitario=item['valor_unitario'],
+                    observacoes=item['observacoes'] or '',
+                ))
+                for item in itens
+            ]
+            for item in itens:
+                # bulk_create não chama save(), então o total é calculado aqui
+                item.valor_total = item.quantidade * item.valor_unitario
+            ItemPedido.objects.bulk_create(itens)
+        return list(novos.values())
@@ -0,0 +1,127 @@
+# orcamentos/management/commands/arquivar_orcamentos.py
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections, transaction
+from django.db.models.constants import OnConflict
+from django.utils import timezone
+
+from orcamentos.models import Cliente, Empresa, ItemOrcamento, Orcamento, UnidadeMedida
+
+BANCO_ARQUIVO = 'arquivo'
+
+
+def copiar_linhas(model, queryset, destino):
+    """Copia as linhas como estão (ids e datas preservados) para o banco de destino.
+
+    Usa INSERT ... ON CONFLICT DO NOTHING: rodar de novo após uma interrupção não duplica nada.
+    """
+    conexao = connections[destino]
+    campos = model._meta.concrete_fields
+    linhas = [
+        [campo.get_db_prep_save(valor, conexao) for campo, valor in zip(campos, linha)]
+        for linha in queryset.values_list(*[campo.attname for campo in campos])
+    ]
+    if not linhas:
+        return 0
+
+    ops = conexao.ops
+    sql = '%s %s (%s) VALUES (%s) %s' % (
+        ops.insert_statement(on_conflict=OnConflict.IGNORE),
+        ops.quote_name(model._meta.db_table),
+        ', '.join(ops.quote_name(campo.column) for campo in campos),
+        ', '.join(['%s'] * len(campos)),
+        ops.on_conflict_suffix_sql(campos, OnConflict.IGNORE, None, None),
+    )
+    with conexao.cursor() as cursor:
+        cursor.executemany(sql, linhas)
+    return len(linhas)
+
+
+class Command(BaseCommand):
+    help = (
+        'Move orçamentos antigos (e seus itens e clientes) para o banco "arquivo" em lotes pequenos. '
+        'Pode rodar com o sistema no ar e ser interrompido e retomado a qualquer momento.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dias', type=int, default=settings.ARQUIVO_RETENCAO_DIAS,
+                            help='Arquiva orçamentos emitidos há mais de N dias')
+        parser.add_argument('--status', action='append',
+                            help='Status arquiváveis (pode repetir; padrão: ARQUIVO_STATUS)')
+        parser.add_argument('--lote', type=int, default=200, help='Orçamentos por transação')
+        parser.add_argument('--pausa', type=float, default=0.2,
+                            help='Segundos entre lotes, para liberar o banco aos usuários')
+        parser.add_argument('--limite', type=int, help='Máximo de orçamentos nesta execução')
+        parser.add_argument('--simular', action='store_true', help='Apenas conta o que seria arquivado')
+
+    def handle(self, *args, **options):
+        if BANCO_ARQUIVO not in settings.DATABASES:
+            raise CommandError(f'Banco "{BANCO_ARQUIVO}" não configurado em DATABASES.')
+
+        corte = timezone.localdate() - timedelta(days=options['dias'])
+        candidatos = Orcamento.objects.filter(
+            data_emissao__lt=corte,
+            status__in=options['status'] or settings.ARQUIVO_STATUS,
+            bloqueado=False,
+        )
+
+        if options['simular']:
+            self.stdout.write(f'{candidatos.count()} orçamentos emitidos antes de {corte:%d/%m/%Y} seriam arquivados.')
+            return
+
+        arquivados = 0
+        while options['limite'] is None or arquivados < options['limite']:
+            tamanho = options['lote']
+            if options['limite'] is not None:
+                tamanho = min(tamanho, options['limite'] - arquivados)
+            ids = list(candidatos.order_by('id').values_list('id', flat=True)[:tamanho])
+            if not ids:
+                break
+
+            movidos = self._mover_lote(candidatos, ids)
+            arquivados += movidos
+            self.stdout.write(f'  lote até id {ids[-1]}: {movidos} de {len(ids)} arquivados')
+            if movidos == 0:
+                # Todos foram alterados durante a cópia; tentar de novo já pegaria os mesmos
+                break
+            time.sleep(options['pausa'])
+
+        self.stdout.write(self.style.SUCCESS(f'{arquivados} orçamentos arquivados.'))
+
+    def _mover_lote(self, candidatos, ids):
+        inicio = timezone.now()
+        orcamentos = Orcamento.objects.filter(id__in=ids)
+
+        # 1) Copia para o arquivo (transação só no banco de arquivo)
+        with transaction.atomic(using=BANCO_ARQUIVO):
+            copiar_linhas(Empresa, Empresa.objects.filter(id__in=orcamentos.values('empresa_id')), BANCO_ARQUIVO)
+            copiar_linhas(Cliente, Cliente.objects.filter(id__in=orcamentos.values('cliente_id')), BANCO_ARQUIVO)
+            itens = ItemOrcamento.objects.filter(orcamento_id__in=ids)
+            copiar_linhas(UnidadeMedida, UnidadeMedida.objects.filter(id__in=itens.values('unidade_id')), BANCO_ARQUIVO)
+            copiar_linhas(Orcamento, orcamentos, BANCO_ARQUIVO)
+            copiar_linhas(ItemOrcamento, itens, BANCO_ARQUIVO)
+
+        # 2) Remove do banco principal só o que não mudou desde a leitura (transação curta)
+        with transaction.atomic():
+            removiveis = list(
+                candidatos.filter(id__in=ids, atualizado_em__lt=inicio).values_list('id', 'cliente_id')
+            )
+            ids_removidos = [orcamento_id for orcamento_id, _ in removiveis]
+            ItemOrcamento.objects.filter(orcamento_id__in=ids_removidos).delete()
+            Orcamento.objects.filter(id__in=ids_removidos).delete()
+            # Cada orçamento tem o seu cliente; só sai se nenhum outro orçamento o usa
+            Cliente.objects.filter(
+                id__in=[cliente_id for _, cliente_id in removiveis], orcamentos__isnull=True
+            ).delete()
+
+        # 3) Orçamentos editados durante a cópia continuam ativos: desfaz a cópia deles
+        alterados = set(ids) - set(ids_removidos)
+        if alterados:
+            with transaction.atomic(using=BANCO_ARQUIVO):
+                ItemOrcamento.objects.using(BANCO_ARQUIVO).filter(orcamento_id__in=alterados).delete()
+                Orcamento.objects.using(BANCO_ARQUIVO).filter(id__in=alterados).delete()
+
+        return len(ids_removidos)
@@ -0,0 +1,35 @@
+# orcamentos/management/commands/atualizar_replica.py
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+
+from orcamentos.replica import atualizar_replica
+from orcamentos.roteadores import BANCO_LEITURA
+
+
+class Command(BaseCommand):
+    help = (
+        'Atualiza a cópia de leitura usada por relatórios, exportações e buscas. '
+        'Rode pelo cron ou deixe em execução com --intervalo.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--intervalo', type=float,
+                            help='Repete a cópia a cada N segundos até ser interrompido')
+
+    def handle(self, *args, **options):
+        if BANCO_LEITURA not in connections.databases:
+            raise CommandError(f'Banco "{BANCO_LEITURA}" não configurado em DATABASES.')
+
+        while True:
+            inicio = time.monotonic()
+            try:
+                atualizar_replica()
+            except ValueError as e:
+                raise CommandError(str(e))
+            self.stdout.write(f'Réplica atualizada em {time.monotonic() - inicio:.2f}s')
+
+            if not options['intervalo']:
+                break
+            time.sleep(max(0, options['intervalo'] - (time.monotonic() - inicio)))
@@ -0,0 +1,53 @@
+# orcamentos/management/commands/compactar_alteracoes.py
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.db.models import Min
+from django.utils import timezone
+
+from orcamentos.models import Alteracao, ConsumidorAlteracoes
+
+
+class Command(BaseCommand):
+    help = (
+        'Apaga do log de alterações o que todos os consumidores já processaram, '
+        'em lotes pequenos por faixa de id.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dias', type=int,
+                            help='Apaga também o que tiver mais de N dias, mesmo sem ter sido lido '
+                                 '(consumidor parado não segura o log para sempre)')
+        parser.add_argument('--lote', type=int, default=5000, help='Alterações por DELETE')
+        parser.add_argument('--pausa', type=float, default=0.1,
+                            help='Segundos entre lotes, para liberar o banco aos usuários')
+        parser.add_argument('--simular', action='store_true', help='Apenas conta o que seria apagado')
+
+    def handle(self, *args, **options):
+        # Sem consumidores nada foi lido: só o corte por idade apaga
+        limite = ConsumidorAlteracoes.objects.aggregate(menor=Min('posicao'))['menor'] or 0
+        if options['dias'] is not None:
+            corte = timezone.now() - timedelta(days=options['dias'])
+            antigas = Alteracao.objects.filter(criado_em__lt=corte).order_by('-id').values_list('id', flat=True).first()
+            limite = max(limite, antigas or 0)
+
+        primeira = Alteracao.objects.order_by('id').values_list('id', flat=True).first()
+        if primeira is None or primeira > limite:
+            self.stdout.write('Nada a compactar.')
+            return
+
+        if options['simular']:
+            self.stdout.write(f'{Alteracao.objects.filter(id__lte=limite).count()} alterações até o id {limite} seriam apagadas.')
+            return
+
+        apagadas = 0
+        inicio = primeira
+        while inicio <= limite:
+            fim = min(limite, inicio + options['lote'] - 1)
+            apagadas += Alteracao.objects.filter(id__gte=inicio, id__lte=fim).delete()[0]
+            inicio = fim + 1
+            if inicio <= limite:
+                time.sleep(options['pausa'])
+
+        self.stdout.write(self.style.SUCCESS(f'{apagadas} alterações apagadas (até o id {limite}).'))
@@ -0,0 +1,90 @@
+# orcamentos/management/commands/comparar_wsgi_asgi.py
+import asyncio
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand, CommandError
+from django.test import AsyncClient, Client
+from django.urls import reverse
+
+from orcamentos.models import Orcamento
+
+
+class Command(BaseCommand):
+    help = (
+        'Compara a vazão das views de leitura pelos handlers WSGI e ASGI do Django, '
+        'em processo, com N clientes simultâneos'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--clientes', type=int, default=50, help='Requisições simultâneas')
+        parser.add_argument('--requisicoes', type=int, default=500, help='Requisições por URL em cada modo')
+        parser.add_argument('--url', action='append', dest='urls', help='URL a medir (pode repetir)')
+        parser.add_argument('--host', default='localhost', help='Cabeçalho Host enviado (precisa estar em ALLOWED_HOSTS)')
+
+    def handle(self, *args, **options):
+        urls = options['urls'] or self._urls_padrao()
+        clientes = options['clientes']
+        total = options['requisicoes']
+
+        self.stdout.write(f'{clientes} clientes simultâneos, {total} requisições por URL\n')
+        for url in urls:
+            wsgi = self._medir_wsgi(url, clientes, total, options['host'])
+            asgi = asyncio.run(self._medir_asgi(url, clientes, total, options['host']))
+            self.stdout.write(url)
+            self._relatar('WSGI', *wsgi)
+            self._relatar('ASGI', *asgi)
+
+    def _urls_padrao(self):
+        urls = [reverse('orcamentos:listar_orcamentos'), reverse('lista_pedidos')]
+        orcamento = Orcamento.objects.order_by('-id').first()
+        if orcamento is None:
+            raise CommandError('Nenhum orçamento cadastrado; informe as URLs com --url.')
+        urls.append(reverse('orcamentos:visualizar_orcamento', args=[orcamento.id]))
+        urls.append(reverse('orcamentos:gerar_pdf', args=[orcamento.id]))
+        return urls
+
+    def _medir_wsgi(self, url, clientes, total, host):
+        # Cada thread usa o próprio Client (handler WSGI) e a própria conexão com o banco
+        def requisicao(_):
+            client = Client(headers={'host': host})
+            inicio = time.perf_counter()
+            resposta = client.get(url)
+            if hasattr(resposta, 'streaming_content'):
+                b''.join(resposta.streaming_content)
+            return time.perf_counter() - inicio, resposta.status_code
+
+        inicio = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=clientes) as pool:
+            resultados = list(pool.map(requisicao, range(total)))
+        return time.perf_counter() - inicio, resultados
+
+    async def _medir_asgi(self, url, clientes, total, host):
+        limite = asyncio.Semaphore(clientes)
+
+        async def requisicao():
+            async with limite:
+                client = AsyncClient(headers={'host': host})
+                inicio = time.perf_counter()
+                resposta = await client.get(url)
+                if getattr(resposta, 'is_async', False):
+                    async for _ in resposta.streaming_content:
+                        pass
+                elif hasattr(resposta, 'streaming_content'):
+                    b''.join(resposta.streaming_content)
+                return time.perf_counter() - inicio, resposta.status_code
+
+        inicio = time.perf_counter()
+        resultados = await asyncio.gather(*(requisicao() for _ in range(total)))
+        return time.perf_counter() - inicio, resultados
+
+    def _relatar(self, modo, duracao, resultados):
+        tempos = sorted(tempo for tempo, _ in resultados)
+        erros = sum(1 for _, status in resultados if status >= 400)
+        p95 = tempos[int(len(tempos) * 0.95) - 1] if len(tempos) > 1 else tempos[0]
+        self.stdout.write(
+            f'  {modo}: {len(resultados) / duracao:8.1f} req/s | '
+            f'p50 {statistics.median(tempos) * 1000:7.1f} ms | '
+            f'p95 {p95 * 1000:7.1f} ms | erros {erros}'
+        )
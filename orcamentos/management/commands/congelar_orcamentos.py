@@ -0,0 +1,39 @@
+# orcamentos/management/commands/congelar_orcamentos.py
+import time
+
+from django.core.management.base import BaseCommand
+
+from orcamentos.models import Orcamento, RetratoOrcamento
+
+
+class Command(BaseCommand):
+    help = (
+        'Grava o retrato congelado dos orçamentos bloqueados que ainda não têm um '
+        '(pedidos gerados antes do retrato existir ou bloqueados pelo admin).'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--lote', type=int, default=200, help='Orçamentos por lote')
+        parser.add_argument('--pausa', type=float, default=0.1,
+                            help='Segundos entre lotes, para liberar o banco aos usuários')
+        parser.add_argument('--refazer', action='store_true',
+                            help='Refaz também os retratos existentes (com os dados atuais do banco)')
+        parser.add_argument('--simular', action='store_true', help='Apenas conta o que seria congelado')
+
+    def handle(self, *args, **options):
+        bloqueados = Orcamento.objects.filter(bloqueado=True)
+        if not options['refazer']:
+            bloqueados = bloqueados.filter(retrato__isnull=True)
+        ids = list(bloqueados.order_by('id').values_list('id', flat=True))
+
+        if options['simular']:
+            self.stdout.write(f'{len(ids)} orçamentos bloqueados seriam congelados.')
+            return
+
+        for inicio in range(0, len(ids), options['lote']):
+            for orcamento in Orcamento.objects.filter(id__in=ids[inicio:inicio + options['lote']]):
+                RetratoOrcamento.congelar(orcamento)
+            if inicio + options['lote'] < len(ids):
+                time.sleep(options['pausa'])
+
+        self.stdout.write(self.style.SUCCESS(f'{len(ids)} orçamentos congelados.'))
@@ -0,0 +1,99 @@
+# orcamentos/management/commands/construir_estaticos.py
+import json
+import re
+import shutil
+import subprocess
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+
+APP_DIR = Path(__file__).resolve().parent.parent.parent
+TEMPLATES_DIR = APP_DIR / 'templates'
+ENTRADA_TAILWIND = APP_DIR / 'assets' / 'tailwind.css'
+STATIC_DIR = APP_DIR / 'static' / 'orcamentos'
+SAIDA_TAILWIND = STATIC_DIR / 'css' / 'tailwind.min.css'
+SAIDA_ICONES_CSS = STATIC_DIR / 'css' / 'icones.css'
+SAIDA_FONTE = STATIC_DIR / 'webfonts' / 'fa-solid-900-subset.woff2'
+
+ESTILOS_FA = {'fa', 'fas', 'fa-solid', 'far', 'fa-regular', 'fab', 'fa-brands'}
+
+CSS_BASE_ICONES = """/*!
+ * Subconjunto de Font Awesome Free {versao} by @fontawesome - https://fontawesome.com
+ * License - https://fontawesome.com/license/free (Icons: CC BY 4.0, Fonts: SIL OFL 1.1, Code: MIT License)
+ * Gerado por `manage.py construir_estaticos`; não editar à mão.
+ */
+@font-face{{font-family:"Font Awesome 6 Free";font-style:normal;font-weight:900;font-display:block;src:url("../webfonts/{fonte}") format("woff2")}}
+.fa,.fas,.fa-solid{{-moz-osx-font-smoothing:grayscale;-webkit-font-smoothing:antialiased;display:inline-block;font-style:normal;font-variant:normal;line-height:1;text-rendering:auto;font-family:"Font Awesome 6 Free";font-weight:900}}
+"""
+
+
+class Command(BaseCommand):
+    help = (
+        'Gera o CSS do Tailwind (somente as classes usadas nos templates, minificado) e o '
+        'subconjunto da fonte de ícones. Requer tailwindcss-bin, fontawesomefree e fonttools[woff].'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--tailwind', help='Caminho do executável tailwindcss (padrão: o do PATH)')
+
+    def handle(self, *args, **options):
+        self._construir_tailwind(options['tailwind'] or shutil.which('tailwindcss'))
+        self._construir_icones()
+
+    def _construir_tailwind(self, executavel):
+        if not executavel:
+            raise CommandError('Executável tailwindcss não encontrado (pip install tailwindcss-bin).')
+        subprocess.run(
+            [executavel, '--input', str(ENTRADA_TAILWIND), '--output', str(SAIDA_TAILWIND), '--minify'],
+            check=True,
+        )
+        self.stdout.write(f'{SAIDA_TAILWIND.relative_to(APP_DIR)}: {SAIDA_TAILWIND.stat().st_size} bytes')
+
+    def _construir_icones(self):
+        try:
+            import fontawesomefree
+            from fontTools import subset
+        except ImportError:
+            raise CommandError('Instale fontawesomefree e fonttools[woff] para gerar os ícones.')
+
+        base_fa = Path(fontawesomefree.__file__).resolve().parent / 'static' / 'fontawesomefree'
+        icones = json.loads((base_fa / 'metadata' / 'icons.json').read_text(encoding='utf-8'))
+
+        # nome (ou alias) -> código, apenas ícones que existem no estilo solid
+        codigos = {}
+        for nome, dados in icones.items():
+            if 'solid' not in dados.get('styles', []):
+                continue
+            for apelido in [nome] + dados.get('aliases', {}).get('names', []):
+                codigos[apelido] = dados['unicode']
+
+        usados = self._icones_usados(set(codigos))
+        if not usados:
+            raise CommandError('Nenhum ícone encontrado nos templates.')
+
+        opcoes = subset.Options()
+        opcoes.flavor = 'woff2'
+        opcoes.layout_features = ['*']
+        fonte = subset.load_font(str(base_fa / 'webfonts' / 'fa-solid-900.woff2'), opcoes)
+        subsetter = subset.Subsetter(opcoes)
+        subsetter.populate(unicodes={int(codigos[nome], 16) for nome in usados})
+        subsetter.subset(fonte)
+        subset.save_font(fonte, str(SAIDA_FONTE), opcoes)
+
+        versao = re.search(r'Font Awesome Free (\S+)', (base_fa / 'css' / 'fontawesome.css').read_text(encoding='utf-8'))
+        css = CSS_BASE_ICONES.format(versao=versao.group(1) if versao else '', fonte=SAIDA_FONTE.name)
+        css += ''.join(f'.fa-{nome}::before{{content:"\\{codigos[nome]}"}}\n' for nome in sorted(usados))
+        SAIDA_ICONES_CSS.write_text(css, encoding='utf-8')
+
+        self.stdout.write(f'{len(usados)} ícones: {", ".join(sorted(usados))}')
+        self.stdout.write(f'{SAIDA_FONTE.relative_to(APP_DIR)}: {SAIDA_FONTE.stat().st_size} bytes')
+
+    def _icones_usados(self, conhecidos):
+        """Nomes após "fa-" e os nomes montados com tags, como fa-{% if %}check-circle{% endif %}"""
+        usados = set()
+        for template in TEMPLATES_DIR.rglob('*.html'):
+            for linha in template.read_text(encoding='utf-8').splitlines():
+                usados.update(re.findall(r'fa-([a-z0-9-]+)', linha))
+                if 'fa-{%' in linha:
+                    usados.update(re.findall(r'%}\s*([a-z0-9-]+)\s*{%', linha))
+        return {nome for nome in usados if nome in conhecidos and f'fa-{nome}' not in ESTILOS_FA}
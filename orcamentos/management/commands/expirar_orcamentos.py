@@ -0,0 +1,46 @@
+# orcamentos/management/commands/expirar_orcamentos.py
+import time
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import F
+from django.utils import timezone
+
+from orcamentos.models import Orcamento
+
+
+class Command(BaseCommand):
+    help = (
+        'Marca como "expirado" os orçamentos em aberto cuja validade já passou. '
+        'Um único UPDATE no banco, sem carregar os orçamentos; feito para rodar diariamente (cron).'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--data', help='Data de referência AAAA-MM-DD (padrão: hoje)')
+        parser.add_argument('--simular', action='store_true', help='Apenas conta o que seria expirado')
+
+    def handle(self, *args, **options):
+        hoje = timezone.localdate()
+        if options['data']:
+            try:
+                hoje = date.fromisoformat(options['data'])
+            except ValueError:
+                raise CommandError('Data inválida; use o formato AAAA-MM-DD.')
+
+        # Bloqueados já viraram pedido e não mudam de status
+        vencidos = Orcamento.vencidos(hoje).filter(bloqueado=False)
+
+        if options['simular']:
+            self.stdout.write(f'{vencidos.count()} orçamentos com validade anterior a {hoje:%d/%m/%Y} seriam expirados.')
+            return
+
+        inicio = time.perf_counter()
+        expirados = vencidos.update(
+            status='expirado',
+            # Formulários abertos desses orçamentos passam a dar conflito em vez de reabri-los
+            versao=F('versao') + 1,
+            atualizado_em=timezone.now(),
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f'{expirados} orçamentos expirados em {time.perf_counter() - inicio:.2f}s.'
+        ))
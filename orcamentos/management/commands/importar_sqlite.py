@@ -0,0 +1,51 @@
+# orcamentos/management/commands/importar_sqlite.py
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from orcamentos.importacao import ImportadorSQLite
+
+
+class Command(BaseCommand):
+    help = (
+        'Importa empresas, clientes, unidades, orçamentos e pedidos do banco SQLite de outra '
+        'instalação (qualquer versão das migrações) para o banco principal, com ids e números '
+        'de orçamento novos. Pode ser interrompido e retomado: rode de novo com a mesma --origem.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('arquivo', help='Caminho do db.sqlite3 a importar (aberto somente para leitura)')
+        parser.add_argument('--origem', required=True,
+                            help='Nome fixo desta origem (ex.: filial-norte); é a chave da retomada')
+        parser.add_argument('--lote', type=int, default=500, help='Linhas por transação')
+        parser.add_argument('--pausa', type=float, default=0.1,
+                            help='Segundos entre lotes, para liberar o banco aos usuários')
+        parser.add_argument('--simular', action='store_true', help='Apenas conta o que falta importar')
+
+    def handle(self, *args, **options):
+        try:
+            importador = ImportadorSQLite(options['arquivo'], options['origem'], lote=options['lote'])
+        except ValueError as e:
+            raise CommandError(str(e))
+
+        try:
+            if options['simular']:
+                for tabela, total, importadas in importador.resumo():
+                    self.stdout.write(f'{tabela}: {total} na origem, {importadas} já importadas')
+                return
+
+            importadas = {}
+            try:
+                for tabela, quantidade in importador.importar():
+                    importadas[tabela] = importadas.get(tabela, 0) + quantidade
+                    self.stdout.write(f'  {tabela}: +{quantidade}')
+                    time.sleep(options['pausa'])
+            except ValueError as e:
+                raise CommandError(f'{e} Os lotes já gravados ficam; corrija a origem e rode de novo.')
+        finally:
+            importador.fechar()
+
+        resumo = ', '.join(f'{quantidade} {tabela}' for tabela, quantidade in importadas.items())
+        self.stdout.write(self.style.SUCCESS(f'Importação de "{options["origem"]}" concluída: {resumo or "nada novo"}.'))
+        if importadas.get('orcamentos_orcamento'):
+            self.stdout.write('Orçamentos bloqueados importados ficam sem retrato: rode congelar_orcamentos.')
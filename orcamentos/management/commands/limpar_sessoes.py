@@ -0,0 +1,47 @@
+# orcamentos/management/commands/limpar_sessoes.py
+import time
+
+from django.contrib.sessions.models import Session
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.utils import timezone
+
+
+class Command(BaseCommand):
+    help = (
+        'Apaga sessões da tabela django_session em lotes pequenos, sem segurar a trava de '
+        'escrita do SQLite. Use --todas depois de mudar para sessões em cookie (settings_sqlite).'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--todas', action='store_true',
+                            help='Apaga também as sessões válidas (obriga novo login no admin)')
+        parser.add_argument('--lote', type=int, default=500, help='Sessões por DELETE')
+        parser.add_argument('--pausa', type=float, default=0.1,
+                            help='Segundos entre lotes, para liberar o banco aos usuários')
+        parser.add_argument('--vacuum', action='store_true',
+                            help='Ao final, devolve ao disco o espaço liberado (SQLite; trava o banco enquanto roda)')
+        parser.add_argument('--simular', action='store_true', help='Apenas conta o que seria apagado')
+
+    def handle(self, *args, **options):
+        sessoes = Session.objects.all()
+        if not options['todas']:
+            sessoes = sessoes.filter(expire_date__lt=timezone.now())
+
+        if options['simular']:
+            self.stdout.write(f'{sessoes.count()} de {Session.objects.count()} sessões seriam apagadas.')
+            return
+
+        apagadas = 0
+        while True:
+            chaves = list(sessoes.values_list('session_key', flat=True)[:options['lote']])
+            if not chaves:
+                break
+            apagadas += Session.objects.filter(session_key__in=chaves).delete()[0]
+            time.sleep(options['pausa'])
+
+        if options['vacuum'] and connection.vendor == 'sqlite':
+            with connection.cursor() as cursor:
+                cursor.execute('VACUUM')
+
+        self.stdout.write(self.style.SUCCESS(f'{apagadas} sessões apagadas.'))
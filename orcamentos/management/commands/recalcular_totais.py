@@ -0,0 +1,96 @@
+# orcamentos/management/commands/recalcular_totais.py
+from contextlib import nullcontext
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import F
+from django.db.models.functions import Round
+from django.utils import timezone
+
+from orcamentos.models import Orcamento, ItemOrcamento, subtotal_itens, valor_total_itens
+from orcamentos.roteadores import leitura
+
+
+class Command(BaseCommand):
+    help = 'Recalcula e verifica valor_total dos itens e total dos orçamentos direto no banco'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--empresa', type=int, help='Somente orçamentos desta empresa (id)')
+        parser.add_argument('--status', action='append', help='Somente orçamentos com este status (pode repetir)')
+        parser.add_argument('--desde', help='Somente orçamentos emitidos a partir desta data (AAAA-MM-DD)')
+        parser.add_argument('--ids', nargs='+', type=int, help='Somente os orçamentos com estes ids')
+        parser.add_argument('--verificar', action='store_true', help='Apenas relata as divergências, sem corrigir')
+        parser.add_argument('--limite', type=int, default=20, help='Quantidade de divergências listadas no relatório')
+
+    def handle(self, *args, **options):
+        # Só o relatório lê da réplica; a correção precisa ler e gravar no banco principal
+        with leitura() if options['verificar'] else nullcontext():
+            self._executar(options)
+
+    def _executar(self, options):
+        orcamentos = Orcamento.objects.all()
+        if options['empresa']:
+            orcamentos = orcamentos.filter(empresa_id=options['empresa'])
+        if options['status']:
+            orcamentos = orcamentos.filter(status__in=options['status'])
+        if options['desde']:
+            orcamentos = orcamentos.filter(data_emissao__gte=options['desde'])
+        if options['ids']:
+            orcamentos = orcamentos.filter(id__in=options['ids'])
+
+        # A comparação é feita com 2 casas para não acusar diferenças de ponto flutuante
+        itens_divergentes = (
+            ItemOrcamento.objects.filter(orcamento__in=orcamentos.values('id'))
+            .annotate(
+                valor_gravado=Round('valor_total', 2),
+                valor_calculado=Round(valor_total_itens(), 2),
+            )
+            .exclude(valor_gravado=F('valor_calculado'))
+        )
+        orcamentos_divergentes = (
+            orcamentos.annotate(
+                total_gravado=Round('total', 2),
+                total_calculado=Round(subtotal_itens() - F('desconto'), 2),
+            )
+            .exclude(total_gravado=F('total_calculado'))
+        )
+
+        total_itens = itens_divergentes.count()
+        self.stdout.write(f'Itens com valor_total divergente: {total_itens}')
+        for numero, item, atual, calculado in itens_divergentes.values_list(
+            'orcamento__numero', 'numero_item', 'valor_gravado', 'valor_calculado'
+        ).order_by('orcamento_id', 'numero_item')[:options['limite']]:
+            self.stdout.write(f'  {numero} item {item}: gravado {atual:.2f} / calculado {calculado:.2f}')
+
+        if options['verificar']:
+            self._relatar_orcamentos(orcamentos_divergentes, options['limite'])
+            return
+
+        with transaction.atomic():
+            # Um UPDATE para os itens e um para os orçamentos, ambos só nas linhas divergentes
+            ItemOrcamento.objects.filter(
+                id__in=itens_divergentes.values('id')
+            ).update(valor_total=valor_total_itens())
+
+            # Com os itens corrigidos, o total é comparado com a soma já recalculada
+            total_orcamentos = self._relatar_orcamentos(orcamentos_divergentes, options['limite'])
+
+            Orcamento.objects.filter(
+                id__in=orcamentos_divergentes.values('id')
+            ).update(
+                total=Round(subtotal_itens() - F('desconto'), 2),
+                atualizado_em=timezone.now(),
+            )
+
+        self.stdout.write(self.style.SUCCESS(
+            f'{total_itens} itens e {total_orcamentos} orçamentos corrigidos.'
+        ))
+
+    def _relatar_orcamentos(self, orcamentos_divergentes, limite):
+        total = orcamentos_divergentes.count()
+        self.stdout.write(f'Orçamentos com total divergente: {total}')
+        for numero, atual, calculado in orcamentos_divergentes.values_list(
+            'numero', 'total_gravado', 'total_calculado'
+        ).order_by('id')[:limite]:
+            self.stdout.write(f'  {numero}: gravado {atual:.2f} / calculado {calculado:.2f}')
+        return total
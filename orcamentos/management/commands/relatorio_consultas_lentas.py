@@ -0,0 +1,99 @@
+# orcamentos/management/commands/relatorio_consultas_lentas.py
+import json
+from datetime import datetime, timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from orcamentos.consultas_lentas import configuracao, impressao
+
+
+class _Grupo:
+    def __init__(self, sql):
+        self.sql = sql
+        self.tempos = []
+        self.views = {}
+        self.origens = {}
+        self.plano = None
+
+    def adicionar(self, registro):
+        self.tempos.append(registro['ms'])
+        view = registro.get('view') or '(fora de view)'
+        self.views[view] = self.views.get(view, 0) + 1
+        if registro.get('origem'):
+            origem = registro['origem'][0]
+            self.origens[origem] = self.origens.get(origem, 0) + 1
+        if registro.get('plano'):
+            # Fica o plano mais recente: é o que vale depois de criar um índice
+            self.plano = registro['plano']
+
+    @property
+    def total(self):
+        return sum(self.tempos)
+
+    def percentil(self, p):
+        tempos = sorted(self.tempos)
+        return tempos[min(len(tempos) - 1, int(len(tempos) * p))]
+
+
+class Command(BaseCommand):
+    help = 'Agrupa o log de consultas lentas por impressão do SQL e ordena pelo tempo total gasto'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--arquivo', help='Log JSON a ler (padrão: CONSULTAS_LENTAS["ARQUIVO"])')
+        parser.add_argument('--horas', type=float, help='Somente registros das últimas N horas')
+        parser.add_argument('--view', help='Somente consultas desta view (trecho do nome)')
+        parser.add_argument('--limite', type=int, default=15, help='Quantidade de consultas no ranking')
+        parser.add_argument('--planos', action='store_true', help='Mostra o último EXPLAIN capturado de cada consulta')
+
+    def handle(self, *args, **options):
+        caminho = options['arquivo'] or configuracao()['ARQUIVO']
+        desde = timezone.now() - timedelta(hours=options['horas']) if options['horas'] else None
+
+        grupos = {}
+        lidos = invalidos = 0
+        try:
+            arquivo = open(caminho, encoding='utf-8')
+        except FileNotFoundError:
+            raise CommandError(f'Log não encontrado: {caminho} (nenhuma consulta passou do limite ainda?)')
+        with arquivo:
+            for linha in arquivo:
+                try:
+                    registro = json.loads(linha)
+                except ValueError:
+                    # Linha cortada por uma gravação interrompida
+                    invalidos += 1
+                    continue
+                if desde and datetime.fromisoformat(registro['em']) < desde:
+                    continue
+                if options['view'] and options['view'] not in (registro.get('view') or ''):
+                    continue
+                chave, normalizado = impressao(registro['sql'])
+                grupos.setdefault(chave, _Grupo(normalizado)).adicionar(registro)
+                lidos += 1
+
+        if not grupos:
+            self.stdout.write('Nenhuma consulta lenta no período.')
+            return
+
+        total_geral = sum(grupo.total for grupo in grupos.values())
+        self.stdout.write(
+            f'{lidos} consultas lentas, {len(grupos)} distintas, {total_geral / 1000:.1f}s no total'
+            + (f' ({invalidos} linhas inválidas ignoradas)' if invalidos else '')
+        )
+        ranking = sorted(grupos.items(), key=lambda par: par[1].total, reverse=True)
+        for posicao, (chave, grupo) in enumerate(ranking[:options['limite']], 1):
+            self.stdout.write('')
+            self.stdout.write(self.style.MIGRATE_HEADING(
+                f'{posicao}. [{chave}] {grupo.total / 1000:.2f}s ({grupo.total / total_geral:.0%}) '
+                f'em {len(grupo.tempos)}x | média {grupo.total / len(grupo.tempos):.0f} ms | '
+                f'p95 {grupo.percentil(0.95):.0f} ms | máx {max(grupo.tempos):.0f} ms'
+            ))
+            self.stdout.write(f'   {grupo.sql[:300]}')
+            for view, vezes in sorted(grupo.views.items(), key=lambda par: -par[1])[:3]:
+                self.stdout.write(f'   view: {view} ({vezes}x)')
+            for origem, vezes in sorted(grupo.origens.items(), key=lambda par: -par[1])[:3]:
+                self.stdout.write(f'   código: {origem} ({vezes}x)')
+            if options['planos']:
+                for passo in grupo.plano or ['(sem EXPLAIN capturado)']:
+                    self.stdout.write(f'   plano: {passo}')
@@ -0,0 +1,313 @@
+# orcamentos/management/commands/teste_carga.py
+import random
+import re
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+from collections import defaultdict
+from decimal import Decimal
+from http.cookiejar import CookieJar
+from http.cookies import SimpleCookie
+
+from django.contrib.messages.storage.cookie import CookieStorage
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.test import Client
+from django.urls import reverse
+
+from orcamentos.models import Cliente, Empresa, ItemOrcamento, Orcamento, UnidadeMedida
+
+PREFIXO = 'CARGA'
+MIX_PADRAO = 'listar=35,visualizar=30,criar=10,editar=15,pdf=10'
+BANCO_TRAVADO = 'database is locked'
+CONFLITO = 'alterado por outra pessoa'
+VERSAO_FORMULARIO = re.compile(rb'name="versao" value="(\d+)"')
+
+
+def _percentil(tempos, p):
+    return tempos[min(len(tempos) - 1, int(len(tempos) * p))]
+
+
+def _mensagens(cookies):
+    """Texto das mensagens do Django gravadas no cookie da resposta (erros das views de formulário)"""
+    morsel = cookies.get('messages')
+    if morsel is None or not morsel.value:
+        return ''
+    mensagens = CookieStorage(None)._decode(morsel.value) or []
+    return ' '.join(str(mensagem) for mensagem in mensagens)
+
+
+class _ClienteInterno:
+    """Requisições pelo handler WSGI do Django, no mesmo processo"""
+
+    def __init__(self, host):
+        self.client = Client(headers={'host': host})
+
+    def requisitar(self, metodo, url, dados=None):
+        resposta = getattr(self.client, metodo)(url, dados)
+        if hasattr(resposta, 'streaming_content'):
+            b''.join(resposta.streaming_content)
+            corpo = b''
+        else:
+            corpo = resposta.content
+        # Mensagens não exibidas se acumulam no cookie; cada resposta deve trazer só as suas
+        self.client.cookies.pop('messages', None)
+        return resposta.status_code, corpo, _mensagens(resposta.cookies)
+
+    def encerrar(self):
+        connections.close_all()
+
+
+class _SemRedirecionar(urllib.request.HTTPRedirectHandler):
+    def redirect_request(self, *args, **kwargs):
+        return None
+
+
+class _ClienteHttp:
+    """Requisições HTTP de verdade contra um servidor local (runserver, gunicorn, uvicorn...)"""
+
+    def __init__(self, servidor):
+        self.servidor = servidor.rstrip('/')
+        self.cookies = CookieJar()
+        self.abridor = urllib.request.build_opener(
+            urllib.request.HTTPCookieProcessor(self.cookies), _SemRedirecionar
+        )
+
+    def _csrf(self):
+        return next((cookie.value for cookie in self.cookies if cookie.name == 'csrftoken'), '')
+
+    def requisitar(self, metodo, url, dados=None):
+        pedido = urllib.request.Request(self.servidor + url)
+        if metodo == 'post':
+            pedido.data = urllib.parse.urlencode(dados).encode()
+            pedido.add_header('X-CSRFToken', self._csrf())
+            pedido.add_header('Referer', self.servidor + url)
+        try:
+            with self.abridor.open(pedido, timeout=60) as resposta:
+                status, corpo, cabecalhos = resposta.status, resposta.read(), resposta.headers
+        except urllib.error.HTTPError as e:
+            status, corpo, cabecalhos = e.code, e.read(), e.headers
+        for cookie in [cookie for cookie in self.cookies if cookie.name == 'messages']:
+            self.cookies.clear(cookie.domain, cookie.path, cookie.name)
+        cookies = SimpleCookie()
+        for valor in cabecalhos.get_all('Set-Cookie') or []:
+            cookies.load(valor)
+        return status, corpo, _mensagens(cookies)
+
+    def encerrar(self):
+        pass
+
+
+class Command(BaseCommand):
+    help = (
+        'Teste de carga: N usuários simultâneos listando, visualizando, criando, editando '
+        'orçamentos e gerando PDFs. Relata vazão, latência, erros e "database is locked" por operação.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--usuarios', type=int, default=30, help='Usuários simultâneos (threads)')
+        parser.add_argument('--duracao', type=float, default=30, help='Duração do teste em segundos')
+        parser.add_argument('--mix', default=MIX_PADRAO,
+                            help=f'Peso de cada operação (padrão: {MIX_PADRAO})')
+        parser.add_argument('--servidor',
+                            help='URL de um servidor já no ar (ex.: http://127.0.0.1:8000). '
+                                 'Sem ela, as requisições passam pelo handler WSGI neste processo. '
+                                 'Para medir vários processos, aponte para um servidor com N workers.')
+        parser.add_argument('--host', default='localhost',
+                            help='Cabeçalho Host no modo interno (precisa estar em ALLOWED_HOSTS)')
+        parser.add_argument('--semear', type=int, default=0,
+                            help=f'Cria N orçamentos de teste (cliente "{PREFIXO} ...") antes de começar')
+        parser.add_argument('--itens', type=int, default=20, help='Itens por orçamento semeado, criado ou editado')
+        parser.add_argument('--limpar', action='store_true',
+                            help='Apaga ao final todos os orçamentos de teste (semeados e criados)')
+        parser.add_argument('--semente', type=int, default=0, help='Semente do sorteio das operações')
+
+    def handle(self, *args, **options):
+        mix = self._ler_mix(options['mix'])
+        if options['semear']:
+            self._semear(options['semear'], options['itens'])
+
+        self.unidade = UnidadeMedida.objects.filter(ativa=True).first()
+        self.orcamentos = list(
+            Orcamento.objects.filter(cliente__nome__startswith=PREFIXO, bloqueado=False)
+            .values_list('id', 'empresa_id')
+        )
+        if not self.orcamentos or self.unidade is None:
+            raise CommandError('Nenhum orçamento de teste; rode com --semear N.')
+        connections.close_all()
+
+        if options['servidor']:
+            fabrica = lambda: _ClienteHttp(options['servidor'])
+            modo = options['servidor']
+        else:
+            fabrica = lambda: _ClienteInterno(options['host'])
+            modo = 'WSGI no processo'
+
+        self.stdout.write(
+            f'{options["usuarios"]} usuários por {options["duracao"]:.0f}s ({modo}), '
+            f'{len(self.orcamentos)} orçamentos de teste, mix {options["mix"]}\n'
+        )
+        resultados = defaultdict(list)
+        trava = threading.Lock()
+        fim = time.monotonic() + options['duracao']
+
+        def usuario(numero):
+            sorteio = random.Random(options['semente'] * 1000 + numero)
+            cliente = fabrica()
+            locais = []
+            try:
+                while time.monotonic() < fim:
+                    operacao = sorteio.choices(list(mix), weights=list(mix.values()))[0]
+                    locais.append((operacao, *self._executar(operacao, cliente, sorteio, options['itens'])))
+            finally:
+                cliente.encerrar()
+                with trava:
+                    for operacao, *medida in locais:
+                        resultados[operacao].append(medida)
+
+        inicio = time.perf_counter()
+        threads = [threading.Thread(target=usuario, args=(i,)) for i in range(options['usuarios'])]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        duracao = time.perf_counter() - inicio
+
+        self._relatar(resultados, duracao)
+        if options['limpar']:
+            self._limpar()
+
+    def _ler_mix(self, texto):
+        mix = {}
+        for parte in texto.split(','):
+            nome, _, peso = parte.partition('=')
+            nome = nome.strip()
+            if nome not in ('listar', 'visualizar', 'criar', 'editar', 'pdf'):
+                raise CommandError(f'Operação desconhecida no --mix: {nome}')
+            try:
+                mix[nome] = float(peso or 1)
+            except ValueError:
+                raise CommandError(f'Peso inválido no --mix: {parte}')
+        return mix
+
+    def _dados_formulario(self, sorteio, itens):
+        dados = {
+            'cliente_nome': f'{PREFIXO} {sorteio.randint(1, 10 ** 6)}',
+            'cliente_cpf_cnpj': '000.000.000-00',
+            'cliente_endereco': 'RUA DO TESTE DE CARGA, 1',
+            'cliente_telefone': '',
+        }
+        for i in range(1, itens + 1):
+            dados.update({
+                f'itens[{i}][unidade]': self.unidade.id,
+                f'itens[{i}][quantidade]': sorteio.randint(1, 50),
+                f'itens[{i}][descricao]': f'ITEM {i}',
+                f'itens[{i}][marca]': '',
+                f'itens[{i}][valor_unitario]': f'{sorteio.uniform(1, 500):.2f}',
+            })
+        return dados
+
+    def _executar(self, operacao, cliente, sorteio, itens):
+        orcamento_id, empresa_id = sorteio.choice(self.orcamentos)
+        if operacao == 'listar':
+            metodo, url, dados, esperado = 'get', reverse('orcamentos:listar_orcamentos'), None, 200
+        elif operacao == 'visualizar':
+            metodo, url, dados, esperado = 'get', reverse('orcamentos:visualizar_orcamento', args=[orcamento_id]), None, 200
+        elif operacao == 'pdf':
+            metodo, url, dados, esperado = 'get', reverse('orcamentos:gerar_pdf', args=[orcamento_id]), None, 200
+        elif operacao == 'criar':
+            metodo, url, esperado = 'post', reverse('orcamentos:criar_orcamento', args=[empresa_id]), 302
+            dados = self._dados_formulario(sorteio, itens)
+        else:
+            metodo, url, esperado = 'post', reverse('orcamentos:editar_orcamento', args=[orcamento_id]), 302
+            dados = self._dados_formulario(sorteio, itens)
+
+        if operacao == 'editar':
+            # Como o usuário: abre o formulário (versão atual do orçamento) e depois salva
+            _, corpo, _ = cliente.requisitar('get', url)
+            versao = VERSAO_FORMULARIO.search(corpo)
+            if versao:
+                dados['versao'] = versao.group(1).decode()
+        elif metodo == 'post' and isinstance(cliente, _ClienteHttp) and not cliente._csrf():
+            cliente.requisitar('get', url)
+
+        inicio = time.perf_counter()
+        try:
+            status, corpo, mensagens = cliente.requisitar(metodo, url, dados)
+        except Exception as e:
+            return time.perf_counter() - inicio, 'exceção', BANCO_TRAVADO in str(e)
+        tempo = time.perf_counter() - inicio
+        # As views de formulário engolem a exceção e guardam a mensagem no cookie; nas demais
+        # o erro só aparece no corpo da página 500 (DEBUG ligado no servidor)
+        if metodo == 'post':
+            travado = BANCO_TRAVADO in mensagens
+        else:
+            travado = status >= 500 and BANCO_TRAVADO.encode() in corpo
+        if CONFLITO in mensagens:
+            return tempo, 'conflito', travado
+        return tempo, status if status != esperado or travado else 'ok', travado
+
+    def _relatar(self, resultados, duracao):
+        self.stdout.write(
+            f'{"operação":<11} {"req":>6} {"req/s":>7} {"p50 ms":>8} {"p95 ms":>8} '
+            f'{"p99 ms":>8} {"máx ms":>8} {"erros":>7} {"travado":>8}'
+        )
+        todas = []
+        for operacao in sorted(resultados):
+            medidas = resultados[operacao]
+            todas.extend(medidas)
+            self._linha(operacao, medidas, duracao)
+        if todas:
+            self._linha('TOTAL', todas, duracao)
+
+        falhas = defaultdict(int)
+        for operacao, medidas in resultados.items():
+            for _, situacao, _ in medidas:
+                if situacao != 'ok':
+                    falhas[(operacao, situacao)] += 1
+        if falhas:
+            self.stdout.write('\nRespostas inesperadas:')
+            for (operacao, situacao), quantidade in sorted(falhas.items(), key=str):
+                self.stdout.write(f'  {operacao}: {situacao} x{quantidade}')
+
+    def _linha(self, nome, medidas, duracao):
+        tempos = sorted(tempo for tempo, _, _ in medidas)
+        erros = sum(1 for _, situacao, _ in medidas if situacao != 'ok')
+        travados = sum(1 for _, _, travado in medidas if travado)
+        self.stdout.write(
+            f'{nome:<11} {len(medidas):>6} {len(medidas) / duracao:>7.1f} '
+            f'{_percentil(tempos, 0.50) * 1000:>8.1f} {_percentil(tempos, 0.95) * 1000:>8.1f} '
+            f'{_percentil(tempos, 0.99) * 1000:>8.1f} {tempos[-1] * 1000:>8.1f} '
+            f'{erros / len(medidas):>7.1%} {travados:>8}'
+        )
+
+    def _semear(self, quantidade, itens):
+        empresa = Empresa.objects.filter(ativa=True).first() or Empresa.objects.create(
+            nome=f'{PREFIXO} EMPRESA', cnpj='00.000.000/0000-00', endereco='-',
+            telefone='-', email='carga@example.com',
+        )
+        unidade = UnidadeMedida.objects.filter(ativa=True).first() or UnidadeMedida.objects.create(
+            sigla='UN', descricao='Unidade'
+        )
+        for i in range(quantidade):
+            cliente = Cliente.objects.create(nome=f'{PREFIXO} {i + 1}', cpf_cnpj='000.000.000-00', endereco='-')
+            orcamento = Orcamento.objects.create(empresa=empresa, cliente=cliente)
+            ItemOrcamento.objects.bulk_create([
+                ItemOrcamento(
+                    orcamento=orcamento, numero_item=n, unidade=unidade, quantidade=Decimal(n),
+                    descricao=f'ITEM {n}', valor_unitario=Decimal('10.00'), valor_total=Decimal(n * 10),
+                )
+                for n in range(1, itens + 1)
+            ])
+            orcamento.calcular_total()
+        self.stdout.write(f'{quantidade} orçamentos de teste criados com {itens} itens cada.')
+
+    def _limpar(self):
+        orcamentos = Orcamento.objects.filter(cliente__nome__startswith=PREFIXO)
+        clientes = list(orcamentos.values_list('cliente_id', flat=True))
+        ItemOrcamento.objects.filter(orcamento__in=orcamentos).delete()
+        removidos, _ = orcamentos.delete()
+        Cliente.objects.filter(id__in=clientes).delete()
+        self.stdout.write(f'{removidos} orçamentos de teste removidos.')
@@ -0,0 +1,115 @@
+# orcamentos/middleware.py
+from django.conf import settings
+from django.utils.cache import patch_vary_headers
+from django.utils.deprecation import MiddlewareMixin
+from django.utils.text import compress_string
+
+from .consultas_lentas import view_atual
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+
+def codificacao_preferida(aceitas, opcoes):
+    """A codificação de `opcoes` (ordem de preferência do servidor) que o Accept-Encoding aceita.
+
+    Respeita os pesos: 'br;q=0' recusa o Brotli, 'gzip;q=0.5, br' prefere o Brotli, e '*'
+    vale para as codificações não listadas. None se nenhuma for aceita.
+    """
+    pesos = {}
+    for parte in aceitas.split(','):
+        nome, _, parametros = parte.partition(';')
+        nome = nome.strip().lower()
+        if not nome:
+            continue
+        peso = 1.0
+        for parametro in parametros.split(';'):
+            chave, _, valor = parametro.partition('=')
+            if chave.strip().lower() == 'q':
+                try:
+                    peso = float(valor)
+                except ValueError:
+                    peso = 0.0
+        pesos[nome] = peso
+
+    candidatas = [
+        (pesos.get(opcao, pesos.get('*', 0.0)), -indice, opcao)
+        for indice, opcao in enumerate(opcoes)
+    ]
+    peso, _, opcao = max(candidatas, default=(0.0, 0, None))
+    return opcao if peso > 0 else None
+
+
+class CompressaoMiddleware(MiddlewareMixin):
+    """Comprime respostas de texto com Brotli (se instalado) ou gzip.
+
+    Proteção contra BREACH: páginas que embutem o token CSRF nunca usam Brotli e
+    o gzip recebe bytes aleatórios no cabeçalho (como no GZipMiddleware do Django).
+    Respostas em streaming (PDFs, estáticos) e já codificadas passam intactas.
+    """
+
+    def __init__(self, get_response):
+        super().__init__(get_response)
+        config = getattr(settings, 'COMPRESSAO', {})
+        self.tamanho_minimo = config.get('TAMANHO_MINIMO', 1024)
+        self.tipos = set(config.get('TIPOS', [
+            'text/html', 'text/css', 'text/plain', 'text/javascript',
+            'application/javascript', 'application/json', 'image/svg+xml',
+        ]))
+        self.nivel_brotli = config.get('NIVEL_BROTLI', 5)
+        self.max_bytes_aleatorios = config.get('MAX_BYTES_ALEATORIOS', 100)
+
+    def process_response(self, request, response):
+        if response.streaming or response.has_header('Content-Encoding'):
+            return response
+        if len(response.content) < self.tamanho_minimo:
+            return response
+        content_type = response.get('Content-Type', '').split(';')[0].strip().lower()
+        if content_type not in self.tipos:
+            return response
+
+        patch_vary_headers(response, ('Accept-Encoding',))
+        aceitas = request.headers.get('Accept-Encoding', '')
+        # Quando a página usa o token, o CsrfViewMiddleware renova o cookie na resposta
+        tem_segredo = (
+            settings.CSRF_COOKIE_NAME in response.cookies
+            or request.META.get('CSRF_COOKIE_NEEDS_UPDATE')
+        )
+
+        opcoes = ['br', 'gzip'] if brotli and not tem_segredo else ['gzip']
+        codificacao = codificacao_preferida(aceitas, opcoes)
+        if codificacao == 'br':
+            conteudo = brotli.compress(response.content, quality=self.nivel_brotli)
+        elif codificacao == 'gzip':
+            conteudo = compress_string(response.content, max_random_bytes=self.max_bytes_aleatorios)
+        else:
+            return response
+
+        if len(conteudo) >= len(response.content):
+            return response
+
+        response.content = conteudo
+        response['Content-Length'] = str(len(conteudo))
+        response['Content-Encoding'] = codificacao
+        # O corpo mudou de bytes: um ETag forte deixaria de valer
+        etag = response.get('ETag')
+        if etag and etag.startswith('"'):
+            response['ETag'] = 'W/' + etag
+        return response
+
+
+class ConsultasLentasMiddleware(MiddlewareMixin):
+    """Informa ao registro de consultas lentas qual view está em execução"""
+
+    def process_request(self, request):
+        # Com WSGI a thread é reaproveitada: limpa o valor deixado pela requisição anterior
+        view_atual.set(None)
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        view_atual.set(f'{view_func.__module__}.{view_func.__qualname__}')
+
+    def process_response(self, request, response):
+        view_atual.set(None)
+        return response
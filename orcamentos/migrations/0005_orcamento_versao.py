@@ -0,0 +1,18 @@
+# Generated by Django 6.0 on 2026-10-19 10:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orcamentos', '0004_alter_cliente_cpf_cnpj_alter_empresa_cnpj_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='orcamento',
+            name='versao',
+            field=models.PositiveIntegerField(default=1, editable=False),
+        ),
+    ]
@@ -0,0 +1,39 @@
+# Generated by Django 6.0 on 2026-10-19 15:25
+
+from datetime import timedelta
+
+from django.db import migrations, models
+
+
+def preencher_data_validade(apps, schema_editor):
+    """Um UPDATE por prazo distinto (15, 30...) em vez de salvar orçamento por orçamento"""
+    Orcamento = apps.get_model('orcamentos', 'Orcamento')
+    banco = schema_editor.connection.alias
+    prazos = Orcamento.objects.using(banco).values_list('validade_dias', flat=True).order_by().distinct()
+    for dias in list(prazos):
+        Orcamento.objects.using(banco).filter(validade_dias=dias).update(
+            data_validade=models.ExpressionWrapper(
+                models.F('data_emissao') + timedelta(days=dias),
+                output_field=models.DateField(),
+            )
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orcamentos', '0005_orcamento_versao'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='orcamento',
+            name='status',
+            field=models.CharField(choices=[('rascunho', 'Rascunho'), ('enviado', 'Enviado'), ('aprovado', 'Aprovado'), ('rejeitado', 'Rejeitado'), ('pedido', 'Pedido Gerado'), ('cancelado', 'Cancelado'), ('expirado', 'Expirado')], default='rascunho', max_length=20),
+        ),
+        migrations.RunPython(preencher_data_validade, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='orcamento',
+            index=models.Index(fields=['status', 'data_validade'], name='orcamento_validade_idx'),
+        ),
+    ]
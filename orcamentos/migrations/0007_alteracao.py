@@ -0,0 +1,153 @@
+# Generated by Django 6.0 on 2026-10-19 15:45
+
+from django.db import migrations, models
+
+# Gatilhos do log de alterações (orcamentos_alteracao): gravados pelo próprio banco, na mesma
+# transação da alteração, pegam também bulk_create, update(), delete() de QuerySet e SQL direto.
+# Só no banco principal: o de arquivo guarda cópias (hint lido por RoteadorArquivo).
+# Há uma versão para SQLite e uma para PostgreSQL; nos demais bancos a migração não cria
+# gatilho nenhum e o log simplesmente fica vazio.
+CRIAR_GATILHOS_SQLITE = [
+    """
+    CREATE TRIGGER orcamentos_orcamento_alteracao_insert AFTER INSERT ON orcamentos_orcamento
+    BEGIN
+        INSERT INTO orcamentos_alteracao (tabela, operacao, registro_id, documento_id, criado_em)
+        VALUES ('orcamentos_orcamento', 'insert', NEW.id, NEW.id, strftime('%Y-%m-%d %H:%M:%f', 'now'));
+    END
+    """,
+    """
+    CREATE TRIGGER orcamentos_orcamento_alteracao_update AFTER UPDATE ON orcamentos_orcamento
+    BEGIN
+        INSERT INTO orcamentos_alteracao (tabela, operacao, registro_id, documento_id, criado_em)
+        VALUES ('orcamentos_orcamento', 'update', NEW.id, NEW.id, strftime('%Y-%m-%d %H:%M:%f', 'now'));
+    END
+    """,
+    """
+    CREATE TRIGGER orcamentos_orcamento_alteracao_delete AFTER DELETE ON orcamentos_orcamento
+    BEGIN
+        INSERT INTO orcamentos_alteracao (tabela, operacao, registro_id, documento_id, criado_em)
+        VALUES ('orcamentos_orcamento', 'delete', OLD.id, OLD.id, strftime('%Y-%m-%d %H:%M:%f', 'now'));
+    END
+    """,
+    """
+    CREATE TRIGGER orcamentos_itemorcamento_alteracao_insert AFTER INSERT ON orcamentos_itemorcamento
+    BEGIN
+        INSERT INTO orcamentos_alteracao (tabela, operacao, registro_id, documento_id, criado_em)
+        VALUES ('orcamentos_itemorcamento', 'insert', NEW.id, NEW.orcamento_id, strftime('%Y-%m-%d %H:%M:%f', 'now'));
+    END
+    """,
+    """
+    CREATE TRIGGER orcamentos_itemorcamento_alteracao_update AFTER UPDATE ON orcamentos_itemorcamento
+    BEGIN
+        INSERT INTO orcamentos_alteracao (tabela, operacao, registro_id, documento_id, criado_em)
+        VALUES ('orcamentos_itemorcamento', 'update', NEW.id, NEW.orcamento_id, strftime('%Y-%m-%d %H:%M:%f', 'now'));
+    END
+    """,
+    """
+    CREATE TRIGGER orcamentos_itemorcamento_alteracao_delete AFTER DELETE ON orcamentos_itemorcamento
+    BEGIN
+        INSERT INTO orcamentos_alteracao (tabela, operacao, registro_id, documento_id, criado_em)
+        VALUES ('orcamentos_itemorcamento', 'delete', OLD.id, OLD.orcamento_id, strftime('%Y-%m-%d %H:%M:%f', 'now'));
+    END
+    """,
+]
+
+REMOVER_GATILHOS_SQLITE = [
+    'DROP TRIGGER IF EXISTS orcamentos_orcamento_alteracao_insert',
+    'DROP TRIGGER IF EXISTS orcamentos_orcamento_alteracao_update',
+    'DROP TRIGGER IF EXISTS orcamentos_orcamento_alteracao_delete',
+    'DROP TRIGGER IF EXISTS orcamentos_itemorcamento_alteracao_insert',
+    'DROP TRIGGER IF EXISTS orcamentos_itemorcamento_alteracao_update',
+    'DROP TRIGGER IF EXISTS orcamentos_itemorcamento_alteracao_delete',
+]
+
+# No PostgreSQL uma única função serve a todas as tabelas (também às de pedidos, na
+# migração 0004 de pedidos): o argumento do gatilho é a coluna com o id do documento
+CRIAR_GATILHOS_POSTGRESQL = [
+    """
+    CREATE OR REPLACE FUNCTION registrar_alteracao() RETURNS trigger AS $$
+    DECLARE
+        linha record;
+        documento bigint;
+    BEGIN
+        IF TG_OP = 'DELETE' THEN
+            linha := OLD;
+        ELSE
+            linha := NEW;
+        END IF;
+        EXECUTE format('SELECT ($1).%I', TG_ARGV[0]) INTO documento USING linha;
+        INSERT INTO orcamentos_alteracao (tabela, operacao, registro_id, documento_id, criado_em)
+        VALUES (TG_TABLE_NAME, lower(TG_OP), linha.id, documento, clock_timestamp());
+        RETURN NULL;
+    END;
+    $$ LANGUAGE plpgsql
+    """,
+    """
+    CREATE TRIGGER orcamentos_orcamento_alteracao AFTER INSERT OR UPDATE OR DELETE ON orcamentos_orcamento
+    FOR EACH ROW EXECUTE FUNCTION registrar_alteracao('id')
+    """,
+    """
+    CREATE TRIGGER orcamentos_itemorcamento_alteracao AFTER INSERT OR UPDATE OR DELETE ON orcamentos_itemorcamento
+    FOR EACH ROW EXECUTE FUNCTION registrar_alteracao('orcamento_id')
+    """,
+]
+
+REMOVER_GATILHOS_POSTGRESQL = [
+    'DROP TRIGGER IF EXISTS orcamentos_orcamento_alteracao ON orcamentos_orcamento',
+    'DROP TRIGGER IF EXISTS orcamentos_itemorcamento_alteracao ON orcamentos_itemorcamento',
+    'DROP FUNCTION IF EXISTS registrar_alteracao()',
+]
+
+GATILHOS = {
+    'sqlite': (CRIAR_GATILHOS_SQLITE, REMOVER_GATILHOS_SQLITE),
+    'postgresql': (CRIAR_GATILHOS_POSTGRESQL, REMOVER_GATILHOS_POSTGRESQL),
+}
+
+
+def criar_gatilhos(apps, schema_editor):
+    for sql in GATILHOS.get(schema_editor.connection.vendor, ((), ()))[0]:
+        schema_editor.execute(sql, params=None)
+
+
+def remover_gatilhos(apps, schema_editor):
+    for sql in GATILHOS.get(schema_editor.connection.vendor, ((), ()))[1]:
+        schema_editor.execute(sql, params=None)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orcamentos', '0006_orcamento_validade'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Alteracao',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('tabela', models.CharField(max_length=50)),
+                ('operacao', models.CharField(choices=[('insert', 'Inclusão'), ('update', 'Alteração'), ('delete', 'Exclusão')], max_length=6)),
+                ('registro_id', models.BigIntegerField()),
+                ('documento_id', models.BigIntegerField()),
+                ('criado_em', models.DateTimeField()),
+            ],
+            options={
+                'verbose_name': 'Alteração',
+                'verbose_name_plural': 'Alterações',
+                'ordering': ['id'],
+            },
+        ),
+        migrations.CreateModel(
+            name='ConsumidorAlteracoes',
+            fields=[
+                ('nome', models.CharField(max_length=50, primary_key=True, serialize=False)),
+                ('posicao', models.BigIntegerField(default=0)),
+                ('atualizado_em', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': 'Consumidor de Alterações',
+                'verbose_name_plural': 'Consumidores de Alterações',
+            },
+        ),
+        migrations.RunPython(criar_gatilhos, remover_gatilhos, hints={'somente_principal': True}),
+    ]
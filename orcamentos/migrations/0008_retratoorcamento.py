@@ -0,0 +1,26 @@
+# Generated by Django 6.0 on 2026-10-19 16:10
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orcamentos', '0007_alteracao'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RetratoOrcamento',
+            fields=[
+                ('orcamento', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='retrato', serialize=False, to='orcamentos.orcamento')),
+                ('dados', models.BinaryField()),
+                ('criado_em', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'verbose_name': 'Retrato do Orçamento',
+                'verbose_name_plural': 'Retratos dos Orçamentos',
+            },
+        ),
+    ]
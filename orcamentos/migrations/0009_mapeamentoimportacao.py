@@ -0,0 +1,28 @@
+# Generated by Django 6.0 on 2026-10-19 16:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orcamentos', '0008_retratoorcamento'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MapeamentoImportacao',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('origem', models.CharField(max_length=100)),
+                ('tabela', models.CharField(max_length=50)),
+                ('id_origem', models.BigIntegerField()),
+                ('id_destino', models.BigIntegerField()),
+            ],
+            options={
+                'verbose_name': 'Mapeamento de Importação',
+                'verbose_name_plural': 'Mapeamentos de Importação',
+                'unique_together': {('origem', 'tabela', 'id_origem')},
+            },
+        ),
+    ]
@@ -1,7 +1,14 @@
 # orcamentos/models.py
-from django.db import models
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import connections, models, router, transaction
+from django.db.models import DecimalField, ExpressionWrapper, F, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce, Round
 from django.core.validators import MinValueValidator
-from decimal import Decimal
+from django.utils import timezone
+from datetime import date, timedelta
+from decimal import ROUND_HALF_UP, Decimal
+import json
+import zlib
 
 class Empresa(models.Model):
     nome = models.CharField(max_length=100)
@@ -62,6 +69,43 @@ class Cliente(models.Model):
             self.endereco = self.endereco.upper()
         super().save(*args, **kwargs)
 
+
+def valor_total_itens():
+    """Expressão SQL equivalente a ItemOrcamento.valor_total (quantidade * valor_unitario)
+
+    Arredonda cada linha com 2 casas como ItemOrcamento.normalizar(), assim a soma dos itens
+    bate com a soma dos valor_total gravados (ROUND do banco arredonda meio centavo para cima).
+    """
+    return ExpressionWrapper(
+        Round(F('quantidade') * F('valor_unitario'), 2),
+        output_field=DecimalField(max_digits=10, decimal_places=2),
+    )
+
+
+def subtotal_itens():
+    """Subquery com a soma dos itens do orçamento externo (OuterRef('pk'))"""
+    soma = (
+        ItemOrcamento.objects.filter(orcamento=OuterRef('pk'))
+        .order_by()
+        .values('orcamento')
+        .annotate(soma=Sum(valor_total_itens()))
+        .values('soma')
+    )
+    return Coalesce(
+        Subquery(soma),
+        Value(Decimal('0')),
+        output_field=DecimalField(max_digits=10, decimal_places=2),
+    )
+
+
+class ConflitoEdicao(Exception):
+    """O orçamento foi alterado (ou bloqueado) por outra pessoa durante a edição"""
+
+
+class OrcamentoBloqueado(ConflitoEdicao):
+    """O pedido foi gerado (orçamento bloqueado) durante a edição"""
+
+
 class Orcamento(models.Model):
     STATUS_CHOICES = [
         ('rascunho', 'Rascunho'),
@@ -70,7 +114,23 @@ class Orcamento(models.Model):
         ('rejeitado', 'Rejeitado'),
         ('pedido', 'Pedido Gerado'),  # Novo status
         ('cancelado', 'Cancelado'),
+        ('expirado', 'Expirado'),  # Passou da data de validade (manage.py expirar_orcamentos)
     ]
+    # Orçamentos ainda aguardando resposta: os únicos que vencem
+    STATUS_EM_ABERTO = ['rascunho', 'enviado']
+    # Mudanças de status em lote (lista e admin): destino -> status de origem aceitos.
+    # 'pedido' fica de fora: só gerar_pedido() bloqueia e congela o retrato
+    TRANSICOES_LOTE = {
+        'enviado': ['rascunho'],
+        'aprovado': ['enviado'],
+        'rejeitado': ['enviado'],
+        'cancelado': ['rascunho', 'enviado', 'aprovado', 'rejeitado', 'expirado'],
+    }
+    RESULTADOS_LOTE = {
+        'bloqueado': 'bloqueado (pedido gerado)',
+        'transicao_invalida': 'status atual não permite a mudança',
+        'inexistente': 'não encontrado',
+    }
     
     empresa = models.ForeignKey(Empresa, on_delete=models.PROTECT, related_name='orcamentos')
     cliente = models.ForeignKey(Cliente, on_delete=models.PROTECT, related_name='orcamentos')
@@ -84,6 +144,7 @@ class Orcamento(models.Model):
     desconto = models.DecimalField(max_digits=10, decimal_places=2, default=0, validators=[MinValueValidator(0)])
     total = models.DecimalField(max_digits=10, decimal_places=2, default=0, editable=False)
     bloqueado = models.BooleanField(default=False, verbose_name='Orçamento Bloqueado')  # Novo campo
+    versao = models.PositiveIntegerField(default=1, editable=False)  # Controle de edição simultânea
     criado_em = models.DateTimeField(auto_now_add=True)
     atualizado_em = models.DateTimeField(auto_now=True)
     
@@ -91,16 +152,34 @@ class Orcamento(models.Model):
         verbose_name = 'Orçamento'
         verbose_name_plural = 'Orçamentos'
         ordering = ['-data_emissao', '-numero']
+        indexes = [
+            # Expiração diária e filtro "vence em breve": status + faixa de datas
+            models.Index(fields=['status', 'data_validade'], name='orcamento_validade_idx'),
+        ]
     
     def __str__(self):
         return f"Orçamento {self.numero} - {self.cliente.nome}"
     
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instancia = super().from_db(db, field_names, values)
+        # Como estava no banco: o save() só descarta o retrato quando o orçamento é desbloqueado
+        instancia._bloqueado_no_banco = instancia.__dict__.get('bloqueado', False)
+        return instancia
+    
     def save(self, *args, **kwargs):
 
         if self.prazo_entrega:
             self.prazo_entrega = self.prazo_entrega.upper()
         if self.observacoes:
             self.observacoes = self.observacoes.upper()
+        # Validade sempre derivada da emissão (no primeiro save data_emissao ainda não foi preenchida)
+        self.data_validade = (self.data_emissao or date.today()) + timedelta(days=self.validade_dias)
+        existente = not self._state.adding
+        if existente:
+            # Qualquer alteração invalida formulários abertos com a versão anterior.
+            # Somada no banco, não a partir do valor lido: dois saves concorrentes contam 2
+            self.versao = F('versao') + 1
         if not self.numero:
             # Gerar número único do orçamento
             ultimo = Orcamento.objects.filter(empresa=self.empresa).order_by('-id').first()
@@ -112,24 +191,228 @@ class Orcamento(models.Model):
             self.numero = f"ORC-{self.empresa.id}-{novo_num:05d}"
 
 
+        desbloqueado = getattr(self, '_bloqueado_no_banco', False) and not self.bloqueado
         super().save(*args, **kwargs)
+        self._bloqueado_no_banco = self.bloqueado
+        if existente:
+            self.refresh_from_db(fields=['versao'])
+        if desbloqueado:
+            # Desbloqueado (pelo admin): o retrato congelado deixa de valer
+            RetratoOrcamento.objects.using(self._state.db).filter(orcamento_id=self.pk).delete()
     
     def calcular_total(self):
-        """Calcula o total do orçamento baseado nos itens"""
-        subtotal = sum(item.valor_total for item in self.itens.all())
-        self.total = subtotal - self.desconto
-        self.save()
+        """Calcula o total do orçamento no banco com um único UPDATE"""
+        # Não passa pelo save(): evita repetir a normalização e a numeração
+        Orcamento.objects.filter(pk=self.pk).update(
+            total=Round(subtotal_itens() - F('desconto'), 2),
+            atualizado_em=timezone.now(),
+        )
+        self.refresh_from_db(fields=['total', 'atualizado_em'])
         return self.total
     
     def gerar_pedido(self):
-        """Converte orçamento em pedido e bloqueia edição"""
-        self.status = 'pedido'
-        self.bloqueado = True
-        self.save()
+        """Converte orçamento em pedido, bloqueia edição e congela o retrato para exibição"""
+        with transaction.atomic():
+            self.status = 'pedido'
+            self.bloqueado = True
+            self.save()
+            RetratoOrcamento.congelar(self)
+    
+    @classmethod
+    def mudar_status_em_lote(cls, ids, status):
+        """Muda o status de vários orçamentos com um único UPDATE ... WHERE id IN (...).
+        
+        As regras (não bloqueado, status de origem em TRANSICOES_LOTE) estão no próprio
+        UPDATE, sem passar pelo save(). O resultado de cada orçamento vem das linhas que o
+        UPDATE de fato alterou: {id: (numero, resultado)}, com resultado 'alterado',
+        'bloqueado', 'transicao_invalida' ou 'inexistente'.
+        """
+        if status not in cls.TRANSICOES_LOTE:
+            raise ValueError(f'Mudança de status em lote para "{status}" não permitida.')
+        origens = cls.TRANSICOES_LOTE[status]
+        ids = sorted({int(pk) for pk in ids})
+        
+        resultados = dict.fromkeys(ids, (None, 'inexistente'))
+        if not ids:
+            return resultados
+        agora = timezone.now()
+        with transaction.atomic():
+            # O UPDATE vem primeiro: pega a trava de escrita (no SQLite select_for_update() não
+            # trava nada), e quem mudou o status no meio não entra como 'alterado' por uma
+            # leitura anterior a ele
+            cls.objects.filter(id__in=ids, status__in=origens, bloqueado=False).update(
+                status=status,
+                # Formulários abertos com a versão anterior deixam de valer
+                versao=F('versao') + 1,
+                atualizado_em=agora,
+            )
+            atuais = (
+                cls.objects.filter(id__in=ids).order_by()
+                .values_list('id', 'numero', 'status', 'bloqueado', 'atualizado_em')
+            )
+            for pk, numero, atual, bloqueado, atualizado_em in atuais:
+                # O destino nunca está entre as próprias origens: com ele e o carimbo deste
+                # UPDATE, a linha foi alterada agora
+                if atual == status and atualizado_em == agora:
+                    resultados[pk] = (numero, 'alterado')
+                elif bloqueado:
+                    resultados[pk] = (numero, 'bloqueado')
+                else:
+                    resultados[pk] = (numero, 'transicao_invalida')
+        return resultados
+    
+    @classmethod
+    def resumir_status_lote(cls, resultados, status, limite=20):
+        """Mensagens para o usuário: (sucesso, aviso com os não alterados), cada uma ou None"""
+        alterados = sum(1 for _, resultado in resultados.values() if resultado == 'alterado')
+        recusados = [
+            f'{numero or f"#{pk}"}: {cls.RESULTADOS_LOTE[resultado]}'
+            for pk, (numero, resultado) in resultados.items()
+            if resultado != 'alterado'
+        ]
+        sucesso = aviso = None
+        if alterados:
+            sucesso = f'{alterados} orçamento(s) alterado(s) para {dict(cls.STATUS_CHOICES)[status]}.'
+        if recusados:
+            # Mensagens vão em cookie: a lista é cortada
+            aviso = f'{len(recusados)} não alterado(s): ' + '; '.join(recusados[:limite])
+            if len(recusados) > limite:
+                aviso += f' e mais {len(recusados) - limite}'
+        return sucesso, aviso
+    
+    @classmethod
+    def vencendo(cls, dias=7, hoje=None):
+        """Orçamentos em aberto cuja validade termina nos próximos `dias` dias"""
+        hoje = hoje or timezone.localdate()
+        return cls.objects.filter(
+            status__in=cls.STATUS_EM_ABERTO,
+            data_validade__range=(hoje, hoje + timedelta(days=dias)),
+        )
+    
+    @classmethod
+    def vencidos(cls, hoje=None):
+        """Orçamentos em aberto com a validade já encerrada"""
+        hoje = hoje or timezone.localdate()
+        return cls.objects.filter(status__in=cls.STATUS_EM_ABERTO, data_validade__lt=hoje)
     
     def pode_editar(self):
         """Verifica se o orçamento pode ser editado"""
         return not self.bloqueado
+    
+    def _avancar_versao(self, versao):
+        """Primeiro comando das gravações do editor: sobe a versão se ainda for `versao`.
+        
+        Levanta OrcamentoBloqueado se o pedido foi gerado e ConflitoEdicao se outra pessoa
+        gravou antes. Precisa estar dentro da transação da gravação.
+        """
+        atualizados = Orcamento.objects.filter(pk=self.pk, versao=versao, bloqueado=False).update(
+            versao=F('versao') + 1,
+            atualizado_em=timezone.now(),
+        )
+        if not atualizados:
+            if Orcamento.objects.filter(pk=self.pk, bloqueado=True).exists():
+                raise OrcamentoBloqueado(self.numero)
+            raise ConflitoEdicao(self.numero)
+    
+    def salvar_edicao(self, versao, dados_cliente, itens):
+        """Grava cliente e itens já validados se ninguém alterou o orçamento desde `versao`.
+        
+        O primeiro comando da transação já é o UPDATE da versão: a trava de escrita é pega
+        de imediato e só dura os comandos finais. Levanta ConflitoEdicao se a versão mudou.
+        """
+        with transaction.atomic():
+            self._avancar_versao(versao)
+            
+            cliente = self.cliente
+            for campo, valor in dados_cliente.items():
+                setattr(cliente, campo, valor)
+            cliente.save()
+            
+            ItemOrcamento.objects.filter(orcamento=self).delete()
+            for item in itens:
+                item.orcamento = self
+            ItemOrcamento.objects.bulk_create(itens)
+            
+            self.versao = versao + 1
+            return self.calcular_total()
+    
+    def alterar_itens(self, versao, salvar=(), excluir=()):
+        """Grava só as linhas alteradas e ajusta o total pela diferença (autosave do editor).
+        
+        `salvar` são ItemOrcamento já validados e normalizados, identificados por numero_item
+        (cria se não existir, substitui se existir); `excluir` são números de item.
+        O custo depende só das linhas enviadas, não do tamanho do orçamento.
+        """
+        salvar = {item.numero_item: item for item in salvar}
+        excluir = set(excluir) - set(salvar)
+        
+        with transaction.atomic():
+            self._avancar_versao(versao)
+            
+            anteriores = dict(
+                ItemOrcamento.objects.filter(orcamento=self, numero_item__in=[*salvar, *excluir])
+                .order_by()
+                .values_list('numero_item', 'valor_total')
+            )
+            diferenca = Decimal('0')
+            novos = []
+            for numero, item in salvar.items():
+                item.orcamento = self
+                diferenca += item.valor_total
+                if numero in anteriores:
+                    diferenca -= anteriores[numero]
+                    ItemOrcamento.objects.filter(orcamento=self, numero_item=numero).update(
+                        unidade_id=item.unidade_id,
+                        quantidade=item.quantidade,
+                        descricao=item.descricao,
+                        marca=item.marca,
+                        valor_unitario=item.valor_unitario,
+                        valor_total=item.valor_total,
+                    )
+                else:
+                    novos.append(item)
+            ItemOrcamento.objects.bulk_create(novos)
+            
+            removidos = [numero for numero in excluir if numero in anteriores]
+            if removidos:
+                ItemOrcamento.objects.filter(orcamento=self, numero_item__in=removidos).delete()
+                diferenca -= sum(anteriores[numero] for numero in removidos)
+            
+            if diferenca:
+                Orcamento.objects.filter(pk=self.pk).update(total=Round(F('total') + diferenca, 2))
+        
+        self.refresh_from_db(fields=['total', 'versao', 'atualizado_em'])
+        return self.total
+    
+    def duplicar(self, empresa=None, ajuste_percentual=None):
+        """Cria um rascunho novo com cópia do cliente e de todos os itens.
+        
+        Os itens são copiados com um único INSERT ... SELECT, já aplicando o
+        reajuste de preço (ex.: Decimal('5') = +5%, Decimal('-3') = -3%).
+        """
+        empresa = empresa or self.empresa
+        
+        with transaction.atomic():
+            cliente = self.cliente
+            # Cada orçamento tem o seu cliente (cópia dos dados da época)
+            novo_cliente = Cliente.objects.create(
+                nome=cliente.nome,
+                cpf_cnpj=cliente.cpf_cnpj,
+                endereco=cliente.endereco,
+                telefone=cliente.telefone,
+                email=cliente.email,
+            )
+            novo = Orcamento.objects.create(
+                empresa=empresa,
+                cliente=novo_cliente,
+                validade_dias=self.validade_dias,
+                prazo_entrega=self.prazo_entrega,
+                observacoes=self.observacoes,
+                desconto=self.desconto,
+            )
+            ItemOrcamento.copiar_itens(self, novo, ajuste_percentual)
+            novo.calcular_total()
+        return novo
 
 
 class ItemOrcamento(models.Model):
@@ -154,12 +437,7 @@ class ItemOrcamento(models.Model):
     def save(self, *args, **kwargs):
         # Calcular valor total automaticamente
 
-        if self.descricao:
-            self.descricao = self.descricao.upper()
-        if self.marca:
-            self.marca = self.marca.upper()
-
-        self.valor_total = self.quantidade * self.valor_unitario
+        self.normalizar()
 
         # Atribuir número do item automaticamente se não existir
         if not self.numero_item:
@@ -169,4 +447,212 @@ class ItemOrcamento(models.Model):
         super().save(*args, **kwargs)
         
         # Atualizar total do orçamento
-        self.orcamento.calcular_total()
\ No newline at end of file
+        self.orcamento.calcular_total()
+    
+    def normalizar(self):
+        """Maiúsculas e valor_total; chamado pelo save() e antes de bulk_create"""
+        if self.descricao:
+            self.descricao = self.descricao.upper()
+        if self.marca:
+            self.marca = self.marca.upper()
+
+        # Já com 2 casas, como fica gravado: quem soma diferenças (autosave) usa este valor.
+        # Meio centavo sobe, como o ROUND do banco em valor_total_itens()
+        self.valor_total = (self.quantidade * self.valor_unitario).quantize(Decimal('0.01'), rounding=ROUND_HALF_UP)
+    
+    @classmethod
+    def copiar_itens(cls, origem, destino, ajuste_percentual=None):
+        """Copia os itens de um orçamento para outro com um único INSERT ... SELECT"""
+        valor_unitario = F('valor_unitario')
+        if ajuste_percentual:
+            fator = 1 + Decimal(ajuste_percentual) / 100
+            valor_unitario = Round(F('valor_unitario') * Value(fator), 2)
+        decimal = DecimalField(max_digits=10, decimal_places=2)
+        
+        # O SELECT sai na ordem: campos do values() e depois as anotações, na ordem em que foram criadas
+        selecao = (
+            cls.objects.filter(orcamento=origem)
+            .order_by()
+            .annotate(
+                novo_orcamento=Value(destino.pk),
+                novo_valor_unitario=ExpressionWrapper(valor_unitario, output_field=decimal),
+                novo_valor_total=ExpressionWrapper(Round(F('quantidade') * valor_unitario, 2), output_field=decimal),
+            )
+            .values(
+                'numero_item', 'unidade', 'quantidade', 'descricao', 'marca',
+                'novo_orcamento', 'novo_valor_unitario', 'novo_valor_total',
+            )
+        )
+        colunas = [
+            'numero_item', 'unidade_id', 'quantidade', 'descricao', 'marca',
+            'orcamento_id', 'valor_unitario', 'valor_total',
+        ]
+        conexao = connections[router.db_for_write(cls)]
+        sql, parametros = selecao.query.get_compiler(connection=conexao).as_sql()
+        with conexao.cursor() as cursor:
+            cursor.execute(
+                'INSERT INTO %s (%s) %s' % (
+                    conexao.ops.quote_name(cls._meta.db_table),
+                    ', '.join(conexao.ops.quote_name(coluna) for coluna in colunas),
+                    sql,
+                ),
+                parametros,
+            )
+            return cursor.rowcount
+
+
+class RetratoOrcamento(models.Model):
+    """Tudo o que a visualização e o PDF de um orçamento bloqueado usam, numa única linha.
+    
+    Gravado ao gerar o pedido: cabeçalho, empresa, cliente, itens (com a sigla da
+    unidade) e totais, em JSON comprimido. O orçamento bloqueado passa a ser exibido
+    e impresso a partir dele, com uma leitura e sem junções, e não muda mais se a
+    empresa ou as unidades de medida forem alteradas depois.
+    """
+    CAMPOS_ITEM = ['numero_item', 'quantidade', 'descricao', 'marca', 'valor_unitario', 'valor_total']
+    
+    orcamento = models.OneToOneField(Orcamento, on_delete=models.CASCADE, primary_key=True, related_name='retrato')
+    dados = models.BinaryField()
+    criado_em = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        verbose_name = 'Retrato do Orçamento'
+        verbose_name_plural = 'Retratos dos Orçamentos'
+    
+    def __str__(self):
+        return f"Retrato {self.orcamento_id}"
+    
+    @classmethod
+    def congelar(cls, orcamento):
+        """Grava (ou refaz) o retrato do orçamento como está agora no banco"""
+        orcamento = Orcamento.objects.select_related('empresa', 'cliente').get(pk=orcamento.pk)
+        itens = (
+            ItemOrcamento.objects.filter(orcamento=orcamento)
+            .order_by('numero_item')
+            .values_list(*cls.CAMPOS_ITEM, 'unidade__sigla')
+        )
+        conteudo = {
+            'orcamento': _campos(orcamento),
+            'empresa': _campos(orcamento.empresa),
+            'cliente': _campos(orcamento.cliente),
+            'itens': list(itens),
+        }
+        dados = zlib.compress(json.dumps(conteudo, cls=DjangoJSONEncoder, separators=(',', ':')).encode())
+        retrato, _ = cls.objects.update_or_create(orcamento=orcamento, defaults={'dados': dados})
+        return retrato
+    
+    def restaurar(self):
+        """(orcamento, itens) montados do retrato, sem consultar o banco.
+        
+        Instâncias não salvas (orcamento já com empresa e cliente; itens com a unidade),
+        para os mesmos templates e gerador de PDF; os itens são um gerador, consumido
+        uma única vez por quem monta a página ou o PDF.
+        """
+        conteudo = json.loads(zlib.decompress(bytes(self.dados)))
+        orcamento = _instancia(Orcamento, conteudo['orcamento'])
+        orcamento.empresa = _instancia(Empresa, conteudo['empresa'])
+        orcamento.cliente = _instancia(Cliente, conteudo['cliente'])
+        return orcamento, self._itens(orcamento, conteudo['itens'])
+    
+    @classmethod
+    def _itens(cls, orcamento, linhas):
+        campos = [ItemOrcamento._meta.get_field(nome) for nome in cls.CAMPOS_ITEM]
+        for *valores, sigla in linhas:
+            item = ItemOrcamento(
+                orcamento=orcamento,
+                unidade=UnidadeMedida(sigla=sigla),
+                **{campo.attname: campo.to_python(valor) for campo, valor in zip(campos, valores)},
+            )
+            item._state.adding = False
+            yield item
+
+
+def _campos(instancia):
+    """Campos concretos como texto serializável (datas em ISO, arquivos pelo nome)"""
+    return {
+        campo.attname: None if campo.value_from_object(instancia) is None else campo.value_to_string(instancia)
+        for campo in instancia._meta.concrete_fields
+    }
+
+
+def _instancia(modelo, campos):
+    instancia = modelo(**{
+        campo.attname: campo.to_python(campos[campo.attname])
+        for campo in modelo._meta.concrete_fields if campo.attname in campos
+    })
+    instancia._state.adding = False
+    return instancia
+
+
+class Alteracao(models.Model):
+    """Log de alterações (só inclusão) de orçamentos, pedidos e seus itens.
+    
+    Gravado pelos gatilhos do banco (migrações orcamentos 0007 e pedidos 0004) na mesma transação da
+    alteração, inclusive em operações em lote. O id só cresce: serve de cursor para
+    quem precisa atualizar dados derivados (totais, buscas, cache de PDF) só pelo que mudou.
+    """
+    OPERACOES = [
+        ('insert', 'Inclusão'),
+        ('update', 'Alteração'),
+        ('delete', 'Exclusão'),
+    ]
+    
+    tabela = models.CharField(max_length=50)
+    operacao = models.CharField(max_length=6, choices=OPERACOES)
+    registro_id = models.BigIntegerField()
+    documento_id = models.BigIntegerField()  # Orçamento ou pedido da linha alterada
+    criado_em = models.DateTimeField()
+    
+    class Meta:
+        verbose_name = 'Alteração'
+        verbose_name_plural = 'Alterações'
+        ordering = ['id']
+    
+    def __str__(self):
+        return f"{self.operacao} {self.tabela} #{self.registro_id}"
+
+
+class ConsumidorAlteracoes(models.Model):
+    """Posição de leitura de cada consumidor do log; a compactação apaga o que todos já leram"""
+    nome = models.CharField(max_length=50, primary_key=True)
+    posicao = models.BigIntegerField(default=0)  # Último Alteracao.id processado
+    atualizado_em = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        verbose_name = 'Consumidor de Alterações'
+        verbose_name_plural = 'Consumidores de Alterações'
+    
+    def __str__(self):
+        return f"{self.nome} ({self.posicao})"
+    
+    @classmethod
+    def pendentes(cls, nome, limite=1000):
+        """Próximas alterações ainda não confirmadas pelo consumidor (registra o consumidor na primeira vez)"""
+        consumidor, _ = cls.objects.get_or_create(nome=nome)
+        return list(Alteracao.objects.filter(id__gt=consumidor.posicao).order_by('id')[:limite])
+    
+    @classmethod
+    def confirmar(cls, nome, posicao):
+        """Marca como processado tudo até `posicao` (nunca volta o cursor)"""
+        cls.objects.filter(nome=nome, posicao__lt=posicao).update(posicao=posicao, atualizado_em=timezone.now())
+
+
+class MapeamentoImportacao(models.Model):
+    """Id novo de cada linha trazida de outro banco por `manage.py importar_sqlite`.
+    
+    Gravado na mesma transação do lote importado: a importação interrompida recomeça
+    depois do último id de origem registrado, e as chaves estrangeiras das tabelas
+    seguintes (empresa, cliente, unidade) são traduzidas por aqui.
+    """
+    origem = models.CharField(max_length=100)  # Nome dado ao banco importado (--origem)
+    tabela = models.CharField(max_length=50)
+    id_origem = models.BigIntegerField()
+    id_destino = models.BigIntegerField()
+    
+    class Meta:
+        verbose_name = 'Mapeamento de Importação'
+        verbose_name_plural = 'Mapeamentos de Importação'
+        unique_together = ['origem', 'tabela', 'id_origem']
+    
+    def __str__(self):
+        return f"{self.origem} {self.tabela} #{self.id_origem} -> #{self.id_destino}"
@@ -0,0 +1,27 @@
+# orcamentos/replica.py
+import os
+import sqlite3
+from contextlib import closing
+
+from django.db import connections
+
+from .roteadores import BANCO_LEITURA
+
+
+def copiar_sqlite(origem, destino):
+    """Cópia consistente de um banco SQLite; o destino é trocado de uma vez ao final.
+
+    Conexões já abertas na cópia antiga continuam lendo a versão anterior até fecharem.
+    """
+    temporario = f'{destino}.tmp'
+    with closing(sqlite3.connect(origem, timeout=30)) as fonte, closing(sqlite3.connect(temporario)) as copia:
+        fonte.backup(copia)
+    os.replace(temporario, destino)
+
+
+def atualizar_replica(origem='default', destino=BANCO_LEITURA):
+    conexao_origem, conexao_destino = connections[origem], connections[destino]
+    if conexao_origem.vendor != 'sqlite' or conexao_destino.vendor != 'sqlite':
+        raise ValueError('A cópia local só existe para SQLite; em outros bancos aponte a réplica para um servidor de leitura.')
+    copiar_sqlite(conexao_origem.settings_dict['NAME'], conexao_destino.settings_dict['NAME'])
+    conexao_destino.close()
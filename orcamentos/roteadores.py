@@ -0,0 +1,96 @@
+# orcamentos/roteadores.py
+import os
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import wraps
+
+from asgiref.sync import iscoroutinefunction
+from django.conf import settings
+from django.db import connections
+
+BANCO_LEITURA = 'leitura'
+
+# Só as tabelas do sistema vão para a réplica; sessão, usuários etc. ficam sempre no principal
+APPS_REPLICADOS = {'orcamentos', 'pedidos'}
+
+_leitura_ativa = ContextVar('leitura_ativa', default=False)
+
+
+@contextmanager
+def leitura():
+    """Manda as consultas de leitura do bloco para a réplica (relatórios, exportações, buscas)"""
+    token = _leitura_ativa.set(True)
+    try:
+        yield
+    finally:
+        _leitura_ativa.reset(token)
+
+
+def somente_leitura(view):
+    """Decorator para views que só consultam e toleram dados de alguns minutos atrás"""
+    if iscoroutinefunction(view):
+        @wraps(view)
+        async def envolvida(*args, **kwargs):
+            with leitura():
+                return await view(*args, **kwargs)
+    else:
+        @wraps(view)
+        def envolvida(*args, **kwargs):
+            with leitura():
+                return view(*args, **kwargs)
+    return envolvida
+
+
+def replica_disponivel():
+    if BANCO_LEITURA not in settings.DATABASES:
+        return False
+    conexao = connections[BANCO_LEITURA]
+    # Nos testes (TEST MIRROR) a réplica aponta para o próprio banco principal: lê direto dele
+    if conexao.settings_dict['NAME'] == connections['default'].settings_dict['NAME']:
+        return False
+    if conexao.vendor != 'sqlite' or conexao.is_in_memory_db():
+        return True
+    # Cópia ainda não gerada: sem ela o SQLite criaria um banco vazio
+    return os.path.exists(conexao.settings_dict['NAME'])
+
+
+class RoteadorLeitura:
+    """Leituras dentro de `leitura()` vão para a réplica; escritas sempre para o 'default'"""
+
+    def db_for_read(self, model, **hints):
+        if not _leitura_ativa.get() or model._meta.app_label not in APPS_REPLICADOS:
+            return None
+        # Dentro de uma transação o código precisa enxergar o que acabou de gravar
+        if connections['default'].in_atomic_block:
+            return None
+        if 'instance' in hints or not replica_disponivel():
+            return None
+        return BANCO_LEITURA
+
+    def db_for_write(self, model, **hints):
+        instancia = hints.get('instance')
+        if instancia is not None and instancia._state.db == BANCO_LEITURA:
+            return 'default'
+        return None
+
+    def allow_relation(self, obj1, obj2, **hints):
+        bancos = {'default', BANCO_LEITURA}
+        if obj1._state.db in bancos and obj2._state.db in bancos:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # A réplica é uma cópia do banco principal, já vem com as tabelas
+        if db == BANCO_LEITURA:
+            return False
+        return None
+
+
+class RoteadorArquivo:
+    """O banco 'arquivo' guarda só as tabelas do app orcamentos e é usado apenas com .using('arquivo')"""
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        if db == 'arquivo':
+            # Gatilhos do log de alterações (hint somente_principal) ficam só no banco principal
+            return app_label == 'orcamentos' and not hints.get('somente_principal')
+        return None
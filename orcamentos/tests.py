@@ -1,3 +1,1887 @@
-from django.test import TestCase
+import asyncio
+import gzip
+import json
+import os
+import re
+import sqlite3
+import subprocess
+import sys
+import tempfile
+from collections import Counter
+from contextlib import ExitStack, closing
+from datetime import date, timedelta
+from decimal import ROUND_HALF_UP, Decimal
+from importlib import import_module
+from io import StringIO
+from unittest import mock, skipUnless
 
-# Create your tests here.
+from asgiref.sync import async_to_sync
+from django.apps import apps as django_apps
+
+from django.conf import settings
+from django.contrib import admin as django_admin
+from django.contrib.auth.models import User
+from django.contrib.contenttypes.models import ContentType
+from django.contrib.sessions.models import Session
+from django.core.exceptions import ImproperlyConfigured
+from django.core.management import CommandError, call_command
+from django.db import connection, connections, router, transaction
+from django.db.models import QuerySet
+from django.http import HttpResponse
+from django.test import RequestFactory, SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from pedidos.models import ItemPedido, Pedido
+
+from . import cache_pdf, urls as orcamentos_urls, views
+from .admin import ItemOrcamentoInline, PaginatorContagemEstimada, _estimar_linhas
+from .admissao import ControleAdmissao, Sobrecarga
+from .consultas_lentas import RegistroConsultasLentas, configuracao, impressao
+from .estaticos import servir_estatico
+from .importacao import ImportadorSQLite
+from .management.commands import arquivar_orcamentos
+from .management.commands.arquivar_orcamentos import copiar_linhas
+from .middleware import CompressaoMiddleware, brotli, codificacao_preferida
+from .models import (
+    Alteracao, Cliente, ConsumidorAlteracoes, Empresa, ItemOrcamento, Orcamento, OrcamentoBloqueado, RetratoOrcamento,
+    UnidadeMedida,
+)
+from .replica import copiar_sqlite
+from .roteadores import BANCO_LEITURA, leitura, replica_disponivel, somente_leitura
+
+
+class RoteadorLeituraTests(SimpleTestCase):
+    # Só a decisão do roteador é testada; nenhuma consulta chega ao banco
+    def setUp(self):
+        self.enterContext(mock.patch('orcamentos.roteadores.replica_disponivel', return_value=True))
+
+    def test_leituras_fora_do_bloco_usam_o_principal(self):
+        self.assertEqual(router.db_for_read(Orcamento), 'default')
+        self.assertEqual(Orcamento.objects.all().db, 'default')
+
+    def test_leituras_dentro_do_bloco_usam_a_replica(self):
+        with leitura():
+            self.assertEqual(router.db_for_read(Orcamento), BANCO_LEITURA)
+            self.assertEqual(Orcamento.objects.all().db, BANCO_LEITURA)
+        self.assertEqual(router.db_for_read(Orcamento), 'default')
+
+    def test_escritas_sempre_no_principal(self):
+        with leitura():
+            self.assertEqual(router.db_for_write(Orcamento), 'default')
+            orcamento = Orcamento(numero='ORC-1')
+            orcamento._state.db = BANCO_LEITURA
+            self.assertEqual(router.db_for_write(Orcamento, instance=orcamento), 'default')
+
+    def test_sessao_nunca_vai_para_a_replica(self):
+        with leitura():
+            self.assertEqual(router.db_for_read(Session), 'default')
+
+    def test_decorator_em_view_sincrona_e_assincrona(self):
+        @somente_leitura
+        def view(request):
+            return Cliente.objects.all().db
+
+        @somente_leitura
+        async def view_async(request):
+            return Cliente.objects.all().db
+
+        self.assertEqual(view(None), BANCO_LEITURA)
+        self.assertEqual(async_to_sync(view_async)(None), BANCO_LEITURA)
+        self.assertEqual(Cliente.objects.all().db, 'default')
+
+    def test_espelho_de_teste_nao_conta_como_replica(self):
+        # O nome importado aqui é a função original, não a do mock.patch do setUp
+        self.assertFalse(replica_disponivel())
+
+
+class RoteadorLeituraTransacaoTests(TransactionTestCase):
+    def test_dentro_de_transacao_le_o_que_gravou(self):
+        with mock.patch('orcamentos.roteadores.replica_disponivel', return_value=True):
+            with leitura(), transaction.atomic():
+                empresa = Empresa.objects.create(
+                    nome='Empresa', cnpj='00', endereco='Rua', telefone='0', email='a@a.com'
+                )
+                self.assertEqual(Empresa.objects.all().db, 'default')
+                self.assertTrue(Empresa.objects.filter(pk=empresa.pk).exists())
+            with leitura():
+                self.assertEqual(Empresa.objects.all().db, BANCO_LEITURA)
+
+
+@override_settings(STORAGES={**settings.STORAGES, 'staticfiles': {
+    'BACKEND': 'django.contrib.staticfiles.storage.StaticFilesStorage',
+}})
+class RoteamentoViewsTests(SimpleTestCase):
+    """Relatórios e buscas consultam a réplica; a listagem comum continua no principal"""
+
+    databases = {'default', BANCO_LEITURA}
+
+    def setUp(self):
+        self.enterContext(mock.patch('orcamentos.roteadores.replica_disponivel', return_value=True))
+
+    def _consultas(self, url, params=None):
+        with CaptureQueriesContext(connections['default']) as principal, \
+                CaptureQueriesContext(connections[BANCO_LEITURA]) as replica:
+            resposta = self.client.get(url, params or {})
+        self.assertEqual(resposta.status_code, 200)
+
+        def tabelas(consultas):
+            return [c['sql'] for c in consultas if c['sql'].startswith('SELECT') and '"django_session"' not in c['sql']]
+        return tabelas(principal.captured_queries), tabelas(replica.captured_queries)
+
+    def test_busca_de_pedidos_vai_para_a_replica(self):
+        principal, replica = self._consultas(reverse('lista_pedidos'), {'q': 'pref', 'status': 'aberto'})
+        self.assertEqual(principal, [])
+        self.assertTrue(any('"pedidos_pedido"' in sql for sql in replica))
+
+    def test_relatorio_de_validade_vai_para_a_replica(self):
+        for validade in ('vencendo', 'vencidos'):
+            with self.subTest(validade=validade):
+                principal, replica = self._consultas(reverse('orcamentos:listar_orcamentos'), {'validade': validade})
+                self.assertEqual(principal, [])
+                self.assertTrue(any('"orcamentos_orcamento"' in sql for sql in replica))
+
+    def test_listagem_comum_le_do_principal(self):
+        principal, replica = self._consultas(reverse('orcamentos:listar_orcamentos'))
+        self.assertTrue(any('"orcamentos_orcamento"' in sql for sql in principal))
+        self.assertEqual(replica, [])
+
+
+class CopiaSQLiteTests(SimpleTestCase):
+    def setUp(self):
+        self.diretorio = tempfile.TemporaryDirectory()
+        self.principal = os.path.join(self.diretorio.name, 'principal.sqlite3')
+        self.copia = os.path.join(self.diretorio.name, 'leitura.sqlite3')
+        with closing(sqlite3.connect(self.principal)) as conexao:
+            conexao.execute('CREATE TABLE t (id INTEGER PRIMARY KEY, v REAL)')
+            conexao.executemany('INSERT INTO t (v) VALUES (?)', [(i,) for i in range(1000)])
+            conexao.commit()
+        copiar_sqlite(self.principal, self.copia)
+
+    def tearDown(self):
+        self.diretorio.cleanup()
+
+    def test_copia_tem_os_dados_e_e_trocada_inteira(self):
+        with closing(sqlite3.connect(self.principal)) as conexao:
+            conexao.execute('INSERT INTO t (v) VALUES (-1)')
+            conexao.commit()
+        with closing(sqlite3.connect(self.copia)) as antiga:
+            copiar_sqlite(self.principal, self.copia)
+            # Quem já estava lendo continua na versão anterior
+            self.assertEqual(antiga.execute('SELECT count(*) FROM t').fetchone()[0], 1000)
+        with closing(sqlite3.connect(self.copia)) as nova:
+            self.assertEqual(nova.execute('SELECT count(*) FROM t').fetchone()[0], 1001)
+        self.assertFalse(os.path.exists(self.copia + '.tmp'))
+
+
+class ImportacaoPreguicosaTests(SimpleTestCase):
+    """Carregar os apps e as URLs não pode importar a pilha de PDF (ReportLab e PIL)"""
+
+    PACOTES_PDF = {'reportlab', 'PIL'}
+
+    SCRIPT = (
+        'import django\n'
+        'from django.conf import settings\n'
+        'settings.PDF_PRECARREGAR = False\n'
+        'django.setup()\n'
+        'from django.urls import get_resolver\n'
+        'get_resolver().url_patterns\n'
+    )
+
+    def _importacoes(self):
+        """Módulos e tempo acumulado (µs) segundo o -X importtime de um processo novo"""
+        processo = subprocess.run(
+            [sys.executable, '-X', 'importtime', '-c', self.SCRIPT],
+            cwd=settings.BASE_DIR,
+            env={**os.environ, 'DJANGO_SETTINGS_MODULE': settings.SETTINGS_MODULE},
+            capture_output=True, text=True, timeout=120,
+        )
+        self.assertEqual(processo.returncode, 0, processo.stderr[-2000:])
+        modulos = {}
+        for linha in processo.stderr.splitlines():
+            if not linha.startswith('import time:') or 'cumulative' in linha:
+                continue
+            _, acumulado, nome = linha[len('import time:'):].split('|')
+            modulos[nome.strip()] = int(acumulado)
+        return modulos
+
+    def test_apps_e_urls_nao_importam_reportlab_nem_pil(self):
+        modulos = self._importacoes()
+        self.assertIn('orcamentos.views', modulos)
+        carregados = sorted(nome for nome in modulos if nome.split('.')[0] in self.PACOTES_PDF)
+        self.assertEqual(carregados, [], 'importados na inicialização: ' + ', '.join(carregados[:10]))
+
+
+class StatusEmLoteTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.empresa = Empresa.objects.create(
+            nome='Empresa', cnpj='00', endereco='Rua', telefone='0', email='a@a.com'
+        )
+
+    def _orcamento(self, status):
+        cliente = Cliente.objects.create(nome='Cliente', cpf_cnpj='1', endereco='Rua')
+        return Orcamento.objects.create(empresa=self.empresa, cliente=cliente, status=status)
+
+    def test_um_update_com_resultado_por_orcamento(self):
+        rascunho, enviado, pedido = self._orcamento('rascunho'), self._orcamento('enviado'), self._orcamento('rascunho')
+        pedido.gerar_pedido()
+        with CaptureQueriesContext(connection) as consultas:
+            resultados = Orcamento.mudar_status_em_lote([rascunho.id, enviado.id, pedido.id, 0], 'enviado')
+        # SAVEPOINT, UPDATE, leitura, RELEASE: o UPDATE antes da leitura pega a trava de escrita
+        self.assertEqual(len(consultas), 4)
+        self.assertTrue(consultas[1]['sql'].startswith('UPDATE "orcamentos_orcamento"'), consultas[1]['sql'])
+        self.assertEqual(resultados, {
+            0: (None, 'inexistente'),
+            rascunho.id: (rascunho.numero, 'alterado'),
+            enviado.id: (enviado.numero, 'transicao_invalida'),
+            pedido.id: (pedido.numero, 'bloqueado'),
+        })
+        rascunho.refresh_from_db()
+        self.assertEqual((rascunho.status, rascunho.versao), ('enviado', 2))
+        pedido.refresh_from_db()
+        self.assertEqual(pedido.status, 'pedido')
+
+    def test_resultado_vem_das_linhas_alteradas(self):
+        # Mudou para 'enviado' por outro caminho depois de escolhido na lista: o UPDATE não o
+        # pega e ele não aparece como alterado por este lote
+        rascunho, outro = self._orcamento('rascunho'), self._orcamento('rascunho')
+        Orcamento.objects.filter(pk=outro.pk).update(status='enviado')
+        resultados = Orcamento.mudar_status_em_lote([rascunho.id, outro.id], 'enviado')
+        self.assertEqual(resultados[rascunho.id][1], 'alterado')
+        self.assertEqual(resultados[outro.id][1], 'transicao_invalida')
+        self.assertEqual(Orcamento.objects.get(pk=outro.pk).versao, 1)
+        self.assertEqual(Orcamento.mudar_status_em_lote([], 'enviado'), {})
+
+    def test_destino_fora_das_transicoes(self):
+        with self.assertRaises(ValueError):
+            Orcamento.mudar_status_em_lote([self._orcamento('aprovado').id], 'pedido')
+
+
+# Esquema das migrações orcamentos 0001 e pedidos 0001 (unidade em texto, pedido de um produto só)
+ESQUEMA_0001 = """
+CREATE TABLE orcamentos_empresa (id integer PRIMARY KEY, nome varchar, cor varchar, ativa bool, criado_em datetime);
+CREATE TABLE orcamentos_cliente (id integer PRIMARY KEY, nome varchar, cpf_cnpj varchar UNIQUE, endereco text,
+    telefone varchar, email varchar, criado_em datetime, atualizado_em datetime);
+CREATE TABLE orcamentos_orcamento (id integer PRIMARY KEY, numero varchar, data_emissao date, data_validade date,
+    status varchar, observacoes text, desconto decimal, total decimal, criado_em datetime, atualizado_em datetime,
+    cliente_id bigint, empresa_id bigint);
+CREATE TABLE orcamentos_itemorcamento (id integer PRIMARY KEY, numero_item integer, unidade varchar, quantidade decimal,
+    descricao text, marca varchar, valor_unitario decimal, valor_total decimal, orcamento_id bigint);
+CREATE TABLE pedidos_pedido (id integer PRIMARY KEY, orgao_comprador varchar, numero_pedido varchar, produto varchar,
+    marca varchar, quantidade decimal, data_pedido date, status varchar, criado_em datetime);
+INSERT INTO orcamentos_empresa VALUES (4, 'Empresa', '#000000', 1, '2024-01-02 10:00:00');
+INSERT INTO orcamentos_cliente VALUES (7, 'cliente a', '1', 'rua a', NULL, NULL, '2024-01-03 10:00:00', '2024-01-03 10:00:00');
+INSERT INTO orcamentos_cliente VALUES (9, 'cliente b', '2', 'rua b', NULL, NULL, '2024-01-03 10:00:00', '2024-01-03 10:00:00');
+INSERT INTO orcamentos_orcamento VALUES (1, 'ORC-4-00001', '2024-02-01', NULL, 'enviado', 'obs', 5, 0,
+    '2024-02-01 12:00:00', '2024-02-01 12:00:00', 7, 4);
+INSERT INTO orcamentos_orcamento VALUES (2, 'ORC-4-00002', '2024-02-05', NULL, 'rascunho', '', 0, 0,
+    '2024-02-05 12:00:00', '2024-02-05 12:00:00', 9, 4);
+INSERT INTO orcamentos_orcamento VALUES (3, 'ORC-4-00003', '2024-02-06', NULL, 'aprovado', '', 0, 0,
+    '2024-02-06 12:00:00', '2024-02-06 12:00:00', 7, 4);
+INSERT INTO orcamentos_itemorcamento VALUES (1, 1, 'mts', 2.5, 'cabo', '', 10, 25, 1);
+INSERT INTO orcamentos_itemorcamento VALUES (2, 2, 'pça', 3, 'tomada', 'marca', 1.5, 4.5, 1);
+INSERT INTO orcamentos_itemorcamento VALUES (3, 1, 'cx', 1, 'caixa', '', 7, 7, 3);
+INSERT INTO pedidos_pedido VALUES (1, 'Prefeitura', '12/2024', 'Cabo', '', 100, '2024-03-01', 'aberto', '2024-03-01 09:00:00');
+"""
+
+
+class ImportarSQLiteTests(TestCase):
+    def setUp(self):
+        diretorio = tempfile.TemporaryDirectory()
+        self.addCleanup(diretorio.cleanup)
+        self.arquivo = os.path.join(diretorio.name, 'legado.sqlite3')
+        with closing(sqlite3.connect(self.arquivo)) as fonte:
+            fonte.executescript(ESQUEMA_0001)
+
+        # Mesma empresa (pelo nome) já em uso aqui, com a sua própria sequência de números
+        self.empresa = Empresa.objects.create(nome='EMPRESA', cnpj='', endereco='Rua', telefone='0', email='a@a.com')
+        self.mts = UnidadeMedida.objects.create(sigla='MTS', descricao='METRO')
+        Orcamento.objects.create(
+            empresa=self.empresa, cliente=Cliente.objects.create(nome='Local', cpf_cnpj='0', endereco='Rua')
+        )
+
+    def _importar(self):
+        call_command('importar_sqlite', self.arquivo, origem='legado', lote=1, pausa=0, stdout=StringIO())
+
+    def test_importa_esquema_antigo_renumerando(self):
+        self._importar()
+
+        importados = Orcamento.objects.exclude(cliente__nome='LOCAL').order_by('id')
+        self.assertEqual(
+            [(o.numero, o.cliente.nome, str(o.data_emissao)) for o in importados],
+            [
+                (f'ORC-{self.empresa.id}-00002', 'CLIENTE A', '2024-02-01'),
+                (f'ORC-{self.empresa.id}-00003', 'CLIENTE B', '2024-02-05'),
+                (f'ORC-{self.empresa.id}-00004', 'CLIENTE A', '2024-02-06'),
+            ],
+        )
+        self.assertEqual(Empresa.objects.count(), 1)
+        primeiro = importados[0]
+        self.assertEqual(primeiro.total, Decimal('24.50'))  # 25 + 4,50 - 5 de desconto
+        self.assertEqual(str(primeiro.data_validade), '2024-02-16')
+        self.assertEqual(primeiro.criado_em.isoformat(), '2024-02-01T12:00:00+00:00')
+        self.assertEqual(
+            list(primeiro.itens.values_list('numero_item', 'unidade__sigla', 'descricao', 'valor_total')),
+            [(1, 'MTS', 'CABO', Decimal('25.00')), (2, 'PÇA', 'TOMADA', Decimal('4.50'))],
+        )
+        self.assertEqual(UnidadeMedida.objects.count(), 3)  # MTS reaproveitada, PÇA e CX criadas
+
+        pedido = Pedido.objects.get()
+        self.assertEqual((pedido.orgao, pedido.numero_pregao), ('Prefeitura', '12/2024'))
+        self.assertEqual(list(pedido.itens.values_list('descricao', 'quantidade')), [('Cabo', Decimal('100.00'))])
+
+    def test_retoma_depois_de_interrupcao(self):
+        importador = ImportadorSQLite(self.arquivo, 'legado', lote=1)
+        lotes = importador.importar()
+        for _ in range(5):  # empresa, 2 clientes e os 2 primeiros orçamentos
+            next(lotes)
+        lotes.close()
+        importador.fechar()
+        self.assertEqual(Orcamento.objects.count(), 3)
+
+        self._importar()
+        self._importar()  # De novo: nada a fazer
+        self.assertEqual(Orcamento.objects.count(), 4)
+        self.assertEqual(ItemOrcamento.objects.count(), 3)
+        self.assertEqual(Cliente.objects.count(), 3)
+        self.assertEqual(Pedido.objects.count(), 1)
+
+
+class RecalcularTotaisTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.empresa = Empresa.objects.create(nome='Empresa', cnpj='00', endereco='Rua', telefone='0', email='a@a.com')
+        cls.unidade = UnidadeMedida.objects.create(sigla='UN', descricao='Unidade')
+
+    def _orcamento(self, *itens, desconto=0):
+        cliente = Cliente.objects.create(nome='Cliente', cpf_cnpj='1', endereco='Rua')
+        orcamento = Orcamento.objects.create(empresa=self.empresa, cliente=cliente, desconto=desconto)
+        ItemOrcamento.objects.bulk_create(
+            ItemOrcamento(
+                orcamento=orcamento, numero_item=numero, unidade=self.unidade, descricao='Item',
+                quantidade=Decimal(quantidade), valor_unitario=Decimal(valor),
+                valor_total=(Decimal(quantidade) * Decimal(valor)).quantize(Decimal('0.01'), rounding=ROUND_HALF_UP),
+            )
+            for numero, (quantidade, valor) in enumerate(itens, start=1)
+        )
+        return orcamento
+
+    def _comando(self, *args):
+        saida = StringIO()
+        call_command('recalcular_totais', *args, stdout=saida)
+        return saida.getvalue()
+
+    def test_calcular_total_num_update_so(self):
+        orcamento = self._orcamento(('3', '1.10'), ('2.5', '4'), desconto=Decimal('0.30'))
+        with self.assertNumQueries(2):  # UPDATE + refresh
+            total = orcamento.calcular_total()
+        self.assertEqual(total, Decimal('13.00'))
+        self.assertEqual(self._orcamento().calcular_total(), Decimal('0'))
+
+    def test_verificar_relata_sem_corrigir(self):
+        orcamento = self._orcamento(('2', '5'))
+        ItemOrcamento.objects.filter(orcamento=orcamento).update(valor_total=Decimal('99'))
+        saida = self._comando('--verificar')
+        self.assertIn('Itens com valor_total divergente: 1', saida)
+        self.assertIn('Orçamentos com total divergente: 1', saida)  # total 0 gravado, 10 calculado
+        self.assertEqual(ItemOrcamento.objects.get(orcamento=orcamento).valor_total, Decimal('99'))
+
+    def test_corrige_so_os_divergentes(self):
+        certo = self._orcamento(('1', '1'))
+        certo.calcular_total()
+        errado = self._orcamento(('2', '5'), desconto=1)
+        ItemOrcamento.objects.filter(orcamento=errado).update(valor_total=Decimal('99'))
+        atualizado_em = Orcamento.objects.get(pk=certo.pk).atualizado_em
+
+        saida = self._comando()
+        self.assertIn('1 itens e 1 orçamentos corrigidos.', saida)
+        errado.refresh_from_db()
+        self.assertEqual(errado.total, Decimal('9.00'))
+        self.assertEqual(errado.itens.get().valor_total, Decimal('10.00'))
+        self.assertEqual(Orcamento.objects.get(pk=certo.pk).atualizado_em, atualizado_em)
+        self.assertIn('0 itens e 0 orçamentos corrigidos.', self._comando())
+
+    def test_meio_centavo_arredonda_igual_nos_itens_e_no_total(self):
+        orcamento = self._orcamento(('0.5', '0.25'))
+        for numero in (2, 3):
+            ItemOrcamento.objects.create(
+                orcamento=orcamento, numero_item=numero, unidade=self.unidade, descricao='Item',
+                quantidade=Decimal('0.5'), valor_unitario=Decimal('0.25'),
+            )
+        self.assertEqual(
+            list(orcamento.itens.values_list('valor_total', flat=True)), [Decimal('0.13')] * 3
+        )
+        self.assertEqual(orcamento.calcular_total(), Decimal('0.39'))
+        self.assertIn('Itens com valor_total divergente: 0', self._comando('--verificar'))
+
+        ItemOrcamento.objects.filter(orcamento=orcamento).update(valor_total=0)
+        self.assertIn('3 itens e 0 orçamentos corrigidos.', self._comando())
+        self.assertEqual(
+            list(orcamento.itens.values_list('valor_total', flat=True)), [Decimal('0.13')] * 3
+        )
+
+
+@override_settings(STORAGES={**settings.STORAGES, 'staticfiles': {
+    'BACKEND': 'django.contrib.staticfiles.storage.StaticFilesStorage',
+}})
+class DuplicarOrcamentoTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.empresa = Empresa.objects.create(nome='Empresa', cnpj='00', endereco='Rua', telefone='0', email='a@a.com')
+        unidade = UnidadeMedida.objects.create(sigla='UN', descricao='Unidade')
+        cliente = Cliente.objects.create(nome='Cliente', cpf_cnpj='1', endereco='Rua')
+        cls.orcamento = Orcamento.objects.create(empresa=cls.empresa, cliente=cliente, desconto=Decimal('1'))
+        # Números fora de ordem de inserção: a cópia tem de manter a numeração, não a ordem dos ids
+        for numero, quantidade, valor in ((3, '2', '9.99'), (1, '1.5', '10'), (2, '3', '0.35')):
+            ItemOrcamento.objects.create(
+                orcamento=cls.orcamento, numero_item=numero, unidade=unidade, descricao=f'Item {numero}',
+                quantidade=Decimal(quantidade), valor_unitario=Decimal(valor),
+            )
+
+    def _url(self):
+        return reverse('orcamentos:duplicar_orcamento', kwargs={'orcamento_id': self.orcamento.id})
+
+    def test_copiar_itens_com_reajuste(self):
+        novo = self.orcamento.duplicar(ajuste_percentual=Decimal('10'))
+        itens = list(novo.itens.order_by('numero_item').values_list('numero_item', 'descricao', 'valor_unitario', 'valor_total'))
+        self.assertEqual(itens, [
+            (1, 'ITEM 1', Decimal('11.00'), Decimal('16.50')),
+            (2, 'ITEM 2', Decimal('0.39'), Decimal('1.17')),  # 0,385 arredonda para cima
+            (3, 'ITEM 3', Decimal('10.99'), Decimal('21.98')),
+        ])
+        self.assertEqual(novo.total, Decimal('38.65'))
+        self.assertEqual(novo.calcular_total(), Decimal('38.65'))
+        self.assertEqual(self.orcamento.itens.count(), 3)
+
+    def test_copiar_itens_sem_reajuste(self):
+        novo = self.orcamento.duplicar()
+        campos = ('numero_item', 'descricao', 'quantidade', 'valor_unitario', 'valor_total')
+        self.assertEqual(
+            list(novo.itens.order_by('numero_item').values_list(*campos)),
+            list(self.orcamento.itens.order_by('numero_item').values_list(*campos)),
+        )
+        self.orcamento.calcular_total()
+        self.assertEqual(novo.total, self.orcamento.total)
+
+    def test_reajuste_invalido_nao_duplica(self):
+        for ajuste, mensagem in (('abc', 'Reajuste inválido'), ('nan', 'Reajuste inválido'),
+                                 ('-100', 'maior que -100%'), ('-150,5', 'maior que -100%')):
+            with self.subTest(ajuste=ajuste):
+                resposta = self.client.post(self._url(), {'ajuste_percentual': ajuste})
+                self.assertEqual(resposta.status_code, 200)
+                self.assertContains(resposta, mensagem)
+        self.assertEqual(Orcamento.objects.count(), 1)
+
+    def test_reajuste_com_virgula(self):
+        resposta = self.client.post(self._url(), {'ajuste_percentual': '-3,5'})
+        novo = Orcamento.objects.exclude(pk=self.orcamento.pk).get()
+        self.assertRedirects(resposta, reverse('orcamentos:editar_orcamento', kwargs={'orcamento_id': novo.id}),
+                             fetch_redirect_response=False)
+        self.assertEqual(novo.itens.get(numero_item=1).valor_unitario, Decimal('9.65'))
+
+    def test_empresa_inexistente_ou_inativa_e_404(self):
+        inativa = Empresa.objects.create(
+            nome='Inativa', cnpj='01', endereco='Rua', telefone='0', email='b@b.com', ativa=False
+        )
+        for empresa in (inativa.id, inativa.id + 1):
+            with self.subTest(empresa=empresa):
+                self.assertEqual(self.client.post(self._url(), {'empresa': empresa}).status_code, 404)
+        self.assertEqual(Orcamento.objects.count(), 1)
+
+    def test_duplicar_para_outra_empresa(self):
+        outra = Empresa.objects.create(nome='Outra', cnpj='01', endereco='Rua', telefone='0', email='b@b.com')
+        self.client.post(self._url(), {'empresa': outra.id})
+        self.assertEqual(Orcamento.objects.exclude(pk=self.orcamento.pk).get().empresa, outra)
+
+
+@override_settings(STORAGES={**settings.STORAGES, 'staticfiles': {
+    'BACKEND': 'django.contrib.staticfiles.storage.StaticFilesStorage',
+}})
+class EdicaoOrcamentoTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.empresa = Empresa.objects.create(nome='Empresa', cnpj='00', endereco='Rua', telefone='0', email='a@a.com')
+        cls.unidade = UnidadeMedida.objects.create(sigla='UN', descricao='Unidade')
+
+    def setUp(self):
+        cliente = Cliente.objects.create(nome='Cliente', cpf_cnpj='1', endereco='Rua')
+        self.orcamento = Orcamento.objects.create(empresa=self.empresa, cliente=cliente)
+        for numero in (1, 2):
+            ItemOrcamento.objects.create(
+                orcamento=self.orcamento, numero_item=numero, unidade=self.unidade, descricao=f'item {numero}',
+                quantidade=Decimal('1'), valor_unitario=Decimal('10'),
+            )
+        self.orcamento.refresh_from_db()
+
+    def _itens(self):
+        return list(self.orcamento.itens.order_by('numero_item').values_list('numero_item', 'descricao', 'valor_total'))
+
+    def _editar(self, versao):
+        linhas = [{'numero_item': 1, 'unidade': self.unidade.id, 'quantidade': '5',
+                   'descricao': 'alterado', 'marca': '', 'valor_unitario': '3'}]
+        return self.client.post(
+            reverse('orcamentos:editar_orcamento', kwargs={'orcamento_id': self.orcamento.id}),
+            {'cliente_nome': 'Cliente', 'cliente_cpf_cnpj': '1', 'cliente_endereco': 'Rua',
+             'itens_json': json.dumps(linhas), 'versao': versao},
+            follow=True,
+        )
+
+    def test_save_soma_a_versao_no_banco(self):
+        versao = self.orcamento.versao
+        outra_copia = Orcamento.objects.get(pk=self.orcamento.pk)
+        self.orcamento.save()
+        outra_copia.save()  # leu a versão antiga, mas não a sobrescreve
+        self.assertEqual(outra_copia.versao, versao + 2)
+        self.assertEqual(Orcamento.objects.get(pk=self.orcamento.pk).versao, versao + 2)
+
+    def test_editar_com_versao_atual(self):
+        resposta = self._editar(self.orcamento.versao)
+        self.assertContains(resposta, 'atualizado com sucesso')
+        self.assertEqual(self._itens(), [(1, 'ALTERADO', Decimal('15.00'))])
+
+    def test_editar_com_versao_antiga_nao_grava(self):
+        versao = self.orcamento.versao
+        self.orcamento.save()  # outra pessoa gravou
+        antes = self._itens()
+        resposta = self._editar(versao)
+        self.assertContains(resposta, 'alterado por outra pessoa')
+        self.assertEqual(self._itens(), antes)
+        self.assertEqual(Orcamento.objects.get(pk=self.orcamento.pk).versao, versao + 1)
+
+    def test_editar_depois_do_pedido_gerado(self):
+        versao = self.orcamento.versao
+        antes = self._itens()
+        # Bloqueado entre a abertura do formulário e a gravação
+        Orcamento.objects.filter(pk=self.orcamento.pk).update(bloqueado=True)
+        with self.assertRaises(OrcamentoBloqueado):
+            self.orcamento.salvar_edicao(versao, {}, [])
+        self.assertEqual(self._itens(), antes)
+
+    def test_api_com_orcamento_bloqueado(self):
+        versao = self.orcamento.versao
+        Orcamento.objects.filter(pk=self.orcamento.pk).update(bloqueado=True)
+        resposta = self.client.delete(
+            reverse('orcamentos:api_item', kwargs={'orcamento_id': self.orcamento.id, 'numero_item': 1}),
+            json.dumps({'versao': versao}), content_type='application/json',
+        )
+        self.assertEqual(resposta.status_code, 409)
+        self.assertIn('bloqueado', resposta.json()['erro'])
+        self.assertEqual(self.orcamento.itens.count(), 2)
+
+    def _api(self, metodo, numero_item, corpo):
+        url = reverse('orcamentos:api_item', kwargs={'orcamento_id': self.orcamento.id, 'numero_item': numero_item})
+        return getattr(self.client, metodo)(url, json.dumps(corpo), content_type='application/json')
+
+    def _confere_total(self, resposta):
+        """O total que a API devolve é o mesmo que o recálculo completo chega"""
+        self.assertEqual(resposta.status_code, 200)
+        dados = resposta.json()
+        self.orcamento.refresh_from_db()
+        self.assertEqual(dados['versao'], self.orcamento.versao)
+        self.assertEqual(Decimal(dados['total']), self.orcamento.calcular_total())
+        return dados
+
+    def test_api_item_cria_altera_e_exclui(self):
+        versao = self.orcamento.versao
+        dados = self._confere_total(self._api('put', 3, {
+            'versao': versao, 'unidade': self.unidade.id, 'quantidade': '2', 'descricao': 'novo',
+            'valor_unitario': '7.25',
+        }))
+        self.assertEqual(dados['itens'], {'3': '14.50'})
+        self.assertEqual(Decimal(dados['total']), Decimal('34.50'))
+
+        # PATCH: só a quantidade; o resto vem da linha gravada
+        dados = self._confere_total(self._api('patch', 1, {'versao': dados['versao'], 'quantidade': '3'}))
+        self.assertEqual(dados['itens'], {'1': '30.00'})
+        self.assertEqual(self.orcamento.itens.get(numero_item=1).descricao, 'ITEM 1')
+
+        dados = self._confere_total(self._api('delete', 2, {'versao': dados['versao']}))
+        self.assertEqual(Decimal(dados['total']), Decimal('44.50'))
+        self.assertEqual(self._itens(), [(1, 'ITEM 1', Decimal('30.00')), (3, 'NOVO', Decimal('14.50'))])
+        self.assertEqual(dados['versao'], versao + 3)
+
+    def test_api_patch_de_item_inexistente(self):
+        resposta = self._api('patch', 9, {'versao': self.orcamento.versao, 'quantidade': '3'})
+        self.assertEqual(resposta.status_code, 404)
+
+    def test_api_itens_lote(self):
+        resposta = self.client.post(
+            reverse('orcamentos:api_itens_lote', kwargs={'orcamento_id': self.orcamento.id}),
+            json.dumps({'versao': self.orcamento.versao, 'itens': [
+                {'numero_item': 1, 'unidade': self.unidade.id, 'quantidade': '4', 'descricao': 'a',
+                 'valor_unitario': '2.50'},
+                {'numero_item': 2, 'acao': 'excluir'},
+                {'numero_item': 5, 'unidade': self.unidade.id, 'quantidade': '1', 'descricao': 'b',
+                 'valor_unitario': '0.99'},
+            ]}),
+            content_type='application/json',
+        )
+        dados = self._confere_total(resposta)
+        self.assertEqual(dados['itens'], {'1': '10.00', '5': '0.99'})
+        self.assertEqual(Decimal(dados['total']), Decimal('10.99'))
+        self.assertEqual([numero for numero, _, _ in self._itens()], [1, 5])
+
+    def test_api_com_versao_antiga(self):
+        versao = self.orcamento.versao
+        self.orcamento.save()  # outra pessoa gravou
+        antes = self._itens()
+        for metodo, numero, corpo in (
+            ('patch', 1, {'quantidade': '9'}),
+            ('delete', 2, {}),
+            ('put', 3, {'unidade': self.unidade.id, 'quantidade': '1', 'descricao': 'x', 'valor_unitario': '1'}),
+        ):
+            with self.subTest(metodo=metodo):
+                resposta = self._api(metodo, numero, {'versao': versao, **corpo})
+                self.assertEqual(resposta.status_code, 409)
+                self.assertIn('alterado por outra pessoa', resposta.json()['erro'])
+        self.assertEqual(self._itens(), antes)
+
+
+@override_settings(STORAGES={**settings.STORAGES, 'staticfiles': {
+    'BACKEND': 'django.contrib.staticfiles.storage.StaticFilesStorage',
+}})
+class RetratoOrcamentoTests(TestCase):
+    def setUp(self):
+        diretorio = tempfile.TemporaryDirectory()
+        self.addCleanup(diretorio.cleanup)
+        self.enterContext(override_settings(PDF_CACHE_DIR=diretorio.name))
+
+        self.empresa = Empresa.objects.create(nome='Empresa Antiga', cnpj='00', endereco='Rua', telefone='0', email='a@a.com')
+        cliente = Cliente.objects.create(nome='Cliente', cpf_cnpj='1', endereco='Rua')
+        self.unidade = UnidadeMedida.objects.create(sigla='CX', descricao='Caixa')
+        self.orcamento = Orcamento.objects.create(empresa=self.empresa, cliente=cliente)
+        ItemOrcamento.objects.create(
+            orcamento=self.orcamento, numero_item=1, unidade=self.unidade, descricao='parafuso antigo',
+            quantidade=Decimal('2'), valor_unitario=Decimal('5'),
+        )
+        self.orcamento.refresh_from_db()
+        self.orcamento.gerar_pedido()
+
+    def _mudar_dados_vivos(self):
+        # Nada disso passa pelo orçamento: só o retrato segura a versão do pedido
+        Empresa.objects.filter(pk=self.empresa.pk).update(nome='Empresa Nova')
+        UnidadeMedida.objects.filter(pk=self.unidade.pk).update(sigla='PCT')
+        ItemOrcamento.objects.filter(orcamento=self.orcamento).update(descricao='PARAFUSO NOVO', valor_unitario=99)
+
+    def test_visualizacao_sai_do_retrato(self):
+        self._mudar_dados_vivos()
+        resposta = self.client.get(reverse('orcamentos:visualizar_orcamento', kwargs={'orcamento_id': self.orcamento.id}))
+        self.assertContains(resposta, 'PARAFUSO ANTIGO')
+        self.assertContains(resposta, 'CX')
+        self.assertContains(resposta, 'Empresa Antiga')
+        self.assertNotContains(resposta, 'PARAFUSO NOVO')
+        self.assertNotContains(resposta, 'Empresa Nova')
+
+    def test_pdf_sai_do_retrato(self):
+        self._mudar_dados_vivos()
+        with mock.patch('reportlab.rl_config.pageCompression', 0):
+            resposta = self.client.get(reverse('orcamentos:gerar_pdf', kwargs={'orcamento_id': self.orcamento.id}))
+        pdf = b''.join(resposta.streaming_content)
+        self.assertIn(b'PARAFUSO ANTIGO', pdf)
+        self.assertIn(b'Empresa Antiga', pdf)
+        self.assertNotIn(b'PARAFUSO NOVO', pdf)
+
+    def test_salvar_bloqueado_mantem_o_retrato(self):
+        orcamento = Orcamento.objects.get(pk=self.orcamento.pk)
+        orcamento.observacoes = 'entrega parcial'
+        orcamento.save()
+        self.assertTrue(RetratoOrcamento.objects.filter(orcamento=orcamento).exists())
+
+    def test_salvar_desbloqueado_nao_apaga_retrato(self):
+        outro = Orcamento.objects.create(empresa=self.empresa, cliente=self.orcamento.cliente)
+        outro = Orcamento.objects.get(pk=outro.pk)
+        # Só o UPDATE e a releitura da versão: nenhum DELETE do retrato
+        with CaptureQueriesContext(connections['default']) as consultas:
+            outro.save()
+        self.assertFalse([c for c in consultas.captured_queries if c['sql'].startswith('DELETE')])
+
+    def test_desbloquear_descarta_o_retrato(self):
+        orcamento = Orcamento.objects.get(pk=self.orcamento.pk)
+        orcamento.bloqueado = False
+        orcamento.save()
+        self.assertFalse(RetratoOrcamento.objects.filter(orcamento=orcamento).exists())
+        self._mudar_dados_vivos()
+        resposta = self.client.get(reverse('orcamentos:visualizar_orcamento', kwargs={'orcamento_id': orcamento.id}))
+        self.assertContains(resposta, 'PARAFUSO NOVO')
+
+
+class ExpirarOrcamentosTests(TestCase):
+    HOJE = '2026-10-19'
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.empresa = Empresa.objects.create(nome='Empresa', cnpj='00', endereco='Rua', telefone='0', email='a@a.com')
+
+    def _orcamento(self, status, validade, bloqueado=False):
+        cliente = Cliente.objects.create(nome='Cliente', cpf_cnpj='1', endereco='Rua')
+        orcamento = Orcamento.objects.create(empresa=self.empresa, cliente=cliente, status=status, bloqueado=bloqueado)
+        # data_validade é derivada no save(): aqui é fixada direto no banco
+        Orcamento.objects.filter(pk=orcamento.pk).update(data_validade=validade)
+        return Orcamento.objects.get(pk=orcamento.pk)
+
+    def _comando(self, *args):
+        saida = StringIO()
+        call_command('expirar_orcamentos', '--data', self.HOJE, *args, stdout=saida)
+        return saida.getvalue()
+
+    def _estado(self):
+        return dict(Orcamento.objects.values_list('pk', 'status'))
+
+    def setUp(self):
+        ontem, hoje = date(2026, 10, 18), date(2026, 10, 19)
+        self.vencidos = [self._orcamento('rascunho', ontem), self._orcamento('enviado', date(2026, 1, 1))]
+        self.intactos = [
+            self._orcamento('rascunho', hoje),  # vence hoje: ainda vale
+            self._orcamento('aprovado', ontem),  # já respondido
+            self._orcamento('pedido', ontem, bloqueado=True),
+            self._orcamento('enviado', ontem, bloqueado=True),  # bloqueado nunca muda de status
+        ]
+
+    def test_expira_so_os_em_aberto_vencidos(self):
+        saida = self._comando()
+        self.assertIn('2 orçamentos expirados', saida)
+        for orcamento in self.vencidos:
+            atual = Orcamento.objects.get(pk=orcamento.pk)
+            self.assertEqual(atual.status, 'expirado')
+            self.assertEqual(atual.versao, orcamento.versao + 1)
+        for orcamento in self.intactos:
+            atual = Orcamento.objects.get(pk=orcamento.pk)
+            self.assertEqual((atual.status, atual.versao), (orcamento.status, orcamento.versao))
+        self.assertIn('0 orçamentos expirados', self._comando())
+
+    def test_simular_nao_grava(self):
+        antes = list(Orcamento.objects.order_by('pk').values_list('status', 'versao', 'atualizado_em'))
+        saida = self._comando('--simular')
+        self.assertIn('2 orçamentos com validade anterior a 19/10/2026 seriam expirados', saida)
+        self.assertEqual(list(Orcamento.objects.order_by('pk').values_list('status', 'versao', 'atualizado_em')), antes)
+
+    def test_data_invalida(self):
+        with self.assertRaisesMessage(CommandError, 'Data inválida'):
+            call_command('expirar_orcamentos', '--data', '19/10/2026', stdout=StringIO())
+
+    def test_migracao_preenche_data_validade(self):
+        preencher = import_module('orcamentos.migrations.0006_orcamento_validade').preencher_data_validade
+        trinta = self._orcamento('rascunho', None)
+        Orcamento.objects.filter(pk=trinta.pk).update(validade_dias=30, data_emissao=date(2026, 1, 31))
+        Orcamento.objects.filter(pk=self.vencidos[0].pk).update(data_emissao=date(2025, 12, 20), data_validade=None)
+
+        preencher(django_apps, mock.Mock(connection=connections['default']))
+        self.assertEqual(Orcamento.objects.get(pk=trinta.pk).data_validade, date(2026, 3, 2))
+        self.assertEqual(Orcamento.objects.get(pk=self.vencidos[0].pk).data_validade, date(2026, 1, 4))
+        self.assertFalse(Orcamento.objects.filter(data_validade__isnull=True).exists())
+
+
+class AlteracoesTests(TestCase):
+    databases = {'default', 'arquivo'}
+
+    @classmethod
+    def setUpTestData(cls):
+        empresa = Empresa.objects.create(nome='Empresa', cnpj='00', endereco='Rua', telefone='0', email='a@a.com')
+        cliente = Cliente.objects.create(nome='Cliente', cpf_cnpj='1', endereco='Rua')
+        cls.unidade = UnidadeMedida.objects.create(sigla='UN', descricao='Unidade')
+        cls.orcamento = Orcamento.objects.create(empresa=empresa, cliente=cliente)
+
+    def setUp(self):
+        self._marcar()
+
+    def _marcar(self):
+        """As próximas chamadas de _novas() só veem o que for registrado daqui em diante"""
+        self.marco = Alteracao.objects.order_by('-id').values_list('id', flat=True).first() or 0
+
+    def _novas(self, tabela):
+        return list(
+            Alteracao.objects.filter(id__gt=self.marco, tabela=tabela)
+            .values_list('operacao', 'registro_id', 'documento_id')
+        )
+
+    def _itens(self, quantidade):
+        return ItemOrcamento.objects.bulk_create(
+            ItemOrcamento(
+                orcamento=self.orcamento, numero_item=numero, unidade=self.unidade, descricao='Item',
+                quantidade=1, valor_unitario=1, valor_total=1,
+            )
+            for numero in range(1, quantidade + 1)
+        )
+
+    def test_operacoes_em_lote_sao_registradas(self):
+        self._itens(3)
+        ids = sorted(item.id for item in ItemOrcamento.objects.filter(orcamento=self.orcamento))
+        self.assertEqual(self._novas('orcamentos_itemorcamento'), [('insert', pk, self.orcamento.pk) for pk in ids])
+
+        self._marcar()
+        ItemOrcamento.objects.filter(orcamento=self.orcamento).update(marca='X')
+        self.assertEqual(self._novas('orcamentos_itemorcamento'), [('update', pk, self.orcamento.pk) for pk in ids])
+
+        self._marcar()
+        ItemOrcamento.objects.filter(pk__in=ids[:2]).delete()
+        self.assertEqual(self._novas('orcamentos_itemorcamento'), [('delete', pk, self.orcamento.pk) for pk in ids[:2]])
+
+    def test_pedidos_sao_registrados(self):
+        pedido = Pedido.objects.create(orgao='Prefeitura', numero_pregao='1', data_pedido=date(2026, 10, 1))
+        pedido.adicionar_itens_em_lote([
+            ItemPedido(descricao='Item', unidade='UN', quantidade=1, valor_unitario=1) for _ in range(2)
+        ])
+        Pedido.objects.filter(pk=pedido.pk).update(status='aberto')
+        self.assertIn(('insert', pedido.pk, pedido.pk), self._novas('pedidos_pedido'))
+        self.assertIn(('update', pedido.pk, pedido.pk), self._novas('pedidos_pedido'))
+        self.assertEqual(
+            [(operacao, documento) for operacao, _, documento in self._novas('pedidos_itempedido')],
+            [('insert', pedido.pk)] * 2,
+        )
+
+    def test_rollback_desfaz_o_registro(self):
+        with self.assertRaises(RuntimeError), transaction.atomic():
+            self._itens(2)
+            raise RuntimeError
+        self.assertEqual(self._novas('orcamentos_itemorcamento'), [])
+
+    def test_gatilhos_so_no_banco_principal(self):
+        consulta = "SELECT count(*) FROM sqlite_master WHERE type = 'trigger' AND name LIKE '%_alteracao_%'"
+        for banco, esperado in (('default', 12), ('arquivo', 0)):
+            with connections[banco].cursor() as cursor:
+                cursor.execute(consulta)
+                self.assertEqual(cursor.fetchone()[0], esperado, banco)
+
+    def test_gatilhos_conforme_o_banco(self):
+        migracoes = [
+            import_module('orcamentos.migrations.0007_alteracao'),
+            import_module('pedidos.migrations.0004_gatilhos_alteracao'),
+        ]
+        for vendor, chave in (('postgresql', 'registrar_alteracao('), ('sqlite', 'strftime('), ('mysql', None)):
+            with self.subTest(vendor=vendor):
+                schema_editor = mock.Mock(connection=mock.Mock(vendor=vendor))
+                for migracao in migracoes:
+                    migracao.criar_gatilhos(django_apps, schema_editor)
+                criados = [chamada.args[0] for chamada in schema_editor.execute.call_args_list]
+                schema_editor.reset_mock()
+                for migracao in reversed(migracoes):
+                    migracao.remover_gatilhos(django_apps, schema_editor)
+                removidos = [chamada.args[0] for chamada in schema_editor.execute.call_args_list]
+                if chave is None:
+                    # Banco sem versão dos gatilhos: a migração passa sem fazer nada
+                    self.assertEqual(criados + removidos, [])
+                    continue
+                self.assertTrue(all(chave in sql for sql in criados if 'CREATE TRIGGER' in sql))
+                # Um gatilho por operação no SQLite, um por tabela no PostgreSQL
+                self.assertEqual(
+                    sum('CREATE TRIGGER' in sql for sql in criados), 12 if vendor == 'sqlite' else 4
+                )
+                self.assertEqual(sum('DROP TRIGGER' in sql for sql in removidos),
+                                 sum('CREATE TRIGGER' in sql for sql in criados))
+
+    def test_pendentes_e_confirmar_avancam_o_cursor(self):
+        self._itens(3)
+        pendentes = ConsumidorAlteracoes.pendentes('totais', limite=2)
+        primeira = Alteracao.objects.order_by('id').first()
+        self.assertEqual(pendentes[0], primeira)
+        self.assertEqual(len(pendentes), 2)
+
+        ConsumidorAlteracoes.confirmar('totais', pendentes[-1].id)
+        seguintes = ConsumidorAlteracoes.pendentes('totais')
+        self.assertTrue(seguintes)
+        self.assertGreater(seguintes[0].id, pendentes[-1].id)
+
+        # Confirmação atrasada (posição menor) não volta o cursor
+        ConsumidorAlteracoes.confirmar('totais', seguintes[-1].id)
+        ConsumidorAlteracoes.confirmar('totais', pendentes[0].id)
+        self.assertEqual(ConsumidorAlteracoes.objects.get(nome='totais').posicao, seguintes[-1].id)
+        self.assertEqual(ConsumidorAlteracoes.pendentes('totais'), [])
+
+    def _compactar(self, *args):
+        saida = StringIO()
+        call_command('compactar_alteracoes', '--pausa', '0', *args, stdout=saida)
+        return saida.getvalue()
+
+    def test_compactar_apaga_so_o_que_todos_confirmaram(self):
+        self._itens(4)
+        ids = list(Alteracao.objects.order_by('id').values_list('id', flat=True))
+        ConsumidorAlteracoes.pendentes('totais')
+        ConsumidorAlteracoes.pendentes('busca')
+        ConsumidorAlteracoes.confirmar('totais', ids[-1])
+        ConsumidorAlteracoes.confirmar('busca', ids[2])
+
+        self.assertIn('3 alterações até o id', self._compactar('--simular'))
+        self.assertEqual(Alteracao.objects.count(), len(ids))
+        self.assertIn('3 alterações apagadas', self._compactar('--lote', '2'))
+        self.assertEqual(list(Alteracao.objects.order_by('id').values_list('id', flat=True)), ids[3:])
+        self.assertEqual(self._compactar(), 'Nada a compactar.\n')
+
+    def test_compactar_sem_consumidores_so_apaga_por_idade(self):
+        self._itens(2)
+        self.assertEqual(self._compactar(), 'Nada a compactar.\n')
+        antigas = list(Alteracao.objects.order_by('id').values_list('id', flat=True))[:1]
+        Alteracao.objects.filter(id__in=antigas).update(criado_em=timezone.now() - timedelta(days=40))
+        self.assertIn('1 alterações apagadas', self._compactar('--dias', '30'))
+        self.assertFalse(Alteracao.objects.filter(id__in=antigas).exists())
+
+
+class ControleAdmissaoTests(SimpleTestCase):
+    def test_fila_atendida_por_ordem_de_chegada(self):
+        controle = ControleAdmissao(limite_processo=1, fila_max=5, espera_max=5)
+        ordem = []
+
+        async def requisicao(numero):
+            async with controle.vaga():
+                ordem.append(numero)
+                await asyncio.sleep(0)
+
+        async def cenario():
+            async with controle.vaga():
+                tarefas = []
+                for numero in range(4):
+                    tarefas.append(asyncio.create_task(requisicao(numero)))
+                    await asyncio.sleep(0)  # entra na fila antes da próxima
+                self.assertEqual(controle.metricas()['na_fila'], 4)
+            await asyncio.gather(*tarefas)
+
+        async_to_sync(cenario)()
+        self.assertEqual(ordem, [0, 1, 2, 3])
+        self.assertEqual(controle.metricas()['ativos'], 0)
+
+    def test_fila_cheia_e_espera_esgotada(self):
+        controle = ControleAdmissao(limite_processo=1, fila_max=1, espera_max=0.05, retry_after=7)
+
+        async def cenario():
+            async with controle.vaga():
+                esperando = asyncio.create_task(controle.vaga().__aenter__())
+                await asyncio.sleep(0)
+                with self.assertRaises(Sobrecarga) as lotada:
+                    async with controle.vaga():
+                        pass
+                self.assertEqual(lotada.exception.retry_after, 7)
+                with self.assertRaises(Sobrecarga):
+                    await esperando  # passou de espera_max na fila
+
+        async_to_sync(cenario)()
+        self.assertEqual(controle.metricas()['rejeitados'], 2)
+        self.assertEqual((controle.metricas()['ativos'], controle.metricas()['na_fila']), (0, 0))
+
+    def test_vaga_global_entre_processos(self):
+        with tempfile.TemporaryDirectory() as diretorio:
+            # Dois controles com o mesmo diretório fazem o papel de dois processos
+            um, outro = (
+                ControleAdmissao(limite_processo=2, limite_global=1, espera_max=0.1,
+                                 diretorio_travas=diretorio, intervalo=0.01)
+                for _ in range(2)
+            )
+
+            async def cenario():
+                async with um.vaga():
+                    with self.assertRaises(Sobrecarga):
+                        async with outro.vaga():
+                            pass
+                async with outro.vaga():
+                    pass
+
+            async_to_sync(cenario)()
+            self.assertEqual(outro.metricas()['ativos'], 0)
+
+
+@override_settings(
+    STORAGES={**settings.STORAGES, 'staticfiles': {
+        'BACKEND': 'django.contrib.staticfiles.storage.StaticFilesStorage',
+    }},
+)
+class AdmissaoPdfViewTests(TestCase):
+    def setUp(self):
+        diretorio = tempfile.TemporaryDirectory()
+        self.addCleanup(diretorio.cleanup)
+        self.enterContext(override_settings(PDF_CACHE_DIR=diretorio.name))
+        self.controle = ControleAdmissao(limite_processo=1, fila_max=0, espera_max=0, retry_after=12)
+        self.enterContext(mock.patch.object(views, 'controle_pdf', self.controle))
+
+        empresa = Empresa.objects.create(nome='Empresa', cnpj='00', endereco='Rua', telefone='0', email='a@a.com')
+        cliente = Cliente.objects.create(nome='Cliente', cpf_cnpj='1', endereco='Rua')
+        orcamento = Orcamento.objects.create(empresa=empresa, cliente=cliente)
+        self.url = reverse('orcamentos:gerar_pdf', kwargs={'orcamento_id': orcamento.id})
+
+    async def test_sem_vaga_responde_503_com_retry_after(self):
+        async with self.controle.vaga():
+            resposta = await self.async_client.get(self.url)
+        self.assertEqual(resposta.status_code, 503)
+        self.assertEqual(resposta['Retry-After'], '12')
+
+    def test_erro_na_geracao_libera_a_vaga(self):
+        with mock.patch.object(views, '_gerar_e_guardar_pdf', side_effect=RuntimeError('falhou')):
+            with self.assertRaises(RuntimeError):
+                self.client.get(self.url)
+        self.assertEqual(self.controle.metricas()['ativos'], 0)
+        self.assertEqual(self.client.get(self.url).status_code, 200)
+
+
+@override_settings(STORAGES={**settings.STORAGES, 'staticfiles': {
+    'BACKEND': 'django.contrib.staticfiles.storage.StaticFilesStorage',
+}})
+class CompararWsgiAsgiTests(TestCase):
+    def _comando(self, *args):
+        saida = StringIO()
+        call_command('comparar_wsgi_asgi', *args, stdout=saida)
+        return saida.getvalue()
+
+    def test_sem_orcamento_pede_as_urls(self):
+        with self.assertRaisesMessage(CommandError, '--url'):
+            self._comando()
+
+    def test_relata_os_dois_handlers(self):
+        url = reverse('orcamentos:listar_orcamentos')
+        saida = self._comando('--url', url, '--clientes', '2', '--requisicoes', '4', '--host', 'testserver')
+        self.assertIn('2 clientes simultâneos, 4 requisições por URL', saida)
+        self.assertIn(url, saida)
+        for modo in ('WSGI', 'ASGI'):
+            self.assertRegex(saida, rf'{modo}: +[\d.]+ req/s \| p50 +[\d.]+ ms \| p95 +[\d.]+ ms \| erros 0')
+
+
+@override_settings(STORAGES={**settings.STORAGES, 'staticfiles': {
+    'BACKEND': 'django.contrib.staticfiles.storage.StaticFilesStorage',
+}})
+class TesteCargaTests(TransactionTestCase):
+    """As threads do teste de carga usam conexões próprias: os dados semeados precisam estar gravados"""
+
+    def setUp(self):
+        diretorio = tempfile.TemporaryDirectory()
+        self.addCleanup(diretorio.cleanup)
+        self.enterContext(override_settings(PDF_CACHE_DIR=diretorio.name))
+
+    def _comando(self, *args):
+        saida = StringIO()
+        call_command('teste_carga', '--host', 'testserver', *args, stdout=saida)
+        return saida.getvalue()
+
+    def test_sem_orcamentos_de_teste(self):
+        with self.assertRaisesMessage(CommandError, '--semear'):
+            self._comando()
+
+    def test_mix_invalido(self):
+        with self.assertRaisesMessage(CommandError, 'Operação desconhecida no --mix: apagar'):
+            self._comando('--mix', 'listar=1,apagar=1')
+
+    def test_relatorio_por_operacao(self):
+        saida = self._comando(
+            '--semear', '2', '--itens', '3', '--usuarios', '1', '--duracao', '1', '--limpar',
+            '--mix', 'listar=1,visualizar=1,criar=1,editar=1,pdf=1',
+        )
+        self.assertIn('2 orçamentos de teste criados com 3 itens cada.', saida)
+        self.assertIn('1 usuários por 1s (WSGI no processo), 2 orçamentos de teste', saida)
+        self.assertRegex(saida, r'operação +req +req/s +p50 ms +p95 ms +p99 ms +máx ms +erros +travado')
+        linhas = dict(re.findall(r'^(\w+) +(\d+ .*)$', saida, re.MULTILINE))
+        self.assertIn('TOTAL', linhas)
+        for nome, linha in linhas.items():
+            with self.subTest(operacao=nome):
+                requisicoes, _, *tempos, erros, travados = linha.split()
+                self.assertGreater(int(requisicoes), 0)
+                self.assertEqual(len(tempos), 4)
+                self.assertEqual((erros, travados), ('0.0%', '0'))
+        self.assertNotIn('Respostas inesperadas', saida)
+        self.assertRegex(saida, r'\d+ orçamentos de teste removidos\.')
+        self.assertFalse(Orcamento.objects.exists())
+
+
+class PdfEmBlocosTests(TestCase):
+    """Orçamentos acima de PDF_LIMITE_ITENS são impressos lendo os itens aos blocos"""
+
+    @classmethod
+    def setUpTestData(cls):
+        empresa = Empresa.objects.create(nome='Empresa', cnpj='00', endereco='Rua', telefone='0', email='a@a.com')
+        cliente = Cliente.objects.create(nome='Cliente', cpf_cnpj='1', endereco='Rua')
+        unidade = UnidadeMedida.objects.create(sigla='UN', descricao='Unidade')
+        cls.orcamento = Orcamento.objects.create(empresa=empresa, cliente=cliente)
+        cls.quantidade = settings.PDF_LIMITE_ITENS + 7
+        ItemOrcamento.objects.bulk_create(
+            ItemOrcamento(
+                orcamento=cls.orcamento, numero_item=numero, unidade=unidade, descricao=f'PRODUTO {numero:04d}',
+                quantidade=Decimal('1'), valor_unitario=Decimal('2'), valor_total=Decimal('2'),
+            )
+            for numero in range(1, cls.quantidade + 1)
+        )
+        cls.orcamento.calcular_total()
+
+    def _renderizar(self, itens):
+        from .gerador_pdf import renderizar
+        # A conexão do teste está dentro da transação: não pode ser fechada como a da thread do pool.
+        # Páginas sem compressão para achar o texto das linhas no PDF
+        with mock.patch('orcamentos.gerador_pdf.close_old_connections'), \
+                mock.patch('reportlab.rl_config.pageCompression', 0):
+            return renderizar(self.orcamento, itens).getvalue()
+
+    def test_mesmo_pdf_que_a_lista_completa(self):
+        itens = async_to_sync(views._itens_pdf)(self.orcamento)
+        self.assertIsInstance(itens, QuerySet)
+        em_blocos = self._renderizar(itens)
+        completo = self._renderizar(list(itens))
+
+        paginas = len(re.findall(rb'/Type /Page\b', em_blocos))
+        self.assertGreater(paginas, self.quantidade // 60)
+        self.assertEqual(paginas, len(re.findall(rb'/Type /Page\b', completo)))
+        linhas = re.findall(rb'PRODUTO (\d{4})', em_blocos)
+        self.assertEqual([int(numero) for numero in linhas], list(range(1, self.quantidade + 1)))
+        self.assertIn(b'R$ %d,00' % (2 * self.quantidade), em_blocos)
+
+
+class CompressaoTests(SimpleTestCase):
+    HTML = ('<html><body>' + 'orçamento ' * 500 + '</body></html>').encode()
+
+    def setUp(self):
+        self.middleware = CompressaoMiddleware(lambda request: None)
+        self.fabrica = RequestFactory()
+
+    def _resposta(self, aceitas, conteudo=HTML, csrf=False, **cabecalhos):
+        request = self.fabrica.get('/', HTTP_ACCEPT_ENCODING=aceitas)
+        resposta = HttpResponse(conteudo, content_type='text/html; charset=utf-8', headers=cabecalhos)
+        if csrf:
+            resposta.set_cookie(settings.CSRF_COOKIE_NAME, 'segredo')
+        return self.middleware.process_response(request, resposta)
+
+    def test_pesos_do_accept_encoding(self):
+        casos = {
+            'gzip, br': 'br',
+            'gzip;q=1.0, br;q=0.5': 'gzip',
+            'br;q=0, gzip': 'gzip',
+            'br;q=0, gzip;q=0': None,
+            'GZIP;Q=0.3': 'gzip',
+            '*': 'br',
+            '*;q=0, gzip': 'gzip',
+            'identity': None,
+            'gzip;q=x': None,
+            '': None,
+        }
+        for aceitas, esperada in casos.items():
+            with self.subTest(aceitas=aceitas):
+                self.assertEqual(codificacao_preferida(aceitas, ['br', 'gzip']), esperada)
+
+    def test_codificacao_recusada_com_peso_zero(self):
+        resposta = self._resposta('br;q=0, gzip;q=0')
+        self.assertFalse(resposta.has_header('Content-Encoding'))
+        self.assertEqual(resposta.content, self.HTML)
+        self.assertEqual(self._resposta('br;q=0, gzip')['Content-Encoding'], 'gzip')
+
+    @skipUnless(brotli, 'pacote brotli não instalado')
+    def test_brotli_fora_das_paginas_com_token_csrf(self):
+        resposta = self._resposta('br, gzip', ETag='"abc"')
+        self.assertEqual(resposta['Content-Encoding'], 'br')
+        self.assertEqual(resposta['ETag'], 'W/"abc"')
+        self.assertIn('Accept-Encoding', resposta['Vary'])
+        self.assertEqual(self._resposta('br, gzip', csrf=True)['Content-Encoding'], 'gzip')
+
+    def test_gzip_com_enchimento_aleatorio(self):
+        # Proteção contra BREACH: o mesmo conteúdo não comprime sempre para o mesmo tamanho
+        corpos = [self._resposta('gzip', csrf=True).content for _ in range(10)]
+        for corpo in corpos:
+            self.assertEqual(gzip.decompress(corpo), self.HTML)
+        self.assertGreater(len({len(corpo) for corpo in corpos}), 1)
+
+    def test_respostas_pequenas_e_de_outro_tipo_passam_intactas(self):
+        self.assertFalse(self._resposta('gzip', conteudo=b'<p>oi</p>').has_header('Content-Encoding'))
+        request = self.fabrica.get('/', HTTP_ACCEPT_ENCODING='gzip')
+        pdf = HttpResponse(self.HTML, content_type='application/pdf')
+        self.assertFalse(self.middleware.process_response(request, pdf).has_header('Content-Encoding'))
+
+
+class EstaticosComprimidosTests(SimpleTestCase):
+    """collectstatic gera as variantes .gz/.br dos arquivos com hash e servir_estatico as escolhe"""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        diretorio = tempfile.TemporaryDirectory()
+        cls.addClassCleanup(diretorio.cleanup)
+        cls.enterClassContext(override_settings(STATIC_ROOT=diretorio.name, STORAGES={
+            **settings.STORAGES, 'staticfiles': {'BACKEND': 'orcamentos.estaticos.ArmazenamentoEstatico'},
+        }))
+        # Os estáticos do admin só deixariam o teste lento
+        call_command('collectstatic', interactive=False, verbosity=0, ignore_patterns=['admin'])
+        cls.raiz = diretorio.name
+        with open(os.path.join(cls.raiz, 'staticfiles.json'), encoding='utf-8') as manifesto:
+            cls.nomes = json.load(manifesto)['paths']
+
+    def _caminho(self, nome):
+        return os.path.join(self.raiz, self.nomes[nome])
+
+    def _ler(self, caminho):
+        with open(caminho, 'rb') as arquivo:
+            return arquivo.read()
+
+    def test_css_ganha_gz_igual_ao_original(self):
+        caminho = self._caminho('orcamentos/css/tailwind.min.css')
+        original = self._ler(caminho)
+        comprimido = self._ler(caminho + '.gz')
+        self.assertEqual(gzip.decompress(comprimido), original)
+        self.assertLess(len(comprimido), len(original))
+
+    @skipUnless(brotli, 'pacote brotli não instalado')
+    def test_css_ganha_br_igual_ao_original(self):
+        caminho = self._caminho('orcamentos/css/tailwind.min.css')
+        self.assertEqual(brotli.decompress(self._ler(caminho + '.br')), self._ler(caminho))
+
+    def test_fonte_nao_e_comprimida_de_novo(self):
+        caminho = self._caminho('orcamentos/webfonts/fa-solid-900-subset.woff2')
+        self.assertTrue(os.path.exists(caminho))
+        self.assertFalse(os.path.exists(caminho + '.gz'))
+        self.assertFalse(os.path.exists(caminho + '.br'))
+
+    def test_variante_escolhida_pelo_accept_encoding(self):
+        nome = self.nomes['orcamentos/css/tailwind.min.css']
+        fabrica = RequestFactory()
+        casos = {'gzip': 'gzip', '': None, 'br;q=0, gzip': 'gzip', 'gzip;q=0': None, 'identity': None}
+        if brotli:
+            casos.update({'gzip, br': 'br', 'br;q=0.5, gzip': 'gzip', '*': 'br'})
+        for aceitas, codificacao in casos.items():
+            with self.subTest(aceitas=aceitas):
+                resposta = servir_estatico(fabrica.get('/', HTTP_ACCEPT_ENCODING=aceitas), nome)
+                self.assertEqual(resposta.get('Content-Encoding'), codificacao)
+                self.assertEqual(resposta['Content-Type'], 'text/css')
+                self.assertIn('immutable', resposta['Cache-Control'])
+                resposta.close()
+
+
+class CachePdfTests(TestCase):
+    def setUp(self):
+        diretorio = tempfile.TemporaryDirectory()
+        self.addCleanup(diretorio.cleanup)
+        self.diretorio = diretorio.name
+        self.enterContext(override_settings(PDF_CACHE_DIR=self.diretorio))
+        empresa = Empresa.objects.create(nome='Empresa', cnpj='00', endereco='Rua', telefone='0', email='a@a.com')
+        cliente = Cliente.objects.create(nome='Cliente', cpf_cnpj='1', endereco='Rua')
+        self.orcamento = Orcamento.objects.create(empresa=empresa, cliente=cliente)
+        self.arquivo = cache_pdf.guardar(self.orcamento, b'%PDF conteudo')
+
+    def _baixar(self, aceitas):
+        request = RequestFactory().get('/', HTTP_ACCEPT_ENCODING=aceitas)
+        resposta = cache_pdf.resposta(request, self.arquivo, 'orcamento.pdf')
+        return resposta, b''.join(resposta.streaming_content)
+
+    def test_gzip_enviado_como_esta_ou_descomprimido(self):
+        resposta, corpo = self._baixar('gzip, deflate')
+        self.assertEqual(resposta['Content-Encoding'], 'gzip')
+        self.assertEqual(gzip.decompress(corpo), b'%PDF conteudo')
+
+        resposta, corpo = self._baixar('gzip;q=0, deflate')
+        self.assertFalse(resposta.has_header('Content-Encoding'))
+        self.assertEqual(corpo, b'%PDF conteudo')
+
+    def test_alterar_unidade_descarta_os_pdfs(self):
+        self.assertEqual(cache_pdf.obter(self.orcamento), self.arquivo)
+        unidade = UnidadeMedida.objects.create(sigla='UN', descricao='Unidade')
+        self.assertIsNone(cache_pdf.obter(self.orcamento))
+
+        cache_pdf.guardar(self.orcamento, b'%PDF novo')
+        unidade.sigla = 'UND'
+        unidade.save()
+        self.assertIsNone(cache_pdf.obter(self.orcamento))
+
+    def test_alterar_cliente_muda_a_chave(self):
+        cliente = Cliente.objects.get(pk=self.orcamento.cliente_id)
+        cliente.endereco = 'Rua Nova'
+        cliente.save()
+        orcamento = Orcamento.objects.select_related('empresa', 'cliente').get(pk=self.orcamento.pk)
+        self.assertEqual(orcamento.atualizado_em, self.orcamento.atualizado_em)
+        self.assertIsNone(cache_pdf.obter(orcamento))
+
+
+@override_settings(STORAGES={**settings.STORAGES, 'staticfiles': {
+    'BACKEND': 'django.contrib.staticfiles.storage.StaticFilesStorage',
+}})
+class ArquivarOrcamentosTests(TestCase):
+    databases = {'default', 'arquivo'}
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.empresa = Empresa.objects.create(nome='Empresa', cnpj='00', endereco='Rua', telefone='0', email='a@a.com')
+        cls.unidade = UnidadeMedida.objects.create(sigla='UN', descricao='Unidade')
+
+    def _orcamento(self, dias_atras=1000, status='rascunho'):
+        cliente = Cliente.objects.create(nome='Cliente', cpf_cnpj='1', endereco='Rua')
+        orcamento = Orcamento.objects.create(empresa=self.empresa, cliente=cliente, status=status)
+        ItemOrcamento.objects.bulk_create(
+            ItemOrcamento(
+                orcamento=orcamento, numero_item=numero, unidade=self.unidade, descricao=f'ITEM {numero}',
+                quantidade=Decimal('1'), valor_unitario=Decimal('2'), valor_total=Decimal('2'),
+            )
+            for numero in (1, 2)
+        )
+        emissao = timezone.localdate() - timedelta(days=dias_atras)
+        Orcamento.objects.filter(pk=orcamento.pk).update(
+            data_emissao=emissao, atualizado_em=timezone.now() - timedelta(days=dias_atras),
+        )
+        return orcamento
+
+    def _arquivar(self, *args):
+        saida = StringIO()
+        call_command('arquivar_orcamentos', '--dias', '730', '--pausa', '0', *args, stdout=saida)
+        return saida.getvalue()
+
+    def _arquivados(self):
+        return set(Orcamento.objects.using('arquivo').values_list('id', flat=True))
+
+    def test_copia_e_depois_remove_do_principal(self):
+        antigo, recente, aprovado = self._orcamento(), self._orcamento(dias_atras=10), self._orcamento(status='aprovado')
+        self.assertIn('1 orçamentos arquivados.', self._arquivar())
+
+        self.assertEqual(self._arquivados(), {antigo.id})
+        copia = Orcamento.objects.using('arquivo').get()
+        self.assertEqual((copia.numero, copia.cliente_id), (antigo.numero, antigo.cliente_id))
+        self.assertEqual(ItemOrcamento.objects.using('arquivo').filter(orcamento_id=antigo.id).count(), 2)
+        self.assertEqual(set(Orcamento.objects.values_list('id', flat=True)), {recente.id, aprovado.id})
+        self.assertFalse(Cliente.objects.filter(pk=antigo.cliente_id).exists())
+        self.assertFalse(ItemOrcamento.objects.filter(orcamento_id=antigo.id).exists())
+
+    def test_simular_nao_move_nada(self):
+        self._orcamento()
+        self.assertIn('1 orçamentos emitidos antes de', self._arquivar('--simular'))
+        self.assertEqual(self._arquivados(), set())
+        self.assertEqual(Orcamento.objects.count(), 1)
+
+    def test_retoma_depois_de_interrupcao(self):
+        primeiro, segundo = self._orcamento(), self._orcamento()
+        # Execução anterior parou depois de copiar o primeiro e antes de removê-lo do principal
+        with transaction.atomic(using='arquivo'):
+            copiar_linhas(Empresa, Empresa.objects.all(), 'arquivo')
+            copiar_linhas(Cliente, Cliente.objects.filter(pk=primeiro.cliente_id), 'arquivo')
+            copiar_linhas(UnidadeMedida, UnidadeMedida.objects.all(), 'arquivo')
+            copiar_linhas(Orcamento, Orcamento.objects.filter(pk=primeiro.pk), 'arquivo')
+
+        self.assertIn('1 orçamentos arquivados.', self._arquivar('--limite', '1'))
+        self.assertIn('1 orçamentos arquivados.', self._arquivar())
+        self.assertEqual(self._arquivados(), {primeiro.id, segundo.id})
+        self.assertEqual(ItemOrcamento.objects.using('arquivo').count(), 4)
+        self.assertFalse(Orcamento.objects.exists())
+
+    def test_orcamento_editado_durante_a_copia_continua_ativo(self):
+        editado = self._orcamento()
+        copiar = arquivar_orcamentos.copiar_linhas
+
+        def copiar_e_editar(model, queryset, destino):
+            copiados = copiar(model, queryset, destino)
+            if model is Orcamento:
+                # Alguém salva o orçamento entre a cópia e a remoção
+                Orcamento.objects.get(pk=editado.pk).save()
+            return copiados
+
+        with mock.patch.object(arquivar_orcamentos, 'copiar_linhas', copiar_e_editar):
+            self.assertIn('0 orçamentos arquivados.', self._arquivar())
+        self.assertTrue(Orcamento.objects.filter(pk=editado.pk).exists())
+        self.assertEqual(ItemOrcamento.objects.filter(orcamento_id=editado.pk).count(), 2)
+        self.assertEqual(self._arquivados(), set())
+
+    def test_banco_de_arquivo_sem_tabelas(self):
+        arquivado = self._orcamento()
+        self._arquivar()
+        with connections['arquivo'].cursor() as cursor:
+            cursor.execute('DROP TABLE orcamentos_itemorcamento')
+            cursor.execute('DROP TABLE orcamentos_orcamento')
+
+        resposta = self.client.get(reverse('orcamentos:listar_arquivados'))
+        self.assertContains(resposta, 'migrate --database=arquivo')
+        resposta = self.client.get(reverse('orcamentos:visualizar_arquivado', kwargs={'orcamento_id': arquivado.id}))
+        self.assertRedirects(resposta, reverse('orcamentos:listar_arquivados'))
+
+
+class ConsultasLentasTests(TestCase):
+    def setUp(self):
+        diretorio = tempfile.TemporaryDirectory()
+        self.addCleanup(diretorio.cleanup)
+        self.arquivo = os.path.join(diretorio.name, 'logs', 'consultas_lentas.jsonl')
+        self.registro = RegistroConsultasLentas({
+            **configuracao(), 'ARQUIVO': self.arquivo, 'LIMITE_MS': 50, 'AMOSTRA_EXPLAIN': 1,
+        })
+
+    def _executar(self, sql, params, ms):
+        """Passa a consulta pelo wrapper fingindo que ela levou `ms` milissegundos"""
+        contexto = {'connection': connections['default']}
+        with mock.patch('orcamentos.consultas_lentas.time.perf_counter', side_effect=[10.0, 10.0 + ms / 1000]):
+            self.registro(lambda *args: 'resultado', sql, params, False, contexto)
+
+    def _registros(self):
+        if not os.path.exists(self.arquivo):
+            return []
+        with open(self.arquivo, encoding='utf-8') as arquivo:
+            return [json.loads(linha) for linha in arquivo]
+
+    def test_so_registra_a_partir_do_limite(self):
+        sql = 'SELECT "id" FROM "orcamentos_cliente" WHERE "nome" = %s'
+        self._executar(sql, ('Cliente',), 49.9)
+        self.assertEqual(self._registros(), [])
+        self._executar(sql, ('Cliente Sigiloso',), 50)
+        registro, = self._registros()
+        self.assertEqual((registro['ms'], registro['banco'], registro['sql']), (50.0, 'default', sql))
+        self.assertEqual(registro['parametros'], {'tipos': ['str']})
+        self.assertTrue(registro['plano'])  # AMOSTRA_EXPLAIN = 1: todas levam o plano
+        with open(self.arquivo, encoding='utf-8') as arquivo:
+            self.assertNotIn('Sigiloso', arquivo.read())
+
+    def test_erro_no_registro_nao_derruba_a_consulta(self):
+        with mock.patch.object(self.registro, '_gravar', side_effect=OSError('disco cheio')):
+            with mock.patch('orcamentos.consultas_lentas.time.perf_counter', side_effect=[0.0, 1.0]):
+                resultado = self.registro(lambda *args: 'resultado', 'SELECT 1', (), False,
+                                          {'connection': connections['default']})
+        self.assertEqual(resultado, 'resultado')
+
+    def _relatorio(self, *args):
+        saida = StringIO()
+        call_command('relatorio_consultas_lentas', '--arquivo', self.arquivo, *args, stdout=saida)
+        return saida.getvalue()
+
+    def test_relatorio_agrupa_pela_impressao_e_ordena_pelo_tempo_total(self):
+        agora = timezone.now()
+        linhas = [
+            # Mesma consulta com valores e listas IN diferentes: uma impressão só
+            {'ms': 300, 'sql': "SELECT * FROM t WHERE id IN (%s, %s) AND nome = 'a'", 'view': 'lista'},
+            {'ms': 400, 'sql': "SELECT * FROM t WHERE id IN (%s, %s, %s) AND nome = 'b'", 'view': 'lista'},
+            {'ms': 600, 'sql': 'UPDATE t SET v = 1', 'view': 'editar', 'plano': ['SCAN t']},
+            {'ms': 900, 'sql': 'DELETE FROM t', 'view': 'antiga', 'em': (agora - timedelta(days=2)).isoformat()},
+        ]
+        os.makedirs(os.path.dirname(self.arquivo))
+        with open(self.arquivo, 'w', encoding='utf-8') as arquivo:
+            for linha in linhas:
+                arquivo.write(json.dumps({'em': agora.isoformat(), 'origem': [], **linha}) + '\n')
+            arquivo.write('{"ms": 5, "sql": "SELE')  # gravação interrompida
+
+        saida = self._relatorio('--horas', '24', '--planos')
+        self.assertIn('3 consultas lentas, 2 distintas, 1.3s no total (1 linhas inválidas ignoradas)', saida)
+        self.assertNotIn('DELETE', saida)
+        # Somadas, as duas SELECT (700 ms) passam a UPDATE (600 ms), embora cada uma seja mais rápida
+        self.assertLess(saida.index('SELECT * FROM t'), saida.index('UPDATE t SET'))
+        self.assertIn('em 2x | média 350 ms', saida)
+        self.assertIn('view: lista (2x)', saida)
+        self.assertIn('plano: SCAN t', saida)
+        self.assertIn('plano: (sem EXPLAIN capturado)', saida)
+
+        saida = self._relatorio('--view', 'editar')
+        self.assertIn('1 consultas lentas, 1 distintas', saida)
+
+    def test_relatorio_sem_log(self):
+        with self.assertRaisesMessage(CommandError, 'Log não encontrado'):
+            self._relatorio()
+
+
+class ConsultasConstantesMixin:
+    """Mede as consultas de uma requisição com poucas e com muitas linhas no banco.
+
+    Uma view que passa a consultar o banco por linha (N+1) muda a contagem e a
+    falha lista as impressões do SQL (consultas_lentas.impressao) que cresceram.
+    """
+
+    POUCAS, MUITAS = 1, 25
+
+    def _consultas(self, requisicao):
+        with ExitStack() as pilha:
+            capturas = [
+                pilha.enter_context(CaptureQueriesContext(connections[alias]))
+                for alias in sorted(self.databases)
+            ]
+            resposta = requisicao()
+        self.assertLess(resposta.status_code, 400, getattr(resposta, 'content', b'')[:500])
+        return [impressao(consulta['sql']) for captura in capturas for consulta in captura.captured_queries]
+
+    def assertConsultasConstantes(self, preparar):
+        """`preparar(n)` grava os dados com n linhas e devolve a requisição a medir"""
+        poucas = self._consultas(preparar(self.POUCAS))
+        muitas = self._consultas(preparar(self.MUITAS))
+        if len(poucas) == len(muitas):
+            return
+        contagem_poucas = Counter(chave for chave, _ in poucas)
+        contagem_muitas = Counter(chave for chave, _ in muitas)
+        sql = dict(poucas + muitas)
+        diferentes = [
+            f'  [{chave}] {contagem_poucas[chave]} -> {contagem_muitas[chave]}: {sql[chave][:300]}'
+            for chave in sorted(sql, key=lambda chave: contagem_poucas[chave] - contagem_muitas[chave])
+            if contagem_poucas[chave] != contagem_muitas[chave]
+        ]
+        self.fail(
+            f'{len(poucas)} consultas com {self.POUCAS} linha(s) e {len(muitas)} com {self.MUITAS}:\n'
+            + '\n'.join(diferentes)
+        )
+
+    def assertTodasAsViewsMedidas(self, urlpatterns):
+        """Toda rota do app precisa de um test_<nome da rota>"""
+        sem_teste = [
+            padrao.name for padrao in urlpatterns
+            if not any(nome.startswith(f'test_{padrao.name}') for nome in dir(self))
+        ]
+        self.assertEqual(sem_teste, [], 'rotas sem teste de consultas: ' + ', '.join(sem_teste))
+
+
+@override_settings(
+    # Sem depender do collectstatic (o manifesto dos estáticos)
+    STORAGES={**settings.STORAGES, 'staticfiles': {
+        'BACKEND': 'django.contrib.staticfiles.storage.StaticFilesStorage',
+    }},
+)
+class ConsultasPorViewTests(ConsultasConstantesMixin, TestCase):
+    """Cada view de orcamentos.urls faz o mesmo número de consultas com 1 ou 25 linhas"""
+
+    databases = {'default', 'arquivo'}
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        # PDFs gerados pelos testes vão para um diretório descartável, nunca para o cache real
+        diretorio = tempfile.TemporaryDirectory()
+        cls.addClassCleanup(diretorio.cleanup)
+        cls.enterClassContext(override_settings(PDF_CACHE_DIR=diretorio.name))
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.empresa = Empresa.objects.create(
+            nome='Empresa', cnpj='00', endereco='Rua', telefone='0', email='a@a.com'
+        )
+        # Unidades diferentes por linha: um acesso preguiçoso a item.unidade vira uma consulta por item
+        cls.unidades = UnidadeMedida.objects.bulk_create(
+            UnidadeMedida(sigla=f'U{n}', descricao=f'Unidade {n}') for n in range(5)
+        )
+
+    def _orcamento(self, itens, banco='default', **campos):
+        cliente = Cliente.objects.using(banco).create(nome='Cliente', cpf_cnpj='1', endereco='Rua')
+        if banco == 'default':
+            orcamento = Orcamento.objects.create(empresa=self.empresa, cliente=cliente, **campos)
+        else:
+            # No arquivo não há numeração: o número vem de quem arquivou
+            empresa = Empresa.objects.using(banco).get_or_create(
+                id=self.empresa.id, defaults={'nome': 'Empresa', 'cnpj': '00', 'email': 'a@a.com'}
+            )[0]
+            orcamento = Orcamento.objects.using(banco).create(
+                empresa=empresa, cliente=cliente, numero=f'ORC-ARQ-{cliente.id}', **campos
+            )
+            UnidadeMedida.objects.using(banco).bulk_create(self.unidades, ignore_conflicts=True)
+        ItemOrcamento.objects.using(banco).bulk_create(
+            ItemOrcamento(
+                orcamento=orcamento, numero_item=numero, unidade=self.unidades[numero % len(self.unidades)],
+                quantidade=Decimal('2'), descricao=f'ITEM {numero}', valor_unitario=Decimal('1.50'),
+                valor_total=Decimal('3.00'),
+            )
+            for numero in range(1, itens + 1)
+        )
+        return orcamento
+
+    def _formulario(self, itens, **extra):
+        # Como a grade do editor envia: todas as linhas no campo itens_json
+        linhas = [
+            {'numero_item': numero, 'unidade': self.unidades[numero % len(self.unidades)].id,
+             'quantidade': '2', 'descricao': f'item {numero}', 'marca': '', 'valor_unitario': '1.50'}
+            for numero in range(1, itens + 1)
+        ]
+        return {
+            'cliente_nome': 'Cliente', 'cliente_cpf_cnpj': '1', 'cliente_endereco': 'Rua',
+            'itens_json': json.dumps(linhas), **extra,
+        }
+
+    def _get(self, nome, **kwargs):
+        return lambda: self.client.get(reverse(f'orcamentos:{nome}', kwargs=kwargs))
+
+    def test_todas_as_rotas_tem_teste(self):
+        self.assertTodasAsViewsMedidas(orcamentos_urls.urlpatterns)
+
+    def test_selecionar_empresa(self):
+        def preparar(n):
+            Empresa.objects.bulk_create(
+                Empresa(nome=f'E{i}', cnpj='00', endereco='Rua', telefone='0', email='a@a.com') for i in range(n)
+            )
+            return self._get('selecionar_empresa')
+        self.assertConsultasConstantes(preparar)
+
+    def test_criar_orcamento(self):
+        def preparar(n):
+            UnidadeMedida.objects.bulk_create(
+                UnidadeMedida(sigla=f'N{n}-{i}', descricao='Nova') for i in range(n)
+            )
+            return self._get('criar_orcamento', empresa_id=self.empresa.id)
+        self.assertConsultasConstantes(preparar)
+
+    def test_criar_orcamento_gravando(self):
+        url = reverse('orcamentos:criar_orcamento', kwargs={'empresa_id': self.empresa.id})
+        self.assertConsultasConstantes(lambda n: lambda: self.client.post(url, self._formulario(n)))
+
+    def test_editar_orcamento(self):
+        self.assertConsultasConstantes(
+            lambda n: self._get('editar_orcamento', orcamento_id=self._orcamento(n).id)
+        )
+
+    def test_editar_orcamento_gravando(self):
+        def preparar(n):
+            orcamento = self._orcamento(n)
+            url = reverse('orcamentos:editar_orcamento', kwargs={'orcamento_id': orcamento.id})
+            return lambda: self.client.post(url, self._formulario(n, versao=orcamento.versao))
+        self.assertConsultasConstantes(preparar)
+
+    def test_api_itens_lote(self):
+        # O autosave custa pelas linhas enviadas; aqui cresce só o orçamento
+        def preparar(n):
+            orcamento = self._orcamento(n)
+            corpo = {'versao': orcamento.versao, 'itens': [
+                {'numero_item': 1, 'unidade': self.unidades[0].id, 'quantidade': '3',
+                 'descricao': 'alterado', 'valor_unitario': '2'},
+                {'numero_item': n + 1, 'unidade': self.unidades[0].id, 'quantidade': '1',
+                 'descricao': 'novo', 'valor_unitario': '2'},
+            ]}
+            url = reverse('orcamentos:api_itens_lote', kwargs={'orcamento_id': orcamento.id})
+            return lambda: self.client.post(url, corpo, content_type='application/json')
+        self.assertConsultasConstantes(preparar)
+
+    def test_api_item(self):
+        def preparar(n):
+            orcamento = self._orcamento(n)
+            url = reverse('orcamentos:api_item', kwargs={'orcamento_id': orcamento.id, 'numero_item': 1})
+            return lambda: self.client.patch(
+                url, {'versao': orcamento.versao, 'quantidade': '7'}, content_type='application/json'
+            )
+        self.assertConsultasConstantes(preparar)
+
+    def test_listar_orcamentos(self):
+        def preparar(n):
+            for _ in range(n):
+                self._orcamento(2)
+            return self._get('listar_orcamentos')
+        self.assertConsultasConstantes(preparar)
+
+    def test_listar_orcamentos_vencendo(self):
+        url = reverse('orcamentos:listar_orcamentos') + '?validade=vencendo'
+
+        def preparar(n):
+            for _ in range(n):
+                self._orcamento(2, status='enviado', validade_dias=3)
+            return lambda: self.client.get(url)
+        self.assertConsultasConstantes(preparar)
+
+    def test_mudar_status_lote(self):
+        url = reverse('orcamentos:mudar_status_lote')
+
+        def preparar(n):
+            ids = [self._orcamento(1).id for _ in range(n)]
+            bloqueado = self._orcamento(1)
+            bloqueado.gerar_pedido()
+            return lambda: self.client.post(url, {'status': 'enviado', 'orcamentos': ids + [bloqueado.id, 0]})
+        self.assertConsultasConstantes(preparar)
+
+    def test_visualizar_orcamento(self):
+        self.assertConsultasConstantes(
+            lambda n: self._get('visualizar_orcamento', orcamento_id=self._orcamento(n).id)
+        )
+
+    def test_visualizar_orcamento_bloqueado(self):
+        def preparar(n):
+            orcamento = self._orcamento(n)
+            orcamento.gerar_pedido()
+            return self._get('visualizar_orcamento', orcamento_id=orcamento.id)
+        self.assertConsultasConstantes(preparar)
+
+    def test_deletar_orcamento(self):
+        self.assertConsultasConstantes(
+            lambda n: self._get('deletar_orcamento', orcamento_id=self._orcamento(n).id)
+        )
+
+    def test_deletar_orcamento_confirmado(self):
+        def preparar(n):
+            url = reverse('orcamentos:deletar_orcamento', kwargs={'orcamento_id': self._orcamento(n).id})
+            return lambda: self.client.post(url)
+        self.assertConsultasConstantes(preparar)
+
+    def test_duplicar_orcamento(self):
+        self.assertConsultasConstantes(
+            lambda n: self._get('duplicar_orcamento', orcamento_id=self._orcamento(n).id)
+        )
+
+    def test_duplicar_orcamento_confirmado(self):
+        def preparar(n):
+            url = reverse('orcamentos:duplicar_orcamento', kwargs={'orcamento_id': self._orcamento(n).id})
+            return lambda: self.client.post(url, {'ajuste_percentual': '5'})
+        self.assertConsultasConstantes(preparar)
+
+    def test_gerar_pedido(self):
+        self.assertConsultasConstantes(
+            lambda n: self._get('gerar_pedido', orcamento_id=self._orcamento(n).id)
+        )
+
+    def test_gerar_pedido_confirmado(self):
+        def preparar(n):
+            url = reverse('orcamentos:gerar_pedido', kwargs={'orcamento_id': self._orcamento(n).id})
+            return lambda: self.client.post(url)
+        self.assertConsultasConstantes(preparar)
+
+    def test_gerar_pdf(self):
+        self.assertConsultasConstantes(
+            lambda n: self._get('gerar_pdf', orcamento_id=self._orcamento(n).id)
+        )
+
+    def test_gerar_pdf_bloqueado(self):
+        def preparar(n):
+            orcamento = self._orcamento(n)
+            orcamento.gerar_pedido()
+            return self._get('gerar_pdf', orcamento_id=orcamento.id)
+        self.assertConsultasConstantes(preparar)
+
+    def test_metricas_pdf(self):
+        self.assertConsultasConstantes(lambda n: self._get('metricas_pdf'))
+
+    def test_listar_arquivados(self):
+        def preparar(n):
+            for _ in range(n):
+                self._orcamento(2, banco='arquivo')
+            return self._get('listar_arquivados')
+        self.assertConsultasConstantes(preparar)
+
+    def test_visualizar_arquivado(self):
+        self.assertConsultasConstantes(
+            lambda n: self._get('visualizar_arquivado', orcamento_id=self._orcamento(n, banco='arquivo').id)
+        )
+
+    def test_gerar_pdf_arquivado(self):
+        self.assertConsultasConstantes(
+            lambda n: self._get('gerar_pdf_arquivado', orcamento_id=self._orcamento(n, banco='arquivo').id)
+        )
+
+
+@override_settings(STORAGES={**settings.STORAGES, 'staticfiles': {
+    'BACKEND': 'django.contrib.staticfiles.storage.StaticFilesStorage',
+}})
+class AdminOrcamentosTests(ConsultasConstantesMixin, TestCase):
+    """Paginação da listagem e dos itens no admin"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.usuario = User.objects.create_superuser('admin', 'admin@a.com', 'senha')
+        cls.empresa = Empresa.objects.create(nome='Empresa', cnpj='00', endereco='Rua', telefone='0', email='a@a.com')
+        cls.unidade = UnidadeMedida.objects.create(sigla='UN', descricao='Unidade')
+
+    def setUp(self):
+        self.client.force_login(self.usuario)
+        # O log de alterações do admin guarda o ContentType em cache na primeira requisição
+        ContentType.objects.get_for_model(Orcamento)
+
+    def _orcamento(self, itens):
+        cliente = Cliente.objects.create(nome='Cliente', cpf_cnpj='1', endereco='Rua')
+        orcamento = Orcamento.objects.create(empresa=self.empresa, cliente=cliente)
+        ItemOrcamento.objects.bulk_create(
+            ItemOrcamento(
+                orcamento=orcamento, numero_item=numero, unidade=self.unidade, descricao=f'ITEM {numero}',
+                quantidade=Decimal('1'), valor_unitario=Decimal('2'), valor_total=Decimal('2'),
+            )
+            for numero in range(1, itens + 1)
+        )
+        return orcamento
+
+    def test_contagem_estimada_so_acima_do_limite(self):
+        Cliente.objects.bulk_create(Cliente(nome=f'C{n}', cpf_cnpj='1', endereco='Rua') for n in range(3))
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
+        self.assertEqual(_estimar_linhas(Cliente, 'default'), 3)
+
+        with mock.patch('orcamentos.admin._estimar_linhas', return_value=20000):
+            with self.assertNumQueries(0):
+                self.assertEqual(PaginatorContagemEstimada(Cliente.objects.all(), 100).count, 20000)
+            # Com filtro a estimativa da tabela não serve: COUNT exato
+            self.assertEqual(PaginatorContagemEstimada(Cliente.objects.filter(nome='C1'), 100).count, 1)
+
+        with mock.patch('orcamentos.admin._estimar_linhas', return_value=3):
+            with self.assertNumQueries(1):
+                self.assertEqual(PaginatorContagemEstimada(Cliente.objects.all(), 100).count, 3)
+
+    def test_inline_grava_so_a_pagina_exibida(self):
+        orcamento = self._orcamento(60)
+        request = RequestFactory().get('/', {'itens_pagina': 2})
+        request.user = self.usuario
+        inline = ItemOrcamentoInline(Orcamento, django_admin.site)
+        FormSet = inline.get_formset(request, orcamento)
+
+        exibido = FormSet(instance=orcamento)
+        self.assertEqual([form.instance.numero_item for form in exibido.initial_forms], list(range(51, 61)))
+        self.assertEqual((exibido.total_itens, exibido.total_paginas), (60, 2))
+
+        dados = {
+            f'{exibido.prefix}-TOTAL_FORMS': len(exibido.initial_forms),
+            f'{exibido.prefix}-INITIAL_FORMS': len(exibido.initial_forms),
+        }
+        for form in exibido.initial_forms:
+            for nome in form.fields:
+                valor = form[nome].value()
+                dados[form.add_prefix(nome)] = '' if valor is None else valor
+        dados[exibido.initial_forms[0].add_prefix('descricao')] = 'alterado'
+
+        gravado = FormSet(dados, instance=orcamento)
+        self.assertTrue(gravado.is_valid(), gravado.errors)
+        gravado.save()
+        self.assertEqual(orcamento.itens.count(), 60)
+        self.assertEqual(orcamento.itens.get(numero_item=51).descricao, 'ALTERADO')
+        self.assertEqual(orcamento.itens.filter(descricao__startswith='ITEM').count(), 59)
+
+    def test_listagem_de_orcamentos(self):
+        url = reverse('admin:orcamentos_orcamento_changelist')
+
+        def preparar(n):
+            for _ in range(n):
+                self._orcamento(2)
+            return lambda: self.client.get(url)
+        self.assertConsultasConstantes(preparar)
+
+    def test_edicao_de_orcamento(self):
+        def preparar(n):
+            url = reverse('admin:orcamentos_orcamento_change', args=[self._orcamento(n).id])
+            return lambda: self.client.get(url)
+        self.assertConsultasConstantes(preparar)
+
+
+@override_settings(STORAGES={**settings.STORAGES, 'staticfiles': {
+    'BACKEND': 'django.contrib.staticfiles.storage.StaticFilesStorage',
+}})
+class PerfilSQLiteTests(TestCase):
+    """orcamento_system.settings_sqlite: sessões e mensagens só em cookie, chave vinda do ambiente"""
+
+    MODULO = 'orcamento_system.settings_sqlite'
+
+    def _perfil(self, **ambiente):
+        sys.modules.pop(self.MODULO, None)
+        self.addCleanup(sys.modules.pop, self.MODULO, None)
+        with mock.patch.dict(os.environ, ambiente):
+            for nome in ('DJANGO_SECRET_KEY', 'DJANGO_ALLOWED_HOSTS'):
+                if nome not in ambiente:
+                    os.environ.pop(nome, None)
+            return import_module(self.MODULO)
+
+    def test_exige_a_secret_key_do_ambiente(self):
+        with self.assertRaisesMessage(ImproperlyConfigured, 'DJANGO_SECRET_KEY'):
+            self._perfil()
+
+        perfil = self._perfil(DJANGO_SECRET_KEY='chave-de-teste', DJANGO_ALLOWED_HOSTS='a.com.br, b.com.br,')
+        self.assertEqual(perfil.SECRET_KEY, 'chave-de-teste')
+        self.assertFalse(perfil.DEBUG)
+        self.assertEqual(perfil.ALLOWED_HOSTS, ['a.com.br', 'b.com.br'])
+
+    def test_login_e_mensagens_sem_gravar_sessao(self):
+        perfil = self._perfil(DJANGO_SECRET_KEY='chave-de-teste')
+        self.enterContext(override_settings(
+            SESSION_ENGINE=perfil.SESSION_ENGINE, MESSAGE_STORAGE=perfil.MESSAGE_STORAGE,
+            SECRET_KEY=perfil.SECRET_KEY,
+        ))
+        User.objects.create_superuser('admin', 'admin@a.com', 'senha')
+        empresa = Empresa.objects.create(nome='Empresa', cnpj='00', endereco='Rua', telefone='0', email='a@a.com')
+        cliente = Cliente.objects.create(nome='Cliente', cpf_cnpj='1', endereco='Rua')
+        orcamento = Orcamento.objects.create(empresa=empresa, cliente=cliente)
+
+        with CaptureQueriesContext(connection) as consultas:
+            resposta = self.client.post(reverse('admin:login'), {'username': 'admin', 'password': 'senha'})
+            self.assertEqual(resposta.status_code, 302)
+            self.assertEqual(self.client.get(reverse('admin:index')).status_code, 200)
+
+            resposta = self.client.post(reverse('orcamentos:deletar_orcamento', args=[orcamento.id]))
+            self.assertIn('messages', resposta.cookies)
+            resposta = self.client.get(resposta.url)
+            self.assertContains(resposta, f'Orçamento {orcamento.numero} deletado com sucesso!')
+
+        self.assertEqual([c['sql'] for c in consultas if 'django_session' in c['sql']], [])
+        self.assertFalse(Session.objects.exists())
+
+    def test_limpar_sessoes(self):
+        agora = timezone.now()
+        for chave, validade in (('vencida', agora - timedelta(days=1)), ('valida', agora + timedelta(days=1))):
+            Session.objects.create(session_key=chave, session_data='', expire_date=validade)
+
+        def comando(*args):
+            saida = StringIO()
+            call_command('limpar_sessoes', '--pausa', '0', *args, stdout=saida)
+            return saida.getvalue()
+
+        self.assertIn('1 de 2 sessões seriam apagadas.', comando('--simular'))
+        self.assertIn('1 sessões apagadas.', comando('--lote', '1'))
+        self.assertEqual(list(Session.objects.values_list('session_key', flat=True)), ['valida'])
+        self.assertIn('1 sessões apagadas.', comando('--todas'))
+        self.assertFalse(Session.objects.exists())
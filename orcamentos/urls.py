@@ -11,9 +11,17 @@ urlpatterns = [
     path('', views.selecionar_empresa, name='selecionar_empresa'),
     path('criar/<int:empresa_id>/', views.criar_orcamento, name='criar_orcamento'),
     path('editar/<int:orcamento_id>/', views.editar_orcamento, name='editar_orcamento'),
+    path('api/<int:orcamento_id>/itens/', views.api_itens_lote, name='api_itens_lote'),
+    path('api/<int:orcamento_id>/itens/<int:numero_item>/', views.api_item, name='api_item'),
     path('listar/', views.listar_orcamentos, name='listar_orcamentos'),
+    path('listar/status/', views.mudar_status_lote, name='mudar_status_lote'),
     path('visualizar/<int:orcamento_id>/', views.visualizar_orcamento, name='visualizar_orcamento'),
     path('deletar/<int:orcamento_id>/', views.deletar_orcamento, name='deletar_orcamento'),
+    path('duplicar/<int:orcamento_id>/', views.duplicar_orcamento, name='duplicar_orcamento'),
     path('gerar-pedido/<int:orcamento_id>/', views.gerar_pedido, name='gerar_pedido'),
     path('gerar-pdf/<int:orcamento_id>/', views.gerar_pdf, name='gerar_pdf'),
+    path('metricas/pdf/', views.metricas_pdf, name='metricas_pdf'),
+    path('arquivo/', views.listar_arquivados, name='listar_arquivados'),
+    path('arquivo/visualizar/<int:orcamento_id>/', views.visualizar_arquivado, name='visualizar_arquivado'),
+    path('arquivo/gerar-pdf/<int:orcamento_id>/', views.gerar_pdf_arquivado, name='gerar_pdf_arquivado'),
 ]
@@ -1,25 +1,131 @@
 # orcamentos/views.py
-from django.shortcuts import render, redirect, get_object_or_404
+from django.shortcuts import render, redirect, get_object_or_404, aget_object_or_404
+from django.conf import settings
 from django.contrib import messages
-from django.db import transaction
-from django.http import HttpResponse, FileResponse
-from .models import Empresa, Orcamento, ItemOrcamento, Cliente, UnidadeMedida
-from decimal import Decimal
+from django.core.paginator import Paginator
+from django.db import OperationalError, transaction
+from django.http import HttpResponse, FileResponse, JsonResponse
+from django.urls import reverse
+from django.views.decorators.http import require_http_methods, require_POST
+from .models import (
+    Empresa, Orcamento, ItemOrcamento, Cliente, UnidadeMedida, ConflitoEdicao, OrcamentoBloqueado, RetratoOrcamento,
+)
+from .admissao import ControleAdmissao, Sobrecarga
+from . import cache_pdf
+from .roteadores import leitura
+from asgiref.sync import sync_to_async
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import nullcontext
+from decimal import Decimal, InvalidOperation
 from datetime import timedelta
-import io
-import os
-from reportlab.lib.pagesizes import A4
-from reportlab.lib import colors
-from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
-from reportlab.lib.units import mm
-from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer, Image
-from reportlab.lib.enums import TA_CENTER, TA_LEFT, TA_RIGHT
+import asyncio
+import json
+
+# Pool próprio e limitado para o ReportLab: PDFs lentos não ocupam o pool padrão do sync_to_async
+_PDF_MAX_WORKERS = getattr(settings, 'PDF_MAX_WORKERS', 2)
+_executor_pdf = ThreadPoolExecutor(
+    max_workers=_PDF_MAX_WORKERS,
+    thread_name_prefix='pdf',
+)
+
+# Acima deste número de itens o PDF é montado em blocos, lendo os itens do banco aos poucos
+_PDF_LIMITE_ITENS = getattr(settings, 'PDF_LIMITE_ITENS', 300)
+
+_config_admissao = getattr(settings, 'PDF_ADMISSAO', {})
+controle_pdf = ControleAdmissao(
+    limite_processo=_config_admissao.get('LIMITE_PROCESSO', _PDF_MAX_WORKERS),
+    limite_global=_config_admissao.get('LIMITE_GLOBAL'),
+    fila_max=_config_admissao.get('FILA_MAX', 8),
+    espera_max=_config_admissao.get('ESPERA_MAX', 5),
+    retry_after=_config_admissao.get('RETRY_AFTER', 10),
+    diretorio_travas=_config_admissao.get('DIRETORIO_TRAVAS'),
+)
+
+
+class ErroFormulario(Exception):
+    """Dado inválido no formulário de orçamento (mensagem pronta para o usuário)"""
+
+
+async def _arender(request, template_name, context):
+    """Renderiza o template fora do event loop (sessão e mensagens ainda são síncronas)"""
+    return await sync_to_async(render)(request, template_name, context)
+
 
 def selecionar_empresa(request):
     """View para selecionar a empresa"""
     empresas = Empresa.objects.filter(ativa=True)
     return render(request, 'orcamentos/selecionar_empresa.html', {'empresas': empresas})
 
+def _montar_item(numero, dados, unidades):
+    """ItemOrcamento validado e normalizado (ainda sem orçamento) a partir dos campos da linha"""
+    try:
+        item = ItemOrcamento(
+            numero_item=int(numero),
+            unidade_id=int(dados['unidade']),
+            quantidade=Decimal(str(dados['quantidade'])),
+            descricao=str(dados['descricao']),
+            marca=str(dados.get('marca') or ''),
+            valor_unitario=Decimal(str(dados['valor_unitario'])),
+        )
+    except (KeyError, TypeError, ValueError, InvalidOperation):
+        raise ErroFormulario(f'Item {numero}: unidade, quantidade ou valor inválido.')
+    if item.numero_item < 1:
+        raise ErroFormulario(f'Item {numero}: número do item inválido.')
+    if item.unidade_id not in unidades:
+        raise ErroFormulario(f'Item {numero}: unidade de medida inexistente.')
+    if not item.quantidade.is_finite() or not item.valor_unitario.is_finite():
+        raise ErroFormulario(f'Item {numero}: quantidade ou valor inválido.')
+    if item.quantidade < 0 or item.valor_unitario < 0:
+        raise ErroFormulario(f'Item {numero}: quantidade e valor não podem ser negativos.')
+    if not item.descricao.strip():
+        raise ErroFormulario(f'Item {numero}: informe a descrição.')
+    item.normalizar()
+    return item
+
+def _ler_formulario_orcamento(post):
+    """Lê e valida cliente e itens do formulário antes de abrir qualquer transação.
+    
+    Retorna (dados_cliente, itens) com os itens ainda não salvos; levanta ErroFormulario.
+    """
+    dados_cliente = {
+        'nome': post.get('cliente_nome', '').strip(),
+        'cpf_cnpj': post.get('cliente_cpf_cnpj', '').strip(),
+        'endereco': post.get('cliente_endereco', '').strip(),
+        'telefone': post.get('cliente_telefone', ''),
+    }
+    if not (dados_cliente['nome'] and dados_cliente['cpf_cnpj'] and dados_cliente['endereco']):
+        raise ErroFormulario('Informe nome, CPF/CNPJ e endereço do cliente.')
+    
+    # Processar itens
+    itens_data = {}
+    if 'itens_json' in post:
+        # Grade do editor: todas as linhas num campo só, sem um campo de formulário por célula
+        try:
+            linhas = json.loads(post['itens_json'])
+        except ValueError:
+            linhas = None
+        if not isinstance(linhas, list) or not all(isinstance(linha, dict) for linha in linhas):
+            raise ErroFormulario('Itens inválidos. Recarregue a página e tente novamente.')
+        itens_data = {str(linha.get('numero_item')): linha for linha in linhas}
+    for key, value in post.items():
+        if key.startswith('itens['):
+            parts = key.replace('itens[', '').replace(']', '').split('[')
+            if len(parts) == 2:
+                index, field = parts
+                if index not in itens_data:
+                    itens_data[index] = {}
+                itens_data[index][field] = value
+    
+    unidades = set(UnidadeMedida.objects.order_by().values_list('id', flat=True))
+    itens = [
+        _montar_item(index, item_data, unidades)
+        for index, item_data in itens_data.items()
+        if all(k in item_data for k in ['unidade', 'quantidade', 'descricao', 'valor_unitario'])
+    ]
+    
+    itens.sort(key=lambda item: item.numero_item)
+    return dados_cliente, itens
+
 def criar_orcamento(request, empresa_id):
     """View para criar um novo orçamento"""
     empresa = get_object_or_404(Empresa, id=empresa_id, ativa=True)
@@ -27,21 +133,12 @@ def criar_orcamento(request, empresa_id):
     
     if request.method == 'POST':
         try:
+            dados_cliente, itens = _ler_formulario_orcamento(request.POST)
+            
             with transaction.atomic():
                 # CORRIGIDO: SEMPRE criar um NOVO cliente para cada orçamento
                 # Isso evita que alterações em um orçamento afetem outros
-                cliente_nome = request.POST.get('cliente_nome')
-                cliente_cpf_cnpj = request.POST.get('cliente_cpf_cnpj')
-                cliente_endereco = request.POST.get('cliente_endereco')
-                cliente_telefone = request.POST.get('cliente_telefone', '')
-                
-                # Criar NOVO cliente (não reutilizar)
-                cliente = Cliente.objects.create(
-                    nome=cliente_nome,
-                    cpf_cnpj=cliente_cpf_cnpj,
-                    endereco=cliente_endereco,
-                    telefone=cliente_telefone
-                )
+                cliente = Cliente.objects.create(**dados_cliente)
                 
                 # Criar orçamento
                 orcamento = Orcamento.objects.create(
@@ -50,48 +147,28 @@ def criar_orcamento(request, empresa_id):
                     status='rascunho'
                 )
                 
-                # Processar itens
-                itens_data = {}
-                for key, value in request.POST.items():
-                    if key.startswith('itens['):
-                        parts = key.replace('itens[', '').replace(']', '').split('[')
-                        if len(parts) == 2:
-                            index, field = parts
-                            if index not in itens_data:
-                                itens_data[index] = {}
-                            itens_data[index][field] = value
-                
-                # Criar itens do orçamento
-                for index, item_data in itens_data.items():
-                    if all(k in item_data for k in ['unidade', 'quantidade', 'descricao', 'valor_unitario']):
-                        unidade = UnidadeMedida.objects.get(id=item_data['unidade'])
-                        ItemOrcamento.objects.create(
-                            orcamento=orcamento,
-                            numero_item=int(index),
-                            unidade=unidade,
-                            quantidade=Decimal(item_data['quantidade']),
-                            descricao=item_data['descricao'],
-                            marca=item_data.get('marca', ''),
-                            valor_unitario=Decimal(item_data['valor_unitario'])
-                        )
+                # Itens já validados: um INSERT só
+                for item in itens:
+                    item.orcamento = orcamento
+                ItemOrcamento.objects.bulk_create(itens)
                 
                 orcamento.calcular_total()
-                
-                messages.success(request, f'Orçamento {orcamento.numero} criado com sucesso!')
-                return redirect('orcamentos:listar_orcamentos')
+            
+            messages.success(request, f'Orçamento {orcamento.numero} criado com sucesso!')
+            return redirect('orcamentos:listar_orcamentos')
                 
         except Exception as e:
             messages.error(request, f'Erro ao criar orçamento: {str(e)}')
     
     context = {
         'empresa': empresa,
-        'unidades': unidades,
+        'unidades': list(unidades.values('id', 'sigla')),
     }
     return render(request, 'orcamentos/criar_orcamento.html', context)
 
 def editar_orcamento(request, orcamento_id):
     """View para editar um orçamento existente"""
-    orcamento = get_object_or_404(Orcamento, id=orcamento_id)
+    orcamento = get_object_or_404(Orcamento.objects.select_related('empresa', 'cliente'), id=orcamento_id)
     
     if not orcamento.pode_editar():
         messages.error(request, 'Este orçamento está bloqueado e não pode ser editado!')
@@ -101,77 +178,177 @@ def editar_orcamento(request, orcamento_id):
     
     if request.method == 'POST':
         try:
-            with transaction.atomic():
-                # CORRIGIDO: Atualizar APENAS o cliente deste orçamento
-                # Não afeta outros orçamentos
-                orcamento.cliente.nome = request.POST.get('cliente_nome')
-                orcamento.cliente.cpf_cnpj = request.POST.get('cliente_cpf_cnpj')
-                orcamento.cliente.endereco = request.POST.get('cliente_endereco')
-                orcamento.cliente.telefone = request.POST.get('cliente_telefone', '')
-                orcamento.cliente.save()
-                
-                # Deletar itens antigos
-                orcamento.itens.all().delete()
-                
-                # Processar novos itens
-                itens_data = {}
-                for key, value in request.POST.items():
-                    if key.startswith('itens['):
-                        parts = key.replace('itens[', '').replace(']', '').split('[')
-                        if len(parts) == 2:
-                            index, field = parts
-                            if index not in itens_data:
-                                itens_data[index] = {}
-                            itens_data[index][field] = value
-                
-                # Criar novos itens
-                for index, item_data in itens_data.items():
-                    if all(k in item_data for k in ['unidade', 'quantidade', 'descricao', 'valor_unitario']):
-                        unidade = UnidadeMedida.objects.get(id=item_data['unidade'])
-                        ItemOrcamento.objects.create(
-                            orcamento=orcamento,
-                            numero_item=int(index),
-                            unidade=unidade,
-                            quantidade=Decimal(item_data['quantidade']),
-                            descricao=item_data['descricao'],
-                            marca=item_data.get('marca', ''),
-                            valor_unitario=Decimal(item_data['valor_unitario'])
-                        )
-                
-                orcamento.calcular_total()
-                
-                messages.success(request, f'Orçamento {orcamento.numero} atualizado com sucesso!')
-                return redirect('orcamentos:visualizar_orcamento', orcamento_id=orcamento.id)
-                
+            # Tudo é lido e validado fora da transação
+            dados_cliente, itens = _ler_formulario_orcamento(request.POST)
+            try:
+                versao = int(request.POST['versao'])
+            except (KeyError, ValueError):
+                raise ErroFormulario('Formulário desatualizado. Recarregue a página e tente novamente.')
+            
+            orcamento.salvar_edicao(versao, dados_cliente, itens)
+            
+            messages.success(request, f'Orçamento {orcamento.numero} atualizado com sucesso!')
+            return redirect('orcamentos:visualizar_orcamento', orcamento_id=orcamento.id)
+        
+        except OrcamentoBloqueado:
+            messages.error(
+                request,
+                f'O pedido do orçamento {orcamento.numero} foi gerado enquanto você editava: '
+                'ele está bloqueado e suas alterações não foram gravadas.'
+            )
+            return redirect('orcamentos:visualizar_orcamento', orcamento_id=orcamento.id)
+        except ConflitoEdicao:
+            # Falha na hora, sem esperar o outro usuário: recarrega o formulário com a versão atual
+            messages.error(
+                request,
+                f'O orçamento {orcamento.numero} foi alterado por outra pessoa enquanto você editava. '
+                'Os dados abaixo são a versão atual; refaça suas alterações.'
+            )
+            return redirect('orcamentos:editar_orcamento', orcamento_id=orcamento.id)
         except Exception as e:
             messages.error(request, f'Erro ao atualizar orçamento: {str(e)}')
     
-    itens = orcamento.itens.all().order_by('numero_item')
+    # Linhas compactas para a grade do editor (JSON na página; só as visíveis viram HTML)
+    itens = list(
+        orcamento.itens.order_by('numero_item')
+        .values_list('numero_item', 'unidade_id', 'quantidade', 'descricao', 'marca', 'valor_unitario')
+    )
     
     context = {
         'orcamento': orcamento,
         'empresa': orcamento.empresa,
-        'unidades': unidades,
+        'unidades': list(unidades.values('id', 'sigla')),
         'itens': itens,
         'editando': True,
     }
     return render(request, 'orcamentos/criar_orcamento.html', context)
 
-def listar_orcamentos(request):
+def _resposta_itens(orcamento, itens):
+    return JsonResponse({
+        'versao': orcamento.versao,
+        'total': str(orcamento.total),
+        'itens': {item.numero_item: str(item.valor_total) for item in itens},
+    })
+
+def _alterar_itens_json(orcamento, versao, salvar=(), excluir=()):
+    """Aplica as alterações e monta a resposta JSON (409 em conflito de versão)"""
+    try:
+        orcamento.alterar_itens(versao, salvar=salvar, excluir=excluir)
+    except OrcamentoBloqueado:
+        return JsonResponse(
+            {'erro': 'O pedido deste orçamento foi gerado: ele está bloqueado para edição.'}, status=409
+        )
+    except ConflitoEdicao:
+        return JsonResponse(
+            {'erro': 'O orçamento foi alterado por outra pessoa. Recarregue a página.'}, status=409
+        )
+    return _resposta_itens(orcamento, salvar)
+
+def _ler_json(request):
+    try:
+        dados = json.loads(request.body)
+        return dados, int(dados['versao'])
+    except (ValueError, TypeError, KeyError):
+        raise ErroFormulario('JSON inválido ou sem "versao".')
+
+@require_http_methods(['PUT', 'PATCH', 'DELETE'])
+def api_item(request, orcamento_id, numero_item):
+    """Cria/substitui (PUT), altera campos (PATCH) ou exclui (DELETE) um item pelo número"""
+    orcamento = get_object_or_404(Orcamento, id=orcamento_id)
+    try:
+        dados, versao = _ler_json(request)
+        if request.method == 'DELETE':
+            return _alterar_itens_json(orcamento, versao, excluir=[numero_item])
+        
+        if request.method == 'PATCH':
+            atual = (
+                orcamento.itens.filter(numero_item=numero_item)
+                .values('unidade', 'quantidade', 'descricao', 'marca', 'valor_unitario')
+                .first()
+            )
+            if atual is None:
+                return JsonResponse({'erro': f'Item {numero_item} não encontrado.'}, status=404)
+            dados = {**atual, **dados}
+        
+        unidades = set(UnidadeMedida.objects.order_by().values_list('id', flat=True))
+        item = _montar_item(numero_item, dados, unidades)
+    except ErroFormulario as e:
+        return JsonResponse({'erro': str(e)}, status=400)
+    return _alterar_itens_json(orcamento, versao, salvar=[item])
+
+@require_POST
+def api_itens_lote(request, orcamento_id):
+    """Autosave do editor: várias linhas alteradas numa chamada só.
+    
+    Corpo: {"versao": 3, "itens": [{"numero_item": 1, "unidade": 2, "quantidade": "5", ...},
+                                   {"numero_item": 4, "acao": "excluir"}]}
+    """
+    orcamento = get_object_or_404(Orcamento, id=orcamento_id)
+    try:
+        dados, versao = _ler_json(request)
+        linhas = dados.get('itens')
+        if not isinstance(linhas, list):
+            raise ErroFormulario('"itens" deve ser uma lista.')
+        
+        unidades = set(UnidadeMedida.objects.order_by().values_list('id', flat=True))
+        salvar, excluir = [], []
+        for linha in linhas:
+            if not isinstance(linha, dict) or 'numero_item' not in linha:
+                raise ErroFormulario('Cada linha precisa de "numero_item".')
+            if linha.get('acao') == 'excluir':
+                try:
+                    excluir.append(int(linha['numero_item']))
+                except (TypeError, ValueError):
+                    raise ErroFormulario(f'Item {linha["numero_item"]}: número do item inválido.')
+            else:
+                salvar.append(_montar_item(linha['numero_item'], linha, unidades))
+    except ErroFormulario as e:
+        return JsonResponse({'erro': str(e)}, status=400)
+    return _alterar_itens_json(orcamento, versao, salvar=salvar, excluir=excluir)
+
+async def listar_orcamentos(request):
     """View para listar todos os orçamentos"""
-    orcamentos = Orcamento.objects.all().select_related('empresa', 'cliente').order_by('-criado_em')
-    return render(request, 'orcamentos/listar_orcamentos.html', {'orcamentos': orcamentos})
+    validade = request.GET.get('validade')
+    if validade == 'vencendo':
+        orcamentos = Orcamento.vencendo().order_by('data_validade', 'id')
+    elif validade == 'vencidos':
+        orcamentos = Orcamento.vencidos().order_by('data_validade', 'id')
+    else:
+        validade = ''
+        orcamentos = Orcamento.objects.all().order_by('-criado_em')
+    # Os relatórios de validade leem da cópia; a lista completa não, porque é para ela que
+    # o usuário volta depois de criar ou excluir um orçamento e precisa ver a mudança
+    with leitura() if validade else nullcontext():
+        orcamentos = [orcamento async for orcamento in orcamentos.select_related('empresa', 'cliente')]
+    return await _arender(request, 'orcamentos/listar_orcamentos.html', {
+        'orcamentos': orcamentos,
+        'validade': validade,
+        'status_lote': [
+            (status, nome) for status, nome in Orcamento.STATUS_CHOICES if status in Orcamento.TRANSICOES_LOTE
+        ],
+    })
 
-def visualizar_orcamento(request, orcamento_id):
+async def visualizar_orcamento(request, orcamento_id):
     """View para visualizar detalhes de um orçamento"""
-    orcamento = get_object_or_404(Orcamento, id=orcamento_id)
-    itens = orcamento.itens.all().order_by('numero_item')
+    retrato = await RetratoOrcamento.objects.filter(orcamento_id=orcamento_id).afirst()
+    if retrato:
+        # Bloqueado: exibido como estava ao gerar o pedido, com uma única leitura
+        orcamento, itens = retrato.restaurar()
+        itens = list(itens)
+    else:
+        orcamento = await aget_object_or_404(
+            Orcamento.objects.select_related('empresa', 'cliente'), id=orcamento_id
+        )
+        itens = [
+            item async for item in
+            orcamento.itens.all().select_related('unidade').order_by('numero_item')
+        ]
     
     context = {
         'orcamento': orcamento,
         'itens': itens,
     }
-    return render(request, 'orcamentos/visualizar_orcamento.html', context)
+    return await _arender(request, 'orcamentos/visualizar_orcamento.html', context)
 
 def gerar_pedido(request, orcamento_id):
     """Converte orçamento em pedido e bloqueia edição"""
@@ -188,6 +365,38 @@ def gerar_pedido(request, orcamento_id):
     
     return render(request, 'orcamentos/confirmar_pedido.html', {'orcamento': orcamento})
 
+def duplicar_orcamento(request, orcamento_id):
+    """Cria um novo rascunho a partir de um orçamento existente"""
+    orcamento = get_object_or_404(Orcamento.objects.select_related('empresa', 'cliente'), id=orcamento_id)
+    empresas = Empresa.objects.filter(ativa=True)
+    
+    if request.method == 'POST':
+        # Como em criar_orcamento: empresa inexistente ou inativa é 404, não mensagem de erro
+        empresa = get_object_or_404(Empresa, id=request.POST.get('empresa') or orcamento.empresa_id, ativa=True)
+        ajuste = request.POST.get('ajuste_percentual', '').replace(',', '.').strip()
+        try:
+            ajuste_percentual = Decimal(ajuste) if ajuste else None
+        except InvalidOperation:
+            ajuste_percentual = Decimal('NaN')
+        
+        if ajuste_percentual is not None and not ajuste_percentual.is_finite():
+            messages.error(request, f'Reajuste inválido: "{ajuste}". Informe um percentual, ex.: 5 ou -3,5.')
+        elif ajuste_percentual is not None and ajuste_percentual <= -100:
+            messages.error(request, 'O reajuste precisa ser maior que -100% (os preços ficariam zerados ou negativos).')
+        else:
+            try:
+                novo = orcamento.duplicar(empresa=empresa, ajuste_percentual=ajuste_percentual)
+                messages.success(request, f'Orçamento {novo.numero} criado a partir de {orcamento.numero}.')
+                return redirect('orcamentos:editar_orcamento', orcamento_id=novo.id)
+            except Exception as e:
+                messages.error(request, f'Erro ao duplicar orçamento: {str(e)}')
+    
+    context = {
+        'orcamento': orcamento,
+        'empresas': empresas,
+    }
+    return render(request, 'orcamentos/duplicar_orcamento.html', context)
+
 def deletar_orcamento(request, orcamento_id):
     """View para deletar um orçamento"""
     orcamento = get_object_or_404(Orcamento, id=orcamento_id)
@@ -205,173 +414,149 @@ def deletar_orcamento(request, orcamento_id):
     
     return render(request, 'orcamentos/confirmar_delete.html', {'orcamento': orcamento})
 
-def gerar_pdf(request, orcamento_id):
+@require_POST
+def mudar_status_lote(request):
+    """Ação em lote da lista: muda o status dos orçamentos marcados"""
+    status = request.POST.get('status', '')
+    validade = request.POST.get('validade', '')
+    destino = redirect(reverse('orcamentos:listar_orcamentos') + (f'?validade={validade}' if validade else ''))
+    
+    try:
+        ids = [int(pk) for pk in request.POST.getlist('orcamentos')]
+    except ValueError:
+        ids = []
+    if not ids:
+        messages.warning(request, 'Selecione ao menos um orçamento.')
+        return destino
+    
+    try:
+        resultados = Orcamento.mudar_status_em_lote(ids, status)
+    except ValueError as e:
+        messages.error(request, str(e))
+        return destino
+    
+    sucesso, aviso = Orcamento.resumir_status_lote(resultados, status)
+    if sucesso:
+        messages.success(request, sucesso)
+    if aviso:
+        messages.warning(request, aviso)
+    return destino
+
+async def gerar_pdf(request, orcamento_id):
     """Gera PDF do orçamento com logo da empresa"""
-    orcamento = get_object_or_404(Orcamento, id=orcamento_id)
-    itens = orcamento.itens.all().order_by('numero_item')
-    
-    # Criar buffer
-    buffer = io.BytesIO()
-    
-    # Criar documento PDF
-    doc = SimpleDocTemplate(buffer, pagesize=A4, topMargin=20*mm, bottomMargin=30*mm)
-    elements = []
-    styles = getSampleStyleSheet()
-    
-    # Estilo customizado
-    titulo_style = ParagraphStyle(
-        'CustomTitle',
-        parent=styles['Heading1'],
-        fontSize=16,
-        textColor=colors.HexColor(orcamento.empresa.cor),
-        alignment=TA_CENTER,
-        spaceAfter=2,
-    )
-    
-    subtitulo_style = ParagraphStyle(
-        'Subtitle',
-        parent=styles['Normal'],
-        fontSize=10,
-        alignment=TA_CENTER,
-        spaceAfter=2,
-    )
-    
-    # Logo da empresa (se existir)
-    if orcamento.empresa.logo:
-        try:
-            from PIL import Image as PILImage
-            
-            logo_path = orcamento.empresa.logo.path
-            
-            if os.path.exists(logo_path):
-                pil_img = PILImage.open(logo_path)
-                img_width, img_height = pil_img.size
-                
-                max_width = 40 * mm
-                max_height = 20 * mm
-                
-                ratio = min(max_width / img_width, max_height / img_height)
-                new_width = img_width * ratio
-                new_height = img_height * ratio
-                
-                logo = Image(logo_path, width=new_width, height=new_height)
-                logo.hAlign = 'CENTER'
-                elements.append(logo)
-        except Exception as e:
-            print(f"Erro ao carregar logo: {e}")
-    
-    # Cabeçalho com dados da empresa
-    elements.append(Paragraph(f"<b>{orcamento.empresa.nome}</b>", titulo_style))
-    elements.append(Paragraph(f"CNPJ: {orcamento.empresa.cnpj}", subtitulo_style))
-    elements.append(Paragraph(f"{orcamento.empresa.endereco}", subtitulo_style))
-    elements.append(Paragraph(f"Tel: {orcamento.empresa.telefone} | Email: {orcamento.empresa.email}", subtitulo_style))
-    
-    # Título do documento
-    tipo_doc = "PEDIDO" if orcamento.status == 'pedido' else "ORÇAMENTO"
-    elements.append(Paragraph(f"<b>{tipo_doc} Nº {orcamento.numero}</b>", titulo_style))
-    
-    # Informações do cliente
-    cliente_info = [
-        ['Cliente:', orcamento.cliente.nome],
-        ['CPF/CNPJ:', orcamento.cliente.cpf_cnpj],
-        ['Endereço:', orcamento.cliente.endereco],
-    ]
-    
-    if orcamento.cliente.telefone:
-        cliente_info.append(['Telefone:', orcamento.cliente.telefone])
-    
-    cliente_table = Table(cliente_info, colWidths=[40*mm, 130*mm])
-    cliente_table.setStyle(TableStyle([
-        ('FONTNAME', (0, 0), (0, -1), 'Helvetica-Bold'),
-        ('FONTSIZE', (0, 0), (-1, -1), 9),
-        ('VALIGN', (0, 0), (-1, -1), 'TOP'),
-    ]))
-    elements.append(cliente_table)
-    elements.append(Spacer(1, 5*mm))
-    
-    # Informações da proposta
-    proposta_info = [
-        ['Data de Emissão:', orcamento.data_emissao.strftime('%d/%m/%Y')],
-        ['Validade da Proposta:', f'{orcamento.validade_dias} dias'],
-        ['Prazo de Entrega:', orcamento.prazo_entrega],
-    ]
-    
-    proposta_table = Table(proposta_info, colWidths=[50*mm, 120*mm])
-    proposta_table.setStyle(TableStyle([
-        ('FONTNAME', (0, 0), (0, -1), 'Helvetica-Bold'),
-        ('FONTSIZE', (0, 0), (-1, -1), 9),
-    ]))
-    elements.append(proposta_table)
-    
-    # Tabela de itens
-    data = [['#', 'Und', 'Qtd', 'Descrição', 'Marca', 'Valor Unit.', 'Total']]
-
-    descricao_style = ParagraphStyle(
-        'Descricao',
-        parent=styles['Normal'],
-        fontSize=8,
-        leading=10,
-        alignment=TA_LEFT,
+    itens = None
+    retrato = await RetratoOrcamento.objects.filter(orcamento_id=orcamento_id).afirst()
+    if retrato:
+        # Bloqueado: impresso do retrato; os itens só são montados se o PDF não estiver em cache
+        orcamento, itens = retrato.restaurar()
+    else:
+        orcamento = await aget_object_or_404(
+            Orcamento.objects.select_related('empresa', 'cliente'), id=orcamento_id
+        )
+    nome_arquivo = f'{orcamento.numero}.pdf'
+
+    # PDF já gerado para esta versão do orçamento: sai do cache, já comprimido.
+    # Consultar e abrir o arquivo é I/O de disco, feito fora do event loop
+    arquivo = await sync_to_async(cache_pdf.obter)(orcamento)
+    if arquivo:
+        return await sync_to_async(cache_pdf.resposta)(request, arquivo, nome_arquivo)
+
+    if itens is None:
+        itens = await _itens_pdf(orcamento)
+    
+    # A montagem do PDF roda no pool dedicado, sem bloquear o event loop
+    loop = asyncio.get_running_loop()
+    try:
+        async with controle_pdf.vaga():
+            arquivo = await loop.run_in_executor(_executor_pdf, _gerar_e_guardar_pdf, orcamento, itens)
+    except Sobrecarga as e:
+        return _resposta_sobrecarga(e)
+    return await sync_to_async(cache_pdf.resposta)(request, arquivo, nome_arquivo)
+
+def listar_arquivados(request):
+    """Orçamentos movidos para o banco de arquivo (somente leitura)"""
+    orcamentos = (
+        Orcamento.objects.using('arquivo')
+        .select_related('empresa', 'cliente')
+        .order_by('-data_emissao', '-id')
     )
+    sem_arquivo = False
+    try:
+        pagina = Paginator(orcamentos, 50).get_page(request.GET.get('pagina'))
+        pagina.object_list = list(pagina.object_list)
+    except OperationalError:
+        # Banco de arquivo ainda não criado (sem as tabelas): lista vazia com a instrução
+        pagina = Paginator([], 50).get_page(1)
+        sem_arquivo = True
+    return render(request, 'orcamentos/listar_arquivados.html', {'pagina': pagina, 'sem_arquivo': sem_arquivo})
 
-        
-    for item in itens:
-        data.append([
-            str(item.numero_item),
-            item.unidade.sigla,
-            str(item.quantidade),
-            Paragraph(item.descricao, descricao_style),  # ✅ quebra automática
-            item.marca or '-',
-            f'R$ {item.valor_unitario:,.2f}'.replace(',', 'X').replace('.', ',').replace('X', '.'),
-            f'R$ {item.valor_total:,.2f}'.replace(',', 'X').replace('.', ',').replace('X', '.'),
-        ])
-    
-    # Linha de total
-    data.append(['', '', '', '', '', 'TOTAL:', f'R$ {orcamento.total:,.2f}'.replace(',', 'X').replace('.', ',').replace('X', '.')])
-    
-    table = Table(data, colWidths=[10*mm, 15*mm, 15*mm, 65*mm, 30*mm, 25*mm, 28*mm])
-    table.setStyle(TableStyle([
-        ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor(orcamento.empresa.cor)),
-        ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-        ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-        ('ALIGN', (3, 1), (3, -1), 'LEFT'),
-        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-        ('FONTSIZE', (0, 0), (-1, 0), 9),
-        ('FONTSIZE', (0, 1), (-1, -1), 8),
-        ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
-        ('GRID', (0, 0), (-1, -2), 1, colors.grey),
-        ('LINEABOVE', (0, -1), (-1, -1), 2, colors.HexColor(orcamento.empresa.cor)),
-        ('BACKGROUND', (0, -1), (-1, -1), colors.lightgrey),
-        ('FONTNAME', (5, -1), (-1, -1), 'Helvetica-Bold'),
-    ]))
-    elements.append(table)
+async def visualizar_arquivado(request, orcamento_id):
+    """Detalhes de um orçamento arquivado, sem as ações de edição"""
+    try:
+        orcamento = await aget_object_or_404(
+            Orcamento.objects.using('arquivo').select_related('empresa', 'cliente'), id=orcamento_id
+        )
+        itens = [
+            item async for item in
+            orcamento.itens.all().select_related('unidade').order_by('numero_item')
+        ]
+    except OperationalError:
+        return redirect('orcamentos:listar_arquivados')
     
-    # Texto de concordância
-    texto_concordancia = """
-    Proponho o fornecimento dos produtos nos valores mencionados, sob as condições gerais 
-    e específicas, indicadas neste formulário com as quais concordo.
+    context = {
+        'orcamento': orcamento,
+        'itens': itens,
+        'arquivado': True,
+    }
+    return await _arender(request, 'orcamentos/visualizar_orcamento.html', context)
+
+async def gerar_pdf_arquivado(request, orcamento_id):
+    """PDF de um orçamento arquivado (gerado na hora, sem cache)"""
+    try:
+        orcamento = await aget_object_or_404(
+            Orcamento.objects.using('arquivo').select_related('empresa', 'cliente'), id=orcamento_id
+        )
+        itens = await _itens_pdf(orcamento)
+    except OperationalError:
+        return redirect('orcamentos:listar_arquivados')
+    
+    loop = asyncio.get_running_loop()
+    try:
+        async with controle_pdf.vaga():
+            buffer = await loop.run_in_executor(_executor_pdf, _renderizar_pdf, orcamento, itens)
+    except Sobrecarga as e:
+        return _resposta_sobrecarga(e)
+    return FileResponse(buffer, as_attachment=True, filename=f'{orcamento.numero}.pdf')
+
+async def _itens_pdf(orcamento):
+    """Itens já carregados; em orçamentos grandes, a consulta ainda não executada.
+
+    A consulta é lida com .iterator() pela thread do PDF, um bloco por vez.
     """
-    elements.append(Paragraph(texto_concordancia, styles['Normal']))
-    
-    # Empresa e CNPJ
-    elements.append(Paragraph(f"<b>{orcamento.empresa.nome}</b> - CNPJ: {orcamento.empresa.cnpj}", 
-                             ParagraphStyle('Center', parent=styles['Normal'], alignment=TA_CENTER)))
-    #elements.append(Spacer(1, 15*mm))
-    
-    # Linha de assinatura
-    elements.append(Spacer(1, 25*mm))  # aumenta o espaço vertical
-    linha_assinatura = Table([['_' * 60]], colWidths=[150*mm])
-    linha_assinatura.setStyle(TableStyle([
-        ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-        ('FONTSIZE', (0, 0), (-1, -1), 10),
-    ]))
-    elements.append(linha_assinatura)
-    elements.append(Paragraph("Assinatura e Carimbo", 
-                             ParagraphStyle('Center', parent=styles['Normal'], alignment=TA_CENTER, fontSize=9)))
-    
-    # Construir PDF
-    doc.build(elements)
-    
-    # Retornar PDF
-    buffer.seek(0)
-    return FileResponse(buffer, as_attachment=True, filename=f'{orcamento.numero}.pdf')
\ No newline at end of file
+    itens = orcamento.itens.all().select_related('unidade').order_by('numero_item')
+    if await itens.acount() > _PDF_LIMITE_ITENS:
+        return itens
+    return [item async for item in itens]
+
+def _resposta_sobrecarga(erro):
+    resposta = HttpResponse(
+        'Muitos PDFs sendo gerados no momento. Tente novamente em instantes.',
+        status=503,
+        content_type='text/plain; charset=utf-8',
+    )
+    resposta['Retry-After'] = str(erro.retry_after)
+    return resposta
+
+def metricas_pdf(request):
+    """Métricas do controle de admissão de PDFs deste processo"""
+    return JsonResponse(controle_pdf.metricas())
+
+def _gerar_e_guardar_pdf(orcamento, itens):
+    """Renderiza e grava no cache comprimido (roda no pool de PDFs)"""
+    buffer = _renderizar_pdf(orcamento, itens)
+    return cache_pdf.guardar(orcamento, buffer.getvalue())
+
+def _renderizar_pdf(orcamento, itens):
+    """Monta o PDF na thread do pool; o ReportLab só é importado no primeiro PDF do processo"""
+    from .gerador_pdf import renderizar
+    return renderizar(orcamento, itens)
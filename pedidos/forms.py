@@ -16,6 +16,21 @@ class PedidoForm(forms.ModelForm):
         }
 
 
+class FiltroPedidosForm(forms.Form):
+    q = forms.CharField(
+        required=False,
+        max_length=100,
+        label='Buscar',
+        widget=forms.TextInput(attrs={'placeholder': 'Órgão, pregão ou empenho (início)'}),
+    )
+    status = forms.ChoiceField(
+        required=False,
+        choices=[('', 'Todos')] + Pedido.STATUS_CHOICES,
+    )
+    de = forms.DateField(required=False, label='De', widget=forms.DateInput(attrs={'type': 'date'}))
+    ate = forms.DateField(required=False, label='Até', widget=forms.DateInput(attrs={'type': 'date'}))
+
+
 class ItemPedidoForm(forms.ModelForm):
     class Meta:
         model = ItemPedido
@@ -26,3 +41,63 @@ class ItemPedidoForm(forms.ModelForm):
             'marca',
             'valor_unitario',
         ]
+
+
+# Grade com várias linhas em branco para lançar itens de uma só vez
+ItemPedidoFormSet = forms.modelformset_factory(
+    ItemPedido,
+    form=ItemPedidoForm,
+    extra=10,
+)
+
+
+def _normalizar_decimal(valor):
+    """Aceita números no formato brasileiro (1.234,56) vindos de planilhas"""
+    valor = valor.strip().replace('R$', '').strip()
+    if ',' in valor:
+        valor = valor.replace('.', '').replace(',', '.')
+    return valor
+
+
+class ColarItensForm(forms.Form):
+    """Recebe um bloco de linhas separadas por TAB (copiado de planilha)"""
+    COLUNAS = ['descricao', 'unidade', 'quantidade', 'marca', 'valor_unitario']
+
+    linhas = forms.CharField(
+        widget=forms.Textarea(attrs={'rows': 10, 'cols': 100}),
+        help_text='Uma linha por item: Descrição, Unidade, Quantidade, Marca, Valor Unitário (separados por TAB).',
+    )
+
+    def clean_linhas(self):
+        """Valida todas as linhas juntas e devolve os itens ainda não salvos"""
+        itens = []
+        erros = []
+
+        for numero_linha, linha in enumerate(self.cleaned_data['linhas'].splitlines(), start=1):
+            if not linha.strip():
+                continue
+
+            colunas = linha.split('\t')
+            if len(colunas) != len(self.COLUNAS):
+                erros.append(
+                    f'Linha {numero_linha}: esperadas {len(self.COLUNAS)} colunas, encontradas {len(colunas)}.'
+                )
+                continue
+
+            dados = dict(zip(self.COLUNAS, (c.strip() for c in colunas)))
+            dados['quantidade'] = _normalizar_decimal(dados['quantidade'])
+            dados['valor_unitario'] = _normalizar_decimal(dados['valor_unitario'])
+
+            form = ItemPedidoForm(data=dados)
+            if form.is_valid():
+                itens.append(form.save(commit=False))
+            else:
+                for campo, mensagens in form.errors.items():
+                    erros.append(f'Linha {numero_linha} ({campo}): {" ".join(mensagens)}')
+
+        if erros:
+            raise forms.ValidationError(erros)
+        if not itens:
+            raise forms.ValidationError('Nenhum item informado.')
+
+        return itens
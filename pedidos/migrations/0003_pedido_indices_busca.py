@@ -0,0 +1,34 @@
+# Generated by Django 6.0 on 2026-10-19 11:05
+
+import django.db.models.functions.text
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pedidos', '0002_rename_numero_pedido_pedido_numero_pregao_and_more'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='pedido',
+            index=models.Index(fields=['data_pedido', 'id'], name='pedido_data_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='pedido',
+            index=models.Index(fields=['status', 'data_pedido', 'id'], name='pedido_status_data_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='pedido',
+            index=models.Index(django.db.models.functions.text.Upper('orgao'), name='pedido_orgao_prefixo_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='pedido',
+            index=models.Index(django.db.models.functions.text.Upper('numero_pregao'), name='pedido_pregao_prefixo_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='pedido',
+            index=models.Index(django.db.models.functions.text.Upper('numero_empenho'), name='pedido_empenho_prefixo_idx'),
+        ),
+    ]
@@ -0,0 +1,103 @@
+# Generated by Django 6.0 on 2026-10-19 15:46
+
+from django.db import migrations
+
+# Gatilhos do log de alterações (orcamentos_alteracao, criado em orcamentos 0007) para os pedidos.
+# Como lá: SQLite e PostgreSQL (com a função registrar_alteracao() daquela migração); nos demais
+# bancos nada é criado
+CRIAR_GATILHOS_SQLITE = [
+    """
+    CREATE TRIGGER pedidos_pedido_alteracao_insert AFTER INSERT ON pedidos_pedido
+    BEGIN
+        INSERT INTO orcamentos_alteracao (tabela, operacao, registro_id, documento_id, criado_em)
+        VALUES ('pedidos_pedido', 'insert', NEW.id, NEW.id, strftime('%Y-%m-%d %H:%M:%f', 'now'));
+    END
+    """,
+    """
+    CREATE TRIGGER pedidos_pedido_alteracao_update AFTER UPDATE ON pedidos_pedido
+    BEGIN
+        INSERT INTO orcamentos_alteracao (tabela, operacao, registro_id, documento_id, criado_em)
+        VALUES ('pedidos_pedido', 'update', NEW.id, NEW.id, strftime('%Y-%m-%d %H:%M:%f', 'now'));
+    END
+    """,
+    """
+    CREATE TRIGGER pedidos_pedido_alteracao_delete AFTER DELETE ON pedidos_pedido
+    BEGIN
+        INSERT INTO orcamentos_alteracao (tabela, operacao, registro_id, documento_id, criado_em)
+        VALUES ('pedidos_pedido', 'delete', OLD.id, OLD.id, strftime('%Y-%m-%d %H:%M:%f', 'now'));
+    END
+    """,
+    """
+    CREATE TRIGGER pedidos_itempedido_alteracao_insert AFTER INSERT ON pedidos_itempedido
+    BEGIN
+        INSERT INTO orcamentos_alteracao (tabela, operacao, registro_id, documento_id, criado_em)
+        VALUES ('pedidos_itempedido', 'insert', NEW.id, NEW.pedido_id, strftime('%Y-%m-%d %H:%M:%f', 'now'));
+    END
+    """,
+    """
+    CREATE TRIGGER pedidos_itempedido_alteracao_update AFTER UPDATE ON pedidos_itempedido
+    BEGIN
+        INSERT INTO orcamentos_alteracao (tabela, operacao, registro_id, documento_id, criado_em)
+        VALUES ('pedidos_itempedido', 'update', NEW.id, NEW.pedido_id, strftime('%Y-%m-%d %H:%M:%f', 'now'));
+    END
+    """,
+    """
+    CREATE TRIGGER pedidos_itempedido_alteracao_delete AFTER DELETE ON pedidos_itempedido
+    BEGIN
+        INSERT INTO orcamentos_alteracao (tabela, operacao, registro_id, documento_id, criado_em)
+        VALUES ('pedidos_itempedido', 'delete', OLD.id, OLD.pedido_id, strftime('%Y-%m-%d %H:%M:%f', 'now'));
+    END
+    """,
+]
+
+REMOVER_GATILHOS_SQLITE = [
+    'DROP TRIGGER IF EXISTS pedidos_pedido_alteracao_insert',
+    'DROP TRIGGER IF EXISTS pedidos_pedido_alteracao_update',
+    'DROP TRIGGER IF EXISTS pedidos_pedido_alteracao_delete',
+    'DROP TRIGGER IF EXISTS pedidos_itempedido_alteracao_insert',
+    'DROP TRIGGER IF EXISTS pedidos_itempedido_alteracao_update',
+    'DROP TRIGGER IF EXISTS pedidos_itempedido_alteracao_delete',
+]
+
+CRIAR_GATILHOS_POSTGRESQL = [
+    """
+    CREATE TRIGGER pedidos_pedido_alteracao AFTER INSERT OR UPDATE OR DELETE ON pedidos_pedido
+    FOR EACH ROW EXECUTE FUNCTION registrar_alteracao('id')
+    """,
+    """
+    CREATE TRIGGER pedidos_itempedido_alteracao AFTER INSERT OR UPDATE OR DELETE ON pedidos_itempedido
+    FOR EACH ROW EXECUTE FUNCTION registrar_alteracao('pedido_id')
+    """,
+]
+
+REMOVER_GATILHOS_POSTGRESQL = [
+    'DROP TRIGGER IF EXISTS pedidos_pedido_alteracao ON pedidos_pedido',
+    'DROP TRIGGER IF EXISTS pedidos_itempedido_alteracao ON pedidos_itempedido',
+]
+
+GATILHOS = {
+    'sqlite': (CRIAR_GATILHOS_SQLITE, REMOVER_GATILHOS_SQLITE),
+    'postgresql': (CRIAR_GATILHOS_POSTGRESQL, REMOVER_GATILHOS_POSTGRESQL),
+}
+
+
+def criar_gatilhos(apps, schema_editor):
+    for sql in GATILHOS.get(schema_editor.connection.vendor, ((), ()))[0]:
+        schema_editor.execute(sql, params=None)
+
+
+def remover_gatilhos(apps, schema_editor):
+    for sql in GATILHOS.get(schema_editor.connection.vendor, ((), ()))[1]:
+        schema_editor.execute(sql, params=None)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orcamentos', '0007_alteracao'),
+        ('pedidos', '0003_pedido_indices_busca'),
+    ]
+
+    operations = [
+        migrations.RunPython(criar_gatilhos, remover_gatilhos, hints={'somente_principal': True}),
+    ]
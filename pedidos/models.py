@@ -1,7 +1,26 @@
 # pedidos/models.py
-from django.db import models
+from django.db import models, transaction
+from django.db.models import DecimalField, F, Max, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce, Upper
 from decimal import Decimal
 
+
+def total_itens():
+    """Expressão SQL da soma dos itens de cada pedido (para annotate)"""
+    soma = (
+        ItemPedido.objects.filter(pedido=OuterRef('pk'))
+        .order_by()
+        .values('pedido')
+        .annotate(soma=Sum('valor_total'))
+        .values('soma')
+    )
+    return Coalesce(
+        Subquery(soma),
+        Value(Decimal('0')),
+        output_field=DecimalField(max_digits=12, decimal_places=2),
+    )
+
+
 class Pedido(models.Model):
     STATUS_CHOICES = [
         ('aberto', 'Aberto'),
@@ -19,13 +38,69 @@ class Pedido(models.Model):
 
     class Meta:
         ordering = ['data_pedido']
+        indexes = [
+            # Listagem paginada por data (mais recentes primeiro), com e sem filtro de status
+            models.Index(fields=['data_pedido', 'id'], name='pedido_data_idx'),
+            models.Index(fields=['status', 'data_pedido', 'id'], name='pedido_status_data_idx'),
+            # Busca por prefixo sem diferenciar maiúsculas (ver Pedido.buscar)
+            models.Index(Upper('orgao'), name='pedido_orgao_prefixo_idx'),
+            models.Index(Upper('numero_pregao'), name='pedido_pregao_prefixo_idx'),
+            models.Index(Upper('numero_empenho'), name='pedido_empenho_prefixo_idx'),
+        ]
 
     def __str__(self):
         return f"{self.orgao} - Pregão {self.numero_pregao}"
 
+    @staticmethod
+    def filtro_prefixo(termo):
+        """Órgão, pregão ou empenho começando com `termo`, como faixa no índice de UPPER(campo)"""
+        # O próprio banco converte o termo: o UPPER do SQLite só trata ASCII ('Â' fica 'Â')
+        inicio = Upper(Value(termo))
+        fim = Upper(Value(termo + chr(0x10FFFF)))
+        filtro = models.Q()
+        for campo in ('orgao', 'numero_pregao', 'numero_empenho'):
+            filtro |= models.Q(**{f'{campo}_upper__gte': inicio, f'{campo}_upper__lt': fim})
+        return filtro
+
+    @classmethod
+    def buscar(cls, termo=None, status=None, data_inicial=None, data_final=None):
+        """Pedidos filtrados, com o total dos itens calculado na mesma consulta"""
+        pedidos = cls.objects.annotate(total_itens=total_itens())
+        if termo:
+            pedidos = pedidos.alias(
+                orgao_upper=Upper('orgao'),
+                numero_pregao_upper=Upper('numero_pregao'),
+                numero_empenho_upper=Upper('numero_empenho'),
+            ).filter(cls.filtro_prefixo(termo))
+        if status:
+            pedidos = pedidos.filter(status=status)
+        if data_inicial:
+            pedidos = pedidos.filter(data_pedido__gte=data_inicial)
+        if data_final:
+            pedidos = pedidos.filter(data_pedido__lte=data_final)
+        return pedidos
+
     @property
     def total(self):
         return sum(item.valor_total for item in self.itens.all())
+
+    def adicionar_itens_em_lote(self, itens):
+        """Numera e insere vários itens de uma vez (um único INSERT em lote)"""
+        with transaction.atomic():
+            # Um UPDATE sem efeito como primeiro comando pega a trava de escrita antes de ler o
+            # MAX: no SQLite select_for_update() não trava nada e a transação começa adiada,
+            # então duas gravações simultâneas leriam o mesmo número. No PostgreSQL trava a linha
+            Pedido.objects.filter(pk=self.pk).update(id=F('id'))
+            ultimo = self.itens.aggregate(ultimo=Max('numero_item'))['ultimo'] or 0
+
+            for numero, item in enumerate(itens, start=ultimo + 1):
+                item.pedido = self
+                item.numero_item = numero
+                # bulk_create não chama save(), então o total é calculado aqui
+                item.valor_total = item.quantidade * item.valor_unitario
+
+            return ItemPedido.objects.bulk_create(itens, batch_size=500)
+
 class ItemPedido(models.Model):
     pedido = models.ForeignKey(Pedido, on_delete=models.CASCADE, related_name='itens')
 
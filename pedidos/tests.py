@@ -1,3 +1,220 @@
-from django.test import TestCase
+from datetime import date
+from decimal import Decimal
+from unittest import mock
 
-# Create your tests here.
+from django.conf import settings
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from orcamentos.tests import ConsultasConstantesMixin
+
+from . import urls as pedidos_urls
+from .forms import ColarItensForm
+from .models import ItemPedido, Pedido
+
+
+class ColarItensTests(TestCase):
+    def _form(self, linhas):
+        return ColarItensForm({'colar-linhas': linhas}, prefix='colar')
+
+    def test_linhas_de_planilha_com_numeros_brasileiros(self):
+        form = self._form('Cabo 2,5mm\tMT\t1.250,5\tMarca\tR$ 3,20\n\n  \nTomada\tUN\t10\t\t7.5\n')
+        self.assertTrue(form.is_valid(), form.errors)
+        self.assertEqual(
+            [(i.descricao, i.unidade, i.quantidade, i.marca, i.valor_unitario) for i in form.cleaned_data['linhas']],
+            [
+                ('Cabo 2,5mm', 'MT', Decimal('1250.5'), 'Marca', Decimal('3.20')),
+                ('Tomada', 'UN', Decimal('10'), '', Decimal('7.5')),
+            ],
+        )
+
+    def test_todas_as_linhas_invalidas_sao_informadas(self):
+        form = self._form('Cabo\tMT\t1\n\nTomada\tUN\tdez\t\t2\n')
+        self.assertFalse(form.is_valid())
+        erros = form.errors['linhas']
+        self.assertEqual(len(erros), 2)
+        self.assertIn('Linha 1: esperadas 5 colunas, encontradas 3.', erros)
+        self.assertTrue(erros[1].startswith('Linha 3 (quantidade)'))
+
+    def test_bloco_vazio(self):
+        form = self._form('\n  \n')
+        self.assertFalse(form.is_valid())
+
+
+class AdicionarItensTests(TestCase):
+    def setUp(self):
+        self.pedido = Pedido.objects.create(orgao='Prefeitura', numero_pregao='1/2026', data_pedido=date(2026, 10, 1))
+        ItemPedido.objects.create(
+            pedido=self.pedido, descricao='Existente', unidade='UN', quantidade=1, valor_unitario=1
+        )
+        self.url = reverse('adicionar_itens', kwargs={'pedido_id': self.pedido.id})
+
+    def _grade(self, linhas, total=10):
+        dados = {
+            'modo': 'grade', 'grade-TOTAL_FORMS': str(total), 'grade-INITIAL_FORMS': '0',
+            'grade-MIN_NUM_FORMS': '0', 'grade-MAX_NUM_FORMS': '1000',
+        }
+        for indice, (descricao, quantidade, valor) in enumerate(linhas):
+            dados.update({
+                f'grade-{indice}-descricao': descricao, f'grade-{indice}-unidade': 'UN',
+                f'grade-{indice}-quantidade': quantidade, f'grade-{indice}-valor_unitario': valor,
+            })
+        return self.client.post(self.url, dados)
+
+    def _itens(self):
+        return list(self.pedido.itens.values_list('numero_item', 'descricao', 'valor_total'))
+
+    def test_grade_ignora_linhas_em_branco_e_numera_depois_dos_existentes(self):
+        resposta = self._grade([('A', '2', '1.50'), ('B', '3', '2')])
+        self.assertRedirects(resposta, self.url)
+        self.assertEqual(self._itens(), [
+            (1, 'Existente', Decimal('1.00')), (2, 'A', Decimal('3.00')), (3, 'B', Decimal('6.00')),
+        ])
+
+    def test_grade_com_linha_invalida_nao_grava_nenhuma(self):
+        resposta = self._grade([('A', '2', '1.50'), ('B', 'x', '2')])
+        self.assertEqual(resposta.status_code, 200)
+        self.assertEqual(len(self._itens()), 1)
+
+    def test_colar_grava_em_lote(self):
+        resposta = self.client.post(self.url, {'modo': 'colar', 'colar-linhas': 'C\tUN\t2\t\t1,25\nD\tUN\t1\t\t4'})
+        self.assertRedirects(resposta, self.url)
+        self.assertEqual(self._itens()[1:], [(2, 'C', Decimal('2.50')), (3, 'D', Decimal('4.00'))])
+
+    def test_trava_de_escrita_antes_de_ler_o_ultimo_numero(self):
+        # No SQLite só uma escrita pega a trava; ler o MAX antes dela deixaria duas
+        # gravações simultâneas com os mesmos números
+        with CaptureQueriesContext(connection) as consultas:
+            self.pedido.adicionar_itens_em_lote([
+                ItemPedido(descricao='E', unidade='UN', quantidade=1, valor_unitario=1),
+            ])
+        comandos = [c['sql'] for c in consultas.captured_queries if not c['sql'].startswith(('SAVEPOINT', 'RELEASE'))]
+        self.assertTrue(comandos[0].startswith('UPDATE "pedidos_pedido"'), comandos[0])
+        self.assertIn('MAX("pedidos_itempedido"."numero_item")', comandos[1])
+        self.assertEqual(self._itens()[-1][:2], (2, 'E'))
+
+
+@override_settings(STORAGES={**settings.STORAGES, 'staticfiles': {
+    'BACKEND': 'django.contrib.staticfiles.storage.StaticFilesStorage',
+}})
+class PaginacaoPedidosTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        # Várias páginas com a mesma data: o id é que desempata a posição
+        datas = [date(2026, 10, 3)] * 2 + [date(2026, 10, 2)] * 7 + [date(2026, 10, 1)] * 2
+        Pedido.objects.bulk_create(
+            Pedido(orgao='Prefeitura', numero_pregao=f'{numero}/2026', data_pedido=data)
+            for numero, data in enumerate(datas, start=1)
+        )
+        cls.ordem = list(Pedido.objects.order_by('-data_pedido', '-id').values_list('id', flat=True))
+
+    def setUp(self):
+        self.enterContext(mock.patch('pedidos.views.POR_PAGINA', 3))
+
+    def _pagina(self, **cursor):
+        contexto = self.client.get(reverse('lista_pedidos'), cursor).context
+        return [pedido.id for pedido in contexto['pedidos']], contexto['anterior'], contexto['proxima']
+
+    def test_avanca_e_volta_sem_repetir_nem_pular(self):
+        paginas = []
+        ids, anterior, proxima = self._pagina()
+        self.assertIsNone(anterior)
+        paginas.append(ids)
+        while proxima:
+            ids, anterior, proxima = self._pagina(apos=proxima)
+            paginas.append(ids)
+        self.assertEqual([len(ids) for ids in paginas], [3, 3, 3, 2])
+        self.assertEqual(sum(paginas, []), self.ordem)
+
+        # Voltando da última página pelos cursores "antes"
+        voltando = [paginas[-1]]
+        while anterior:
+            ids, anterior, _ = self._pagina(antes=anterior)
+            voltando.insert(0, ids)
+        self.assertEqual(voltando, paginas)
+
+    def test_pedido_novo_com_a_mesma_data_nao_desloca_as_paginas(self):
+        ids, _, proxima = self._pagina()
+        # Gravado depois de abrir a 1ª página, com a data que está no cursor
+        Pedido.objects.create(orgao='Prefeitura', numero_pregao='novo', data_pedido=date(2026, 10, 2))
+        seguinte, _, _ = self._pagina(apos=proxima)
+        self.assertEqual(seguinte, self.ordem[3:6])
+
+    def test_cursor_invalido_abre_a_primeira_pagina(self):
+        self.assertEqual(self._pagina(apos='ontem')[0], self.ordem[:3])
+
+
+@override_settings(STORAGES={**settings.STORAGES, 'staticfiles': {
+    'BACKEND': 'django.contrib.staticfiles.storage.StaticFilesStorage',
+}})
+class ConsultasPorViewTests(ConsultasConstantesMixin, TestCase):
+    """Cada view de pedidos.urls faz o mesmo número de consultas com 1 ou 25 linhas"""
+
+    def _pedido(self, itens):
+        pedido = Pedido.objects.create(orgao='Prefeitura', numero_pregao='10/2026', data_pedido=date(2026, 10, 1))
+        ItemPedido.objects.bulk_create(
+            ItemPedido(
+                pedido=pedido, numero_item=numero, descricao=f'ITEM {numero}', unidade='UN',
+                quantidade=Decimal('2'), valor_unitario=Decimal('1.50'), valor_total=Decimal('3.00'),
+            )
+            for numero in range(1, itens + 1)
+        )
+        return pedido
+
+    def _adicionar(self, itens, dados):
+        url = reverse('adicionar_itens', kwargs={'pedido_id': self._pedido(itens).id})
+        return lambda: self.client.post(url, dados)
+
+    def test_todas_as_rotas_tem_teste(self):
+        self.assertTodasAsViewsMedidas(pedidos_urls.urlpatterns)
+
+    def test_lista_pedidos(self):
+        def preparar(n):
+            for _ in range(n):
+                self._pedido(3)
+            return lambda: self.client.get(reverse('lista_pedidos'), {'q': 'pref', 'status': 'aberto'})
+        self.assertConsultasConstantes(preparar)
+
+    def test_criar_pedido(self):
+        self.assertConsultasConstantes(lambda n: lambda: self.client.get(reverse('criar_pedido')))
+
+    def test_criar_pedido_gravando(self):
+        dados = {'orgao': 'Prefeitura', 'numero_pregao': '1', 'data_pedido': '2026-10-01', 'status': 'aberto'}
+
+        def preparar(n):
+            self._pedido(n)
+            return lambda: self.client.post(reverse('criar_pedido'), dados)
+        self.assertConsultasConstantes(preparar)
+
+    def test_adicionar_itens(self):
+        self.assertConsultasConstantes(
+            lambda n: lambda pedido=self._pedido(n): self.client.get(
+                reverse('adicionar_itens', kwargs={'pedido_id': pedido.id})
+            )
+        )
+
+    def test_adicionar_itens_unico(self):
+        dados = {'modo': 'unico', 'descricao': 'item', 'unidade': 'UN', 'quantidade': '1', 'valor_unitario': '2'}
+        self.assertConsultasConstantes(lambda n: self._adicionar(n, dados))
+
+    def test_adicionar_itens_grade(self):
+        def preparar(n):
+            dados = {
+                'modo': 'grade', 'grade-TOTAL_FORMS': str(n), 'grade-INITIAL_FORMS': '0',
+                'grade-MIN_NUM_FORMS': '0', 'grade-MAX_NUM_FORMS': '1000',
+            }
+            for indice in range(n):
+                dados.update({
+                    f'grade-{indice}-descricao': f'item {indice}', f'grade-{indice}-unidade': 'UN',
+                    f'grade-{indice}-quantidade': '1', f'grade-{indice}-valor_unitario': '2',
+                })
+            return self._adicionar(n, dados)
+        self.assertConsultasConstantes(preparar)
+
+    def test_adicionar_itens_colar(self):
+        def preparar(n):
+            linhas = '\n'.join(f'item {indice}\tUN\t1\t\t2,50' for indice in range(n))
+            return self._adicionar(n, {'modo': 'colar', 'colar-linhas': linhas})
+        self.assertConsultasConstantes(preparar)
@@ -1,10 +1,74 @@
+from datetime import date
+
+from asgiref.sync import sync_to_async
 from django.shortcuts import render, redirect, get_object_or_404
+
+from orcamentos.roteadores import somente_leitura
 from .models import Pedido, ItemPedido
-from .forms import PedidoForm, ItemPedidoForm
+from .forms import PedidoForm, ItemPedidoForm, ItemPedidoFormSet, ColarItensForm, FiltroPedidosForm
+
+POR_PAGINA = 50
+
+
+def _ler_cursor(valor):
+    """Posição 'AAAA-MM-DD.id' de um pedido na listagem; None se ausente ou inválida"""
+    try:
+        data, pk = valor.split('.')
+        return date.fromisoformat(data), int(pk)
+    except (AttributeError, ValueError):
+        return None
+
 
-def lista_pedidos(request):
-    pedidos = Pedido.objects.all()
-    return render(request, 'pedidos/lista_pedidos.html', {'pedidos': pedidos})
+def _cursor(pedido):
+    return f'{pedido.data_pedido.isoformat()}.{pedido.pk}'
+
+
+# Busca e listagem: toleram a cópia de alguns minutos atrás e não seguram as gravações
+@somente_leitura
+async def lista_pedidos(request):
+    filtro = FiltroPedidosForm(request.GET)
+    dados = filtro.cleaned_data if filtro.is_valid() else {}
+    # Total dos itens vem na mesma consulta (subconsulta só para as linhas da página)
+    pedidos = Pedido.buscar(
+        termo=dados.get('q'),
+        status=dados.get('status'),
+        data_inicial=dados.get('de'),
+        data_final=dados.get('ate'),
+    )
+
+    # Paginação pela posição (data, id) em vez de OFFSET e COUNT: qualquer página custa
+    # o mesmo, não importa quantos pedidos existam
+    apos = _ler_cursor(request.GET.get('apos'))
+    antes = _ler_cursor(request.GET.get('antes'))
+    if antes:
+        data, pk = antes
+        pagina = (
+            pedidos.filter(data_pedido__gte=data)
+            .exclude(data_pedido=data, id__lte=pk)
+            .order_by('data_pedido', 'id')
+        )
+    else:
+        if apos:
+            data, pk = apos
+            pedidos = pedidos.filter(data_pedido__lte=data).exclude(data_pedido=data, id__gte=pk)
+        pagina = pedidos.order_by('-data_pedido', '-id')
+
+    linhas = [pedido async for pedido in pagina[:POR_PAGINA + 1]]
+    tem_mais = len(linhas) > POR_PAGINA
+    linhas = linhas[:POR_PAGINA]
+    if antes:
+        linhas.reverse()
+        tem_anterior, tem_proxima = tem_mais, True
+    else:
+        tem_anterior, tem_proxima = apos is not None, tem_mais
+
+    context = {
+        'pedidos': linhas,
+        'filtro': filtro,
+        'anterior': _cursor(linhas[0]) if linhas and tem_anterior else None,
+        'proxima': _cursor(linhas[-1]) if linhas and tem_proxima else None,
+    }
+    return await sync_to_async(render)(request, 'pedidos/lista_pedidos.html', context)
 
 
 def criar_pedido(request):
@@ -23,15 +87,36 @@ def adicionar_itens(request, pedido_id):
     pedido = get_object_or_404(Pedido, id=pedido_id)
     itens = pedido.itens.all()
 
+    form = ItemPedidoForm()
+    formset = ItemPedidoFormSet(queryset=ItemPedido.objects.none(), prefix='grade')
+    colar_form = ColarItensForm(prefix='colar')
+
     if request.method == 'POST':
-        form = ItemPedidoForm(request.POST)
-        if form.is_valid():
-            item = form.save(commit=False)
-            item.pedido = pedido
-            item.save()
-            return redirect('adicionar_itens', pedido_id=pedido.id)
-    else:
-        form = ItemPedidoForm()
+        modo = request.POST.get('modo', 'unico')
+
+        if modo == 'grade':
+            # Várias linhas da grade validadas juntas e gravadas em um único INSERT
+            formset = ItemPedidoFormSet(request.POST, queryset=ItemPedido.objects.none(), prefix='grade')
+            if formset.is_valid():
+                novos = [f.save(commit=False) for f in formset.forms if f.has_changed()]
+                if novos:
+                    pedido.adicionar_itens_em_lote(novos)
+                return redirect('adicionar_itens', pedido_id=pedido.id)
+
+        elif modo == 'colar':
+            # Bloco de linhas separadas por TAB copiado de uma planilha
+            colar_form = ColarItensForm(request.POST, prefix='colar')
+            if colar_form.is_valid():
+                pedido.adicionar_itens_em_lote(colar_form.cleaned_data['linhas'])
+                return redirect('adicionar_itens', pedido_id=pedido.id)
+
+        else:
+            form = ItemPedidoForm(request.POST)
+            if form.is_valid():
+                item = form.save(commit=False)
+                item.pedido = pedido
+                item.save()
+                return redirect('adicionar_itens', pedido_id=pedido.id)
 
     return render(
         request,
@@ -39,6 +124,8 @@ def adicionar_itens(request, pedido_id):
         {
             'pedido': pedido,
             'itens': itens,
-            'form': form
+            'form': form,
+            'formset': formset,
+            'colar_form': colar_form,
         }
     )